@@ -0,0 +1,234 @@
+"""
+Local OHLCV time-series store with incremental refresh.
+
+Bars are kept per (symbol, region, interval) in one .npz file holding
+a column per field (timestamps, open, high, low, close, volume), sorted
+by timestamp, and the store's meta as JSON. Every save writes a new file
+aside and renames it into place, so processes sharing the store never
+read columns from two different saves. A chart request only downloads the
+tail window since the last stored bar (using the smallest get-chart
+range that covers the gap), merges it in with dedup on timestamp (the
+newest copy of a bar wins, since the last bar of a session is still
+forming) and serves the requested range by slicing locally with a
+binary search. Historical bars are never downloaded twice. Intraday
+stores keep only the last RETENTION_SECONDS of bars for their interval,
+so a 1m or 5m store does not grow without limit.
+"""
+import json
+import os
+import threading
+import time
+import zipfile
+
+import numpy as np
+
+from chart_series import OHLCV_FIELDS, ChartSeries
+
+STORE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "bars")
+
+# Length of each get-chart range and interval, in seconds
+RANGE_SECONDS = {
+    "1d": 24 * 3600,
+    "5d": 5 * 24 * 3600,
+    "1mo": 31 * 24 * 3600,
+    "3mo": 92 * 24 * 3600,
+    "6mo": 183 * 24 * 3600,
+    "1y": 366 * 24 * 3600,
+    "5y": 1827 * 24 * 3600,
+}
+INTERVAL_SECONDS = {
+    "1m": 60,
+    "5m": 5 * 60,
+    "15m": 15 * 60,
+    "30m": 30 * 60,
+    "1h": 3600,
+    "1d": 24 * 3600,
+    "1wk": 7 * 24 * 3600,
+    "1mo": 31 * 24 * 3600,
+}
+
+# Stored bars are considered current for this long before the tail is fetched again
+REFRESH_SECONDS = 60
+# Longest an open market goes without bars (a long weekend), so the stored
+# bars may start this much after a range's start and still cover it
+MARKET_CLOSED_SECONDS = 5 * 24 * 3600
+# How far back from the latest bar intraday stores keep bars (other intervals keep everything)
+RETENTION_SECONDS = {
+    "1m": 8 * 24 * 3600,
+    "5m": 62 * 24 * 3600,
+    "15m": 62 * 24 * 3600,
+    "30m": 62 * 24 * 3600,
+    "1h": 731 * 24 * 3600,
+}
+
+COLUMNS = ("timestamps",) + OHLCV_FIELDS
+
+
+def tail_range(gap_seconds):
+    """Return the smallest get-chart range that covers a gap of gap_seconds, or None if none does."""
+    for range_name, seconds in sorted(RANGE_SECONDS.items(), key=lambda item: item[1]):
+        if seconds >= gap_seconds:
+            return range_name
+    return None
+
+
+def merge_bars(old, new):
+    """
+    Merge two ChartSeries into one sorted by timestamp, keeping new's copy of duplicate bars.
+    """
+    if old is None or not len(old):
+        return new
+    if new is None or not len(new):
+        return old
+    columns = {name: np.concatenate([getattr(old, name), getattr(new, name)]) for name in COLUMNS}
+    timestamps = columns["timestamps"]
+    # np.unique keeps the first occurrence, so search the reversed array to keep the last one
+    _, reversed_index = np.unique(timestamps[::-1], return_index=True)
+    keep = len(timestamps) - 1 - reversed_index
+    return ChartSeries(new.symbol or old.symbol, *(columns[name][keep] for name in COLUMNS))
+
+
+def trim_bars(series, interval):
+    """Drop the bars older than the interval's retention, counted back from the latest bar."""
+    retention = RETENTION_SECONDS.get(interval)
+    if retention is None or not len(series):
+        return series
+    first = int(np.searchsorted(series.timestamps, int(series.timestamps[-1]) - retention, side="left"))
+    return series.take(slice(first, None)) if first else series
+
+
+class BarStore:
+    """
+    Persistent per-(symbol, region, interval) bar store.
+
+    Parameters:
+    root (str): Directory the bars are stored in.
+    """
+
+    def __init__(self, root=STORE_DIR):
+        self.root = root
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+
+    def _path(self, symbol, region, interval):
+        safe = "_".join(part.replace(os.sep, "-") for part in (symbol.upper(), region.upper(), interval))
+        return os.path.join(self.root, f"{safe}.npz")
+
+    def _lock(self, path):
+        with self._locks_lock:
+            return self._locks.setdefault(path, threading.Lock())
+
+    def load(self, symbol, region, interval):
+        """
+        Return (series, meta) for the stored bars, or (None, {}) if nothing
+        (or nothing readable) is stored.
+        """
+        try:
+            with np.load(self._path(symbol, region, interval), allow_pickle=False) as data:
+                meta = json.loads(str(data["meta"]))
+                columns = [data[name] for name in COLUMNS]
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+            return None, {}
+        if any(len(column) != len(columns[0]) for column in columns):
+            # Not written by save(); better fetched again than served misaligned
+            return None, {}
+        return ChartSeries(symbol, *columns), meta
+
+    def save(self, series, symbol, region, interval, meta):
+        """
+        Write the bars and meta atomically (written aside, then renamed into place in one step).
+        symbol is the one load() will be asked for, not necessarily series.symbol, which
+        upstream may have normalized.
+        """
+        target = self._path(symbol, region, interval)
+        os.makedirs(self.root, exist_ok=True)
+        temporary = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temporary, "wb") as f:
+                np.savez(f, meta=np.array(json.dumps(meta)),
+                         **{name: np.ascontiguousarray(getattr(series, name)) for name in COLUMNS})
+            os.replace(temporary, target)
+        except BaseException:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+
+    def get_series(self, symbol, region, range, interval, fetch):
+        """
+        Return the bars of the requested range, fetching only what is missing.
+
+        Parameters:
+        symbol, region, range, interval (str): As for the get-chart endpoint.
+        fetch (callable): range -> ChartSeries (or None) downloading that range from upstream.
+            Exceptions raised by fetch are passed on when no stored bars can answer.
+
+        Returns:
+        ChartSeries: The bars within the range, ending at the latest stored bar.
+        """
+        path = self._path(symbol, region, interval)
+        with self._lock(path):
+            stored, meta = self.load(symbol, region, interval)
+            now = time.time()
+            range_seconds = RANGE_SECONDS.get(range)
+            if range_seconds is None:
+                # Unknown range: nothing to slice locally, pass straight through
+                return fetch(range)
+
+            slack = max(INTERVAL_SECONDS.get(interval, 0), MARKET_CLOSED_SECONDS)
+            covered = (
+                stored is not None and len(stored)
+                and meta.get("covered_from", float("inf")) <= int(stored.timestamps[-1]) - range_seconds + slack
+            )
+            try:
+                if not covered:
+                    fresh = fetch(range)
+                    full_fetch = True
+                elif now - meta.get("fetched_at", 0) >= REFRESH_SECONDS:
+                    gap = now - int(stored.timestamps[-1]) + INTERVAL_SECONDS.get(interval, 0)
+                    fresh = fetch(tail_range(gap) or range)
+                    full_fetch = False
+                else:
+                    fresh = None
+            except Exception:
+                # Upstream failed: the stored bars still answer the request, just not the newest ones
+                if not covered:
+                    raise
+                fresh = None
+
+            if fresh is not None and len(fresh):
+                merged = trim_bars(merge_bars(stored, fresh), interval)
+                covered_from = meta.get("covered_from", float("inf"))
+                if full_fetch:
+                    # Everything from the first bar that arrived is stored; upstream may
+                    # have sent less history than the range asks for
+                    covered_from = min(covered_from, int(fresh.timestamps[0]))
+                retention = RETENTION_SECONDS.get(interval)
+                if retention is not None:
+                    # The bars before the retention were trimmed, so they are no longer covered
+                    covered_from = max(covered_from, int(merged.timestamps[-1]) - retention)
+                meta = {"covered_from": covered_from, "fetched_at": now}
+                self.save(merged, symbol, region, interval, meta)
+                stored = merged
+            elif fresh is not None and stored is not None:
+                # Upstream had nothing new; remember that we asked
+                meta = dict(meta, fetched_at=now)
+                self.save(stored, symbol, region, interval, meta)
+
+            if stored is None or not len(stored):
+                return fresh
+            start = int(stored.timestamps[-1]) - range_seconds
+            first = int(np.searchsorted(stored.timestamps, start, side="left"))
+            return stored.take(slice(first, None))
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Return the process-wide bar store, creating it on first use."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = BarStore()
+        return _store
@@ -0,0 +1,305 @@
+"""
+Offline performance benchmark.
+
+Starts the stand-in server (recorded RapidAPI and OpenAI responses with
+configurable latency and errors), points rapidapi_client and openai at it,
+and drives the fetchers, the router and the chart pipeline outside of the
+Streamlit UI. Each scenario reports its throughput and latency
+percentiles; the per-stage percentiles collected by tracing are reported
+after them.
+
+    python benchmark.py
+    python benchmark.py --latency-ms 120 --jitter-ms 60 --error-rate 0.05
+    python benchmark.py --chart-bars 1000,20000,100000 --json bench.json
+    python benchmark.py --rate 5 --quota 500   # with the app's default rate limit and a plan quota
+    python benchmark.py record          # refresh the fixtures from the live APIs
+
+Every fetch scenario asks for a different ticker on each call, so it
+measures the full upstream path rather than the response cache (the
+'quote (cached)' scenario measures the cache).
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import bar_store
+import dispatcher
+import indicators
+import intent_router
+import rapidapi_client
+import rate_limiter
+import response_cache
+import routing
+import routing_cache
+import stock_api
+import symbol_index
+import tracing
+import watchlist
+from chart_series import build_figure, parse_chart
+from downsample import downsample_series, point_budget
+from rapidapi_client import YAHOO_FINANCE15_HOST, YAHOO_FINANCE166_HOST
+from standin_server import ENDPOINT_FIXTURES, FIXTURES_DIR, StandinServer
+
+DEFAULT_ITERATIONS = 200
+DEFAULT_CONCURRENCY = 8
+DEFAULT_CHART_BARS = (1_000, 20_000, 100_000)
+# Chart-building iterations per payload size (large payloads are slow by design)
+CHART_ITERATIONS = 20
+
+LOCAL_QUESTIONS = [
+    "What is the latest price for AAPL?",
+    "Give me latest news for Goldman",
+    "Show me the chart for MSFT in US region for 1d with interval 5m",
+    "compare news and price for AAPL and MSFT",
+    "AAPL 6mo with 50-day SMA and RSI",
+    "Give me latest analyst recommendations for JP Morgan",
+]
+
+
+def percentile(ordered, quantile):
+    return ordered[min(len(ordered) - 1, int(quantile * len(ordered)))] if ordered else 0.0
+
+
+def run_scenario(name, operation, iterations, concurrency, setup=None):
+    """
+    Call operation(i) for i in range(iterations) on concurrency threads.
+
+    A call counts as failed when it raises or returns a dict with an 'error' key.
+
+    Returns:
+    dict: name, calls, errors, seconds, throughput (calls/s) and p50/p95/p99/max latency in ms.
+    """
+    if setup is not None:
+        setup()
+
+    def timed(i):
+        started = time.perf_counter()
+        try:
+            result = operation(i)
+            failed = isinstance(result, dict) and "error" in result
+        except Exception:
+            failed = True
+        return time.perf_counter() - started, failed
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(timed, range(iterations)))
+    elapsed = time.perf_counter() - started
+
+    durations = sorted(duration for duration, _ in results)
+    return {
+        "name": name,
+        "calls": iterations,
+        "errors": sum(failed for _, failed in results),
+        "seconds": elapsed,
+        "throughput": iterations / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(durations, 0.5) * 1000,
+        "p95_ms": percentile(durations, 0.95) * 1000,
+        "p99_ms": percentile(durations, 0.99) * 1000,
+        "max_ms": durations[-1] * 1000 if durations else 0.0,
+    }
+
+
+def _ticker(i):
+    # A fresh ticker per call defeats the response cache and the bar store
+    return f"T{i:05d}"
+
+
+def fetch_chart_payload(symbol, range, interval):
+    """
+    Download and parse a whole get-chart payload, bypassing the bar store
+    (which keeps only RETENTION_SECONDS of intraday bars).
+    """
+    def parse(data):
+        with tracing.span("parse_chart"):
+            return parse_chart(data, symbol)
+
+    params = {"region": "US", "range": range, "symbol": symbol, "interval": interval}
+    return response_cache.fetch_json(YAHOO_FINANCE166_HOST, "/api/stock/get-chart", params=params, parse=parse)
+
+
+def build_chart(series):
+    """The chart path of the app without Streamlit: downsample, build and serialize the figure."""
+    with tracing.span("figure"):
+        figure = build_figure(downsample_series(series, point_budget()))
+    with tracing.span("serialize_figure"):
+        figure.to_json()
+    return series
+
+
+def run_benchmarks(server, iterations, concurrency, chart_bars, workdir, rate=None):
+    """
+    Run every scenario against a started StandinServer and return the scenario reports.
+    rate is the rate limiter's requests per second per host (its default when None).
+    """
+    import openai
+    # Imported up front so the first chart does not pay for it
+    import plotly.graph_objects  # noqa: F401
+
+    for host in (YAHOO_FINANCE15_HOST, YAHOO_FINANCE166_HOST):
+        rate_limiter.get_limiter(host, "benchmark", rate=rate, burst=rate and max(1, int(rate)))
+        rapidapi_client.configure(host, "benchmark", base_url=server.url)
+    openai.api_key = "benchmark"
+    openai.api_base = f"{server.url}/v1"
+
+    store = bar_store.get_store()
+    store.root = os.path.join(workdir, "bars")
+    router = intent_router.IntentRouter(symbol_index.get_index())
+    routes_cache = routing_cache.RoutingCache(os.path.join(workdir, "routing_cache.sqlite3"))
+
+    def reset():
+        response_cache.cache.clear()
+        shutil.rmtree(store.root, ignore_errors=True)
+
+    reports = [
+        run_scenario("quote", lambda i: stock_api.fetch_realtime_stock_data(_ticker(i)),
+                     iterations, concurrency, reset),
+        run_scenario("quote (cached)", lambda i: stock_api.fetch_realtime_stock_data("AAPL"),
+                     iterations, concurrency, reset),
+        run_scenario("news", lambda i: stock_api.fetch_realtime_news(_ticker(i)),
+                     iterations, concurrency, reset),
+        run_scenario("profile", lambda i: stock_api.fetch_stock_profile(_ticker(i), "asset-profile") or {"error": ""},
+                     iterations, concurrency, reset),
+        run_scenario("analysts", lambda i: stock_api.get_analyst(_ticker(i)),
+                     iterations, concurrency, reset),
+        run_scenario("chart 1d/5m", lambda i: stock_api.fetch_chart_series(_ticker(i), "US", "1d", "5m"),
+                     iterations, concurrency, reset),
+        run_scenario("watchlist (50 tickers)",
+                     lambda i: watchlist.fetch_quotes([_ticker(i * 50 + n) for n in range(50)])[0] or {"error": ""},
+                     max(1, iterations // 10), concurrency, reset),
+        run_scenario("question fan-out (4 calls)",
+                     lambda i: list(dispatcher.run_calls([
+                         (name, {"stock_name": _ticker(i * 2 + n)})
+                         for name in ("get_stock_news", "get_stock_data") for n in range(2)
+                     ])),
+                     max(1, iterations // 4), concurrency, reset),
+        run_scenario("route (local parser)",
+                     lambda i: routing.route_question(LOCAL_QUESTIONS[i % len(LOCAL_QUESTIONS)],
+                                                      router, routes_cache, lambda: openai),
+                     iterations, concurrency),
+        # A different unparseable question every time, so each one goes to the chat completion
+        run_scenario("route (chat completion)",
+                     lambda i: routing.route_question(f"how is the company doing, take {i}?",
+                                                      router, routes_cache, lambda: openai) or {"error": ""},
+                     max(1, iterations // 4), concurrency),
+    ]
+
+    for bars in chart_bars:
+        server.chart_bars = bars
+        # Built from the payload rather than through the bar store, whose retention would trim
+        # the 15m bars to 62 days. The cache is emptied before every build, so each one
+        # downloads and parses the whole payload.
+        reports.append(run_scenario(f"chart build ({bars} bars)",
+                                    lambda i: reset() or build_chart(fetch_chart_payload("SYNTH", "5y", "15m")),
+                                    CHART_ITERATIONS, 1))
+        series = fetch_chart_payload("SYNTH", "5y", "15m")
+        specs = [{"name": name} for name in indicators.INDICATORS]
+        reports.append(run_scenario(
+            f"indicators x{len(specs)} ({len(series)} bars)",
+            lambda i: indicators.IndicatorEngine().compute_all(("SYNTH",), series, specs),
+            CHART_ITERATIONS, 1,
+        ))
+    server.chart_bars = None
+    return reports
+
+
+def format_report(reports, stage_stats):
+    lines = [f"{'scenario':<34}{'calls':>7}{'errors':>8}{'calls/s':>10}{'p50 ms':>10}{'p95 ms':>10}"
+             f"{'p99 ms':>10}{'max ms':>10}"]
+    for report in reports:
+        lines.append(
+            f"{report['name']:<34}{report['calls']:>7}{report['errors']:>8}{report['throughput']:>10.1f}"
+            f"{report['p50_ms']:>10.2f}{report['p95_ms']:>10.2f}{report['p99_ms']:>10.2f}{report['max_ms']:>10.2f}"
+        )
+    lines += ["", f"{'stage':<34}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"]
+    for stage, stats in stage_stats.items():
+        lines.append(f"{stage:<34}{stats['count']:>7}{stats['p50'] * 1000:>10.2f}"
+                     f"{stats['p95'] * 1000:>10.2f}{stats['p99'] * 1000:>10.2f}")
+    return "\n".join(lines)
+
+
+def record_fixtures(secrets_path, fixtures_dir=FIXTURES_DIR, symbol="AAPL"):
+    """
+    Replace the fixtures with live responses, using the keys in the Streamlit secrets file.
+    """
+    import openai
+    import toml
+
+    secrets = toml.load(secrets_path)
+    rapidapi_client.configure(YAHOO_FINANCE15_HOST, secrets["RAPIDAPI"]["KEY"])
+    rapidapi_client.configure(YAHOO_FINANCE166_HOST, secrets["NEWRAPIDAPI"]["KEY"])
+    requests_by_path = {
+        "/api/v1/markets/quote": (YAHOO_FINANCE15_HOST, {"ticker": symbol, "type": "STOCKS"}),
+        "/api/v1/markets/news": (YAHOO_FINANCE15_HOST, {"ticker": symbol, "type": "ALL"}),
+        "/api/v1/markets/stock/modules": (YAHOO_FINANCE15_HOST, {"ticker": symbol, "module": "asset-profile"}),
+        "/api/stock/get-chart": (YAHOO_FINANCE166_HOST,
+                                 {"region": "US", "range": "1d", "symbol": symbol, "interval": "5m"}),
+        "/api/stock/get-what-analysts-are-saying": (YAHOO_FINANCE166_HOST, {"region": "US", "symbol": symbol}),
+    }
+    recorded = {}
+    for path, (host, params) in requests_by_path.items():
+        recorded[path] = rapidapi_client.get(host, path, params=params).json()
+
+    openai.api_key = secrets["OPENAI"]["KEY"]
+    recorded["/v1/chat/completions"] = openai.ChatCompletion.create(
+        model="gpt-3.5-turbo",
+        messages=[{"role": "user", "content": f"Latest news and price for {symbol}?"}],
+        tools=[{"type": "function", "function": schema} for schema in routing.FUNCTIONS],
+        tool_choice="auto",
+    ).to_dict_recursive()
+
+    for path, payload in recorded.items():
+        with open(os.path.join(fixtures_dir, f"{ENDPOINT_FIXTURES[path]}.json"), "w", encoding="utf-8") as f:
+            json.dump(payload, f, indent=1)
+            f.write("\n")
+    return sorted(recorded)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("command", nargs="?", default="run", choices=["run", "record"])
+    parser.add_argument("--iterations", type=int, default=DEFAULT_ITERATIONS)
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="stand-in response delay")
+    parser.add_argument("--jitter-ms", type=float, default=20.0, help="+/- spread of the delay")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with 503")
+    parser.add_argument("--chart-bars", default=",".join(map(str, DEFAULT_CHART_BARS)),
+                        help="comma-separated sizes of the synthetic chart payloads")
+    parser.add_argument("--rate", type=float, default=1000.0,
+                        help="rate limiter requests/s per host (the default leaves the limiter out of the way)")
+    parser.add_argument("--quota", type=int, help="requests per hour the stand-in allows before answering 429")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", dest="json_path", help="also write the reports to this file")
+    parser.add_argument("--secrets", default=os.path.join(".streamlit", "secrets.toml"),
+                        help="secrets file used by 'record'")
+    args = parser.parse_args(argv)
+
+    if args.command == "record":
+        print("Recorded", ", ".join(record_fixtures(args.secrets)))
+        return 0
+
+    chart_bars = [int(size) for size in args.chart_bars.split(",") if size]
+    workdir = tempfile.mkdtemp(prefix="tikertalk-bench-")
+    tracing.metrics.clear()
+    try:
+        with StandinServer(latency=args.latency_ms / 1000, jitter=args.jitter_ms / 1000,
+                           error_rate=args.error_rate, quota=args.quota, seed=args.seed) as server:
+            reports = run_benchmarks(server, args.iterations, args.concurrency, chart_bars, workdir, args.rate)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    stage_stats = tracing.stage_stats()
+    print(format_report(reports, stage_stats))
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"settings": vars(args), "scenarios": reports, "stages": stage_stats}, f, indent=1)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,160 @@
+"""
+Columnar chart-series pipeline for the get-chart endpoint.
+
+parse_chart() turns the `timestamp` and `indicators.quote` arrays of a
+get-chart response into NumPy OHLCV arrays in one vectorized step and
+drops bars without a close price using a boolean mask. build_figure()
+renders the series with Plotly, switching to WebGL (Scattergl) and
+dropping the per-point markers once the series is large.
+"""
+import numpy as np
+
+OHLCV_FIELDS = ("open", "high", "low", "close", "volume")
+
+# Series longer than this are drawn with WebGL instead of SVG
+WEBGL_THRESHOLD = 1000
+# Series up to this length are drawn with a marker on every point
+MARKER_THRESHOLD = 200
+
+
+class ChartSeries:
+    """
+    OHLCV bars of one symbol as parallel NumPy arrays.
+
+    timestamps holds epoch seconds (int64); open, high, low, close and
+    volume are float64 arrays of the same length.
+    """
+
+    __slots__ = ("symbol", "timestamps") + OHLCV_FIELDS
+
+    def __init__(self, symbol, timestamps, open, high, low, close, volume):
+        self.symbol = symbol
+        self.timestamps = timestamps
+        self.open = open
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def nbytes(self):
+        """Memory held by the arrays, in bytes."""
+        return self.timestamps.nbytes + sum(getattr(self, name).nbytes for name in OHLCV_FIELDS)
+
+    def datetimes(self):
+        """Timestamps as a datetime64[s] array (UTC)."""
+        return self.timestamps.astype("datetime64[s]")
+
+    def take(self, index):
+        """Return a new series with only the bars selected by index (a mask, slice or index array)."""
+        return ChartSeries(
+            self.symbol,
+            self.timestamps[index],
+            *(getattr(self, name)[index] for name in OHLCV_FIELDS)
+        )
+
+
+def parse_chart(data, symbol=None):
+    """
+    Parse a get-chart response into a ChartSeries.
+
+    Parameters:
+    data (dict): The JSON response of the get-chart endpoint.
+    symbol (str): Symbol to use when the response does not name one.
+
+    Returns:
+    ChartSeries: The bars that have a close price, or None if the response has no chart data.
+    """
+    chart = data.get("chart") or {}
+    results = chart.get("result")
+    if not results:
+        return None
+    result = results[0]
+    symbol = (result.get("meta") or {}).get("symbol", symbol)
+
+    timestamps = np.asarray(result.get("timestamp") or [], dtype=np.int64)
+    quotes = (result.get("indicators") or {}).get("quote") or [{}]
+    quote = quotes[0]
+    n = len(timestamps)
+
+    columns = {}
+    for name in OHLCV_FIELDS:
+        values = quote.get(name)
+        # None becomes NaN when converting to float64
+        column = np.asarray(values, dtype=np.float64) if values else np.full(n, np.nan)
+        if len(column) != n:
+            padded = np.full(n, np.nan)
+            padded[:min(n, len(column))] = column[:n]
+            column = padded
+        columns[name] = column
+
+    series = ChartSeries(symbol, timestamps, **columns)
+    valid = ~np.isnan(series.close)
+    if valid.all():
+        return series
+    return series.take(valid)
+
+
+def build_figure(series, title=None, indicators=None):
+    """
+    Build an interactive Plotly figure of the close prices in a ChartSeries.
+
+    Parameters:
+    indicators (list): Optional (label, panel, {output: array}) entries from
+        IndicatorEngine.compute_all, aligned with series. 'price' indicators
+        are overlaid on the prices; every other panel gets its own subplot.
+
+    Returns:
+    plotly.graph_objects.Figure
+    """
+    import plotly.graph_objects as go
+
+    large = len(series) > WEBGL_THRESHOLD
+    trace_type = go.Scattergl if large else go.Scatter
+    with_markers = len(series) <= MARKER_THRESHOLD
+
+    indicators = indicators or []
+    panels = list(dict.fromkeys(panel for _, panel, _ in indicators if panel != "price"))
+    if panels:
+        from plotly.subplots import make_subplots
+        fig = make_subplots(
+            rows=1 + len(panels), cols=1, shared_xaxes=True, vertical_spacing=0.04,
+            row_heights=[0.6] + [0.4 / len(panels)] * len(panels),
+        )
+    else:
+        fig = go.Figure()
+
+    x = series.datetimes()
+    fig.add_trace(trace_type(
+        x=x,
+        y=series.close,
+        mode='lines+markers' if with_markers else 'lines',
+        name=f"Stock Price: {series.symbol}",
+        line=dict(color='blue'),
+        marker=dict(symbol='circle', size=6) if with_markers else None,
+    ), **({"row": 1, "col": 1} if panels else {}))
+
+    for label, panel, outputs in indicators:
+        position = {}
+        if panels:
+            position = {"row": 1 if panel == "price" else 2 + panels.index(panel), "col": 1}
+        for output, values in outputs.items():
+            name = label if len(outputs) == 1 else f"{label} {output}"
+            if output == "histogram":
+                fig.add_trace(go.Bar(x=x, y=values, name=name), **position)
+            else:
+                fig.add_trace(trace_type(x=x, y=values, mode='lines', name=name), **position)
+    for row, panel in enumerate(panels, start=2):
+        fig.update_yaxes(title_text=panel.upper(), row=row, col=1)
+
+    fig.update_layout(
+        title=title or f"Stock Chart for {series.symbol}",
+        xaxis_title=None if panels else "Time",
+        yaxis_title="Close Price",
+        template="plotly_dark",
+        # The range slider would sit between the price and the indicator panels
+        xaxis_rangeslider_visible=not panels
+    )
+    return fig
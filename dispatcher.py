@@ -0,0 +1,96 @@
+"""
+Concurrent execution of routed function calls.
+
+A question can route to several calls ('compare news and price for AAPL
+and MSFT' is four fetches). run_calls() submits them all to a bounded,
+process-wide thread pool and yields each result as soon as it is ready,
+so the page fills in while the slower fetches are still running and the
+total latency is close to that of the slowest single fetch.
+
+Handlers only fetch data; all Streamlit rendering stays on the script
+thread, which is the only one allowed to write to the page.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import search_index
+import tracing
+from stock_api import (fetch_realtime_stock_data, get_analyst, fetch_news_updates, fetch_stock_profile,
+                       fetch_chart_series, fetch_indicator_chart, fetch_portfolio_analytics)
+
+# Upper bound on fetches running at the same time across all sessions
+MAX_WORKERS = 8
+
+# Function name (as used in the OpenAI schemas) -> fetcher taking the call's arguments
+HANDLERS = {
+    # Only the articles newer than the caller's cursor ('since'), when it passes one
+    "get_stock_news": lambda args: fetch_news_updates(args["stock_name"], args.get("since")),
+    "get_stock_data": lambda args: fetch_realtime_stock_data(args["stock_name"]),
+    "get_stock_profile": lambda args: fetch_stock_profile(args["stock_name"], "asset-profile"),
+    "get_stock_chart": lambda args: fetch_chart_series(
+        args["stock_name"], args["region"], args["range"], args["interval"]
+    ),
+    "get_stock_indicators": lambda args: fetch_indicator_chart(
+        args["stock_name"], args["region"], args["range"], args["interval"], args["indicators"]
+    ),
+    "get_analyst_data": lambda args: get_analyst(args["symbol"], region="US"),
+    # The desk list of the symbol index when no symbols are given
+    "get_portfolio_analytics": lambda args: fetch_portfolio_analytics(
+        args.get("symbols") or [], args.get("benchmark") or "SPY", args.get("region") or "US",
+        args.get("range") or "1y", args.get("interval") or "1d", int(args.get("window") or 60),
+    ),
+    # Answered from the local index of fetched news and analyst reports, without RapidAPI
+    "search_documents": lambda args: search_index.search(
+        args.get("query") or "", args.get("symbols") or [], args.get("kind"),
+        since=args.get("since"), days=args.get("days"),
+    ),
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Return the process-wide thread pool, creating it on first use."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="tikertalk-fetch")
+        return _executor
+
+
+def run_call(function_name, args, handlers=HANDLERS):
+    """
+    Run a single call and return its result.
+
+    Returns:
+    The fetcher's result, or a dict with an 'error' key for unknown
+    functions and missing arguments.
+    """
+    handler = handlers.get(function_name)
+    if handler is None:
+        return {"error": f"Unknown function: {function_name}"}
+    with tracing.span("call", function=function_name):
+        try:
+            return handler(args)
+        except KeyError as e:
+            return {"error": f"Missing argument {e} for {function_name}."}
+
+
+def run_calls(calls, handlers=HANDLERS):
+    """
+    Run (function_name, args) calls concurrently.
+
+    Yields:
+    tuple: (index, function_name, args, result) for each call, in completion order.
+    """
+    executor = get_executor()
+    # Each call runs in a copy of the caller's context, so its spans join the caller's trace
+    futures = {
+        executor.submit(tracing.copy_context().run, run_call, function_name, args, handlers): index
+        for index, (function_name, args) in enumerate(calls)
+    }
+    for future in as_completed(futures):
+        index = futures[future]
+        function_name, args = calls[index]
+        yield index, function_name, args, future.result()
@@ -0,0 +1,83 @@
+"""
+Shape-preserving downsampling of chart series.
+
+Long ranges (5y at 1d, 1mo at 1m) have far more points than the chart
+has pixels, and every point is pushed over the websocket to the browser.
+lttb_indices() implements Largest-Triangle-Three-Buckets: it keeps the
+first and last point and, from every bucket in between, the point that
+forms the largest triangle with the previously kept point and the
+average of the next bucket. Peaks and troughs survive, flat stretches
+are thinned out.
+"""
+import numpy as np
+
+# Width (in pixels) Streamlit gives a Plotly chart unless told otherwise
+DEFAULT_CHART_WIDTH_PX = 700
+# More than ~2 points per pixel cannot be told apart on screen
+POINTS_PER_PIXEL = 2
+
+
+def point_budget(width_px=DEFAULT_CHART_WIDTH_PX, points_per_pixel=POINTS_PER_PIXEL):
+    """Return the number of points worth sending for a chart of the given width."""
+    return max(3, int(width_px * points_per_pixel))
+
+
+def lttb_indices(x, y, threshold):
+    """
+    Select at most threshold points of (x, y) with Largest-Triangle-Three-Buckets.
+
+    Parameters:
+    x (numpy.ndarray): Increasing x values (e.g., epoch seconds).
+    y (numpy.ndarray): y values of the same length, without NaNs.
+    threshold (int): Number of points to keep.
+
+    Returns:
+    numpy.ndarray: Sorted indices of the points to keep.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # Bucket i covers [edges[i], edges[i + 1]); the first and last point are kept as is
+    every = (n - 2) / (threshold - 2)
+    edges = np.minimum((np.arange(threshold) * every).astype(np.int64) + 1, n)
+    edges[-1] = n
+
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < threshold - 1 else n
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+
+        ax, ay = x[a], y[a]
+        areas = np.abs((ax - avg_x) * (y[start:end] - ay) - (ax - x[start:end]) * (avg_y - ay))
+        a = start + int(areas.argmax())
+        indices[i + 1] = a
+    return indices
+
+
+def downsample_indices(series, max_points):
+    """
+    Return the indices of the bars of a ChartSeries to plot, chosen by LTTB on the close prices.
+    """
+    if len(series) <= max_points:
+        return np.arange(len(series))
+    return lttb_indices(series.timestamps, series.close, max_points)
+
+
+def downsample_series(series, max_points):
+    """
+    Downsample a ChartSeries on its close prices.
+
+    Returns:
+    ChartSeries: The same series when it already fits, otherwise a new one with max_points bars.
+    """
+    if len(series) <= max_points:
+        return series
+    return series.take(downsample_indices(series, max_points))
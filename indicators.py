@@ -0,0 +1,311 @@
+"""
+Technical indicators over chart series.
+
+SMA, EMA, Bollinger bands, RSI, MACD, VWAP and rolling volatility are
+computed with NumPy/pandas rolling and exponentially weighted operations.
+IndicatorEngine caches every result per (series, indicator, params).
+When the same series comes back with new bars (or a re-stated last bar)
+and the same first bar, only the bars from the first changed one onwards
+are computed: rolling indicators look back one window from there, and
+the recursive ones (EMA, RSI, MACD, VWAP) continue from the state stored
+with the cached result at the bar before. A series whose first bar moved
+(the range start slides forward every day) is computed from scratch, so
+results never depend on history the series no longer holds.
+
+Every indicator function has the signature
+
+    fn(series, start, prior, **params) -> {output name: array}
+
+and returns values for bars start..len(series)-1. prior holds the value
+of every output at bar start - 1 (None when start is 0). Outputs whose
+name starts with '_' are internal state and are not plotted.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+SECONDS_PER_DAY = 24 * 3600
+# Seconds of trading in a US session, used to annualize intraday volatility
+SESSION_SECONDS = 6.5 * 3600
+TRADING_DAYS_PER_YEAR = 252
+
+
+def _rolling_tail(values, start, lookback, window, method):
+    """Apply a pandas rolling method for bars start.. of values, looking back lookback bars for context."""
+    lo = max(0, start - lookback)
+    rolled = getattr(pd.Series(values[lo:]).rolling(window), method)()
+    return rolled.to_numpy()[start - lo:]
+
+
+def _ewm(values, alpha, previous=None):
+    """Exponentially weighted mean (no bias adjustment), continuing from previous when given."""
+    if previous is None or np.isnan(previous):
+        return pd.Series(values).ewm(alpha=alpha, adjust=False).mean().to_numpy()
+    seeded = pd.Series(np.concatenate([[previous], values])).ewm(alpha=alpha, adjust=False).mean()
+    return seeded.to_numpy()[1:]
+
+
+def _last(prior, name):
+    return None if prior is None else prior[name]
+
+
+def sma(series, start, prior, window=20):
+    return {"sma": _rolling_tail(series.close, start, window - 1, window, "mean")}
+
+
+def ema(series, start, prior, window=20):
+    return {"ema": _ewm(series.close[start:], 2.0 / (window + 1), _last(prior, "ema"))}
+
+
+def bollinger(series, start, prior, window=20, num_std=2.0):
+    middle = _rolling_tail(series.close, start, window - 1, window, "mean")
+    lo = max(0, start - window + 1)
+    deviation = pd.Series(series.close[lo:]).rolling(window).std(ddof=0).to_numpy()[start - lo:]
+    return {
+        "middle": middle,
+        "upper": middle + num_std * deviation,
+        "lower": middle - num_std * deviation,
+    }
+
+
+def rsi(series, start, prior, window=14):
+    close = series.close
+    alpha = 1.0 / window
+    if start == 0:
+        delta = np.diff(close)
+        gains, losses = np.clip(delta, 0, None), np.clip(-delta, 0, None)
+        avg_gain = np.concatenate([[np.nan], _ewm(gains, alpha)])
+        avg_loss = np.concatenate([[np.nan], _ewm(losses, alpha)])
+    else:
+        delta = np.diff(close[start - 1:])
+        gains, losses = np.clip(delta, 0, None), np.clip(-delta, 0, None)
+        avg_gain = _ewm(gains, alpha, prior["_avg_gain"])
+        avg_loss = _ewm(losses, alpha, prior["_avg_loss"])
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        values = np.where(avg_loss == 0, 100.0, 100.0 - 100.0 / (1.0 + avg_gain / avg_loss))
+    values = np.where(np.isnan(avg_gain), np.nan, values)
+    # The first window bars are not warmed up yet
+    warmup = max(0, window - start)
+    values[:warmup] = np.nan
+    return {"rsi": values, "_avg_gain": avg_gain, "_avg_loss": avg_loss}
+
+
+def macd(series, start, prior, fast=12, slow=26, signal=9):
+    close = series.close[start:]
+    ema_fast = _ewm(close, 2.0 / (fast + 1), _last(prior, "_ema_fast"))
+    ema_slow = _ewm(close, 2.0 / (slow + 1), _last(prior, "_ema_slow"))
+    line = ema_fast - ema_slow
+    signal_line = _ewm(line, 2.0 / (signal + 1), _last(prior, "signal"))
+    return {
+        "macd": line,
+        "signal": signal_line,
+        "histogram": line - signal_line,
+        "_ema_fast": ema_fast,
+        "_ema_slow": ema_slow,
+    }
+
+
+def _bar_seconds(timestamps):
+    if len(timestamps) < 2:
+        return SECONDS_PER_DAY
+    return float(np.median(np.diff(timestamps)))
+
+
+def vwap(series, start, prior):
+    """Volume-weighted average price, anchored at each session for intraday bars."""
+    timestamps = series.timestamps[start:]
+    high, low, close = series.high[start:], series.low[start:], series.close[start:]
+    # Fall back to the close when high/low are missing
+    typical = np.where(np.isnan(high) | np.isnan(low), close, (high + low + close) / 3.0)
+    volume = np.nan_to_num(series.volume[start:])
+    if _bar_seconds(series.timestamps) < SECONDS_PER_DAY:
+        sessions = (timestamps // SECONDS_PER_DAY).astype(np.float64)
+    else:
+        sessions = np.zeros(len(timestamps))
+
+    pv, v = typical * volume, volume
+    if prior is not None:
+        # Carry the running sums of the previous bar; they only count if its session continues
+        pv = np.concatenate([[prior["_cum_pv"]], pv])
+        v = np.concatenate([[prior["_cum_v"]], v])
+        sessions = np.concatenate([[prior["_session"]], sessions])
+
+    # Cumulative sums that restart at every session boundary
+    index = np.arange(len(sessions))
+    session_start = np.concatenate([[True], sessions[1:] != sessions[:-1]])
+    first = np.maximum.accumulate(np.where(session_start, index, 0))
+    cum_pv, cum_v = np.cumsum(pv), np.cumsum(v)
+    cum_pv = cum_pv - cum_pv[first] + pv[first]
+    cum_v = cum_v - cum_v[first] + v[first]
+    if prior is not None:
+        cum_pv, cum_v, sessions = cum_pv[1:], cum_v[1:], sessions[1:]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        values = np.where(cum_v > 0, cum_pv / cum_v, np.nan)
+    return {"vwap": values, "_cum_pv": cum_pv, "_cum_v": cum_v, "_session": sessions}
+
+
+def periods_per_year(timestamps):
+    """Number of bars per year for the spacing of timestamps."""
+    seconds = _bar_seconds(timestamps)
+    if seconds < SECONDS_PER_DAY / 2:
+        return TRADING_DAYS_PER_YEAR * SESSION_SECONDS / seconds
+    if seconds <= SECONDS_PER_DAY * 1.5:
+        return TRADING_DAYS_PER_YEAR
+    return 365.25 * SECONDS_PER_DAY / seconds
+
+
+def volatility(series, start, prior, window=20):
+    """Annualized rolling standard deviation of log returns."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        returns = np.concatenate([[np.nan], np.diff(np.log(series.close))])
+    deviation = _rolling_tail(returns, start, window, window, "std")
+    return {"volatility": deviation * np.sqrt(periods_per_year(series.timestamps))}
+
+
+# name -> (function, default parameters, panel the outputs are drawn on)
+INDICATORS = {
+    "sma": (sma, {"window": 20}, "price"),
+    "ema": (ema, {"window": 20}, "price"),
+    "bollinger": (bollinger, {"window": 20, "num_std": 2.0}, "price"),
+    "vwap": (vwap, {}, "price"),
+    "rsi": (rsi, {"window": 14}, "rsi"),
+    "macd": (macd, {"fast": 12, "slow": 26, "signal": 9}, "macd"),
+    "volatility": (volatility, {"window": 20}, "volatility"),
+}
+
+
+def indicator_label(name, params):
+    """Human-readable label such as 'SMA(50)' or 'MACD(12, 26, 9)'."""
+    values = ", ".join(f"{value:g}" for value in params.values())
+    return f"{name.upper()}({values})" if values else name.upper()
+
+
+class _Result:
+    __slots__ = ("timestamps", "close", "outputs")
+
+    def __init__(self, timestamps, close, outputs):
+        self.timestamps = timestamps
+        self.close = close
+        self.outputs = outputs
+
+
+class IndicatorEngine:
+    """
+    Computes indicators and caches the results per (series key, indicator, params).
+
+    Parameters:
+    max_entries (int): Number of cached results kept before the least recently used are evicted.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.full_computes = 0
+        self.incremental_updates = 0
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+
+    def compute(self, series_key, series, name, params=None):
+        """
+        Return {output name: array aligned with series} for one indicator.
+
+        Parameters:
+        series_key (tuple): Identifies the series, e.g. (symbol, region, interval).
+        series (ChartSeries): The bars.
+        name (str): Indicator name, one of INDICATORS.
+        params (dict): Overrides of the indicator's default parameters.
+
+        Raises:
+        ValueError: If the indicator is unknown.
+        """
+        if name not in INDICATORS:
+            raise ValueError(f"Unknown indicator: {name}")
+        function, defaults, _ = INDICATORS[name]
+        params = dict(defaults, **{key: value for key, value in (params or {}).items() if key in defaults})
+        key = (series_key, name, tuple(sorted(params.items())))
+
+        with self._lock:
+            cached = self._results.get(key)
+            if cached is not None:
+                self._results.move_to_end(key)
+
+        start = self._reusable(cached, series)
+        if start == len(series) and start > 0:
+            return {output: values[:start] for output, values in cached.outputs.items()}
+
+        if start == 0:
+            prior, kept = None, None
+            self.full_computes += 1
+        else:
+            prior = {output: values[start - 1] for output, values in cached.outputs.items()}
+            kept = {output: values[:start] for output, values in cached.outputs.items()}
+            self.incremental_updates += 1
+
+        fresh = function(series, start, prior, **params)
+        if kept is not None:
+            fresh = {output: np.concatenate([kept[output], values]) for output, values in fresh.items()}
+
+        result = _Result(np.array(series.timestamps), np.array(series.close), fresh)
+        with self._lock:
+            self._results[key] = result
+            self._results.move_to_end(key)
+            while len(self._results) > self.max_entries:
+                self._results.popitem(last=False)
+        return fresh
+
+    @staticmethod
+    def _reusable(cached, series):
+        """
+        Return count: the series' first count bars equal the first cached
+        bars, so their results can be reused.
+        """
+        if cached is None or not len(series) or not len(cached.timestamps):
+            return 0
+        # Recursive indicators were seeded from the bars before a later start, and
+        # rolling ones looked back over them; a cold compute would differ
+        if cached.timestamps[0] != series.timestamps[0]:
+            return 0
+        overlap = min(len(cached.timestamps), len(series))
+        same = (
+            (cached.timestamps[:overlap] == series.timestamps[:overlap])
+            & (cached.close[:overlap] == series.close[:overlap])
+        )
+        return overlap if same.all() else int(np.argmin(same))
+
+    def compute_all(self, series_key, series, specs):
+        """
+        Compute several indicators.
+
+        Parameters:
+        specs (list): Dicts like {'name': 'sma', 'window': 50}.
+
+        Returns:
+        list: (label, panel, {visible output name: array}) per indicator.
+        """
+        computed = []
+        for spec in specs:
+            name = spec["name"]
+            if name not in INDICATORS:
+                raise ValueError(f"Unknown indicator: {name}")
+            _, defaults, panel = INDICATORS[name]
+            params = dict(defaults, **{key: value for key, value in spec.items() if key in defaults})
+            outputs = self.compute(series_key, series, name, params)
+            visible = {output: values for output, values in outputs.items() if not output.startswith("_")}
+            computed.append((indicator_label(name, params), panel, visible))
+        return computed
+
+
+def take(computed, index):
+    """Select the bars at index (a mask, slice or index array) from compute_all() results."""
+    return [
+        (label, panel, {output: values[index] for output, values in outputs.items()})
+        for label, panel, outputs in computed
+    ]
+
+
+# Process-wide engine shared by every session
+engine = IndicatorEngine()
+
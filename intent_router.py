@@ -0,0 +1,442 @@
+"""
+Local, deterministic intent router.
+
+Most questions follow the phrasing shown in the sidebar ("Show me the
+chart for AAPL in US region for 1d with interval 5m"), so they can be
+routed without the OpenAI function-calling round trip. parse() scores
+each intent by keywords, resolves tickers and company names through the
+symbol index, pulls the region, range and interval out with precompiled
+patterns and reports a confidence. The app only falls back to the LLM
+when that confidence is below CONFIDENCE_THRESHOLD.
+"""
+import re
+import threading
+import time
+from collections import Counter
+
+REGIONS = ["US", "IN", "JP", "APAC", "EU"]
+RANGES = ["1d", "5d", "1mo", "3mo", "6mo", "1y", "5y"]
+INTERVALS = ["1m", "5m", "15m", "30m", "1h", "1d", "1wk", "1mo"]
+
+DEFAULT_REGION = "US"
+CONFIDENCE_THRESHOLD = 0.75
+# Ticker certainty of a company named by a unique partial name ('Goldman')
+PREFIX_CERTAINTY = 0.9
+
+# Score of a single primary keyword ('news', 'chart', ...); secondary intents need at least this
+PRIMARY_KEYWORD_SCORE = 3
+# Upper bound on the fetches a single question can trigger
+MAX_CALLS = 10
+
+# Indicator names of the get_stock_indicators schema
+INDICATOR_NAMES = ["sma", "ema", "bollinger", "vwap", "rsi", "macd", "volatility"]
+# Range and interval used for indicators when the question names none
+DEFAULT_INDICATOR_RANGE = "1y"
+DEFAULT_INDICATOR_INTERVAL = "1d"
+# Benchmark, range, interval and rolling beta window of portfolio questions that name none
+DEFAULT_BENCHMARK = "SPY"
+DEFAULT_PORTFOLIO_RANGE = "1y"
+DEFAULT_PORTFOLIO_INTERVAL = "1d"
+DEFAULT_BETA_WINDOW = 60
+# Intents that answer without a ticker: the portfolio covers the desk list, the search every stock
+UNIVERSE_INTENTS = ("get_portfolio_analytics", "search_documents")
+
+# Keyword weights for each routable function
+INTENT_KEYWORDS = {
+    "get_stock_news": {
+        "news": 3, "headline": 3, "headlines": 3, "article": 2, "articles": 2, "stories": 2,
+    },
+    "get_stock_data": {
+        "price": 3, "quote": 3, "data": 2, "p/e": 3, "pe": 2, "ratio": 1, "market cap": 3,
+        "volume": 2, "trading": 1, "stock price": 1,
+    },
+    "get_stock_profile": {
+        "profile": 3, "about": 1, "company": 1, "sector": 2, "industry": 2, "ceo": 2,
+        "employees": 2, "business": 1, "headquarters": 2,
+    },
+    "get_stock_chart": {
+        "chart": 3, "graph": 3, "plot": 3, "trend": 2, "dashboard": 2, "analytics": 2,
+        "interval": 2, "region": 1,
+    },
+    "get_analyst_data": {
+        "analyst": 3, "analysts": 3, "recommendation": 3, "recommendations": 3, "rating": 2,
+        "ratings": 2, "target price": 2, "upgrade": 2, "downgrade": 2,
+    },
+    "get_stock_indicators": {
+        "sma": 3, "ema": 3, "moving average": 3, "bollinger": 3, "rsi": 3, "macd": 3, "vwap": 3,
+        "volatility": 3, "indicator": 3, "indicators": 3,
+    },
+    "get_portfolio_analytics": {
+        "correlation": 3, "correlations": 3, "correlated": 3, "beta": 3, "betas": 3, "drawdown": 3,
+        "drawdowns": 3, "portfolio": 3, "volatility ranking": 4, "most volatile": 4, "least volatile": 4,
+        "ranking": 2, "rank": 2, "universe": 2, "matrix": 2, "risk": 2,
+    },
+    # Searches the news and analyst reports fetched earlier; the news and analyst keywords pick which
+    "search_documents": {
+        "said about": 4, "say about": 4, "says about": 4, "saying about": 4, "written about": 4,
+        "wrote about": 4, "talked about": 4, "mentioning": 4, "mentioned": 3, "mentions": 3, "search": 3,
+        "find": 2,
+    },
+}
+
+# Uppercase words that look like tickers but are not
+NOT_TICKERS = frozenset(
+    REGIONS + ["I", "A", "PE", "P", "E", "CEO", "AND", "OR", "THE", "FOR", "ME"]
+    + [name.upper() for name in INDICATOR_NAMES]
+)
+
+QUESTION_WORDS = frozenset(
+    """a about all american an and any are as at bands bank banks be by can compare day days did do
+    does financial first for from general get give global has have how i in international is it its
+    last latest me my of on or over period please range recent s see show stock stocks tell than
+    that the their them this to today united versus vs was what whats when where which who why will
+    with you your""".split()
+)
+# Words that never name a company on their own: every keyword plus common question words
+STOP_WORDS = frozenset(
+    [word for keywords in INTENT_KEYWORDS.values() for phrase in keywords for word in phrase.split()]
+    + [name.lower() for name in REGIONS] + INDICATOR_NAMES
+) | QUESTION_WORDS
+# Words left out of search queries besides the question words
+SEARCH_STOP_WORDS = QUESTION_WORDS | frozenset(
+    [name.lower() for name in REGIONS]
+    + """anything been company companies everything had say said says there they this us we were
+    week weeks month months year years""".split()
+)
+
+_RANGE_ALT = "|".join(sorted(RANGES, key=len, reverse=True))
+_INTERVAL_ALT = "|".join(sorted(INTERVALS, key=len, reverse=True))
+# Longest keywords first, so 'target price' is consumed before 'price' is looked for
+_KEYWORD_PATTERNS = sorted(
+    (
+        (len(word), name, re.compile(r"(?<!\w)" + re.escape(word) + r"(?!\w)"), weight)
+        for name, keywords in INTENT_KEYWORDS.items()
+        for word, weight in keywords.items()
+    ),
+    key=lambda item: item[0],
+    reverse=True,
+)
+_INTERVAL_RE = re.compile(r"\binterval\s+(?:of\s+)?(" + _INTERVAL_ALT + r")\b", re.IGNORECASE)
+_RANGE_RE = re.compile(r"\b(?:for|range(?:\s+of)?|over|last)\s+(" + _RANGE_ALT + r")\b", re.IGNORECASE)
+# A range token on its own ('AAPL 6mo with RSI'), only used for indicator questions
+_BARE_RANGE_RE = re.compile(r"\b(" + _RANGE_ALT + r")\b", re.IGNORECASE)
+# '50-day SMA', 'SMA 50', 'SMA(50)', '20 period bollinger bands', 'RSI'
+_INDICATOR_RE = re.compile(
+    r"(?:\b(\d{1,3})[- ]?(?:days?|periods?|bars?)?\s+)?"
+    r"\b(sma|ema|simple moving average|exponential moving average|moving average|bollinger(?:\s+bands?)?"
+    r"|rsi|macd|vwap|volatility)\b"
+    r"(?:\s*\(?\s*(\d{1,3})\b\s*\)?)?",
+    re.IGNORECASE,
+)
+_INDICATOR_ALIASES = {
+    "simple moving average": "sma", "moving average": "sma", "exponential moving average": "ema",
+}
+_REGION_RE = re.compile(
+    r"\b(?:in\s+(?:the\s+)?(" + "|".join(REGIONS) + r")\b(?:\s+region)?|("
+    + "|".join(REGIONS) + r")\s+region)",
+    re.IGNORECASE,
+)
+_SYMBOL_RE = re.compile(r"\$?\b([A-Z]{1,5}(?:[.-][A-Z])?)\b")
+_DOLLAR_SYMBOL_RE = re.compile(r"\$([A-Za-z]{1,5}(?:[.-][A-Za-z])?)\b")
+# 'beta against SPY', 'betas vs QQQ', 'benchmarked to SPY'
+_BENCHMARK_RE = re.compile(
+    r"\b(?:betas?\b[^.?!]*?\b(?:against|vs\.?|versus|relative\s+to)|benchmark(?:ed)?\s+(?:against|to)?)"
+    r"\s*\$?([A-Za-z]{1,5}(?:[.-][A-Za-z])?)\b",
+    re.IGNORECASE,
+)
+# 'today', 'this week', 'past month', 'in the last 10 days'
+_PERIOD_RE = re.compile(
+    r"\b(?:(today)|(?:this|the\s+current)\s+(week|month|year)"
+    r"|(?:in\s+)?(?:the\s+)?(?:past|last)\s+(?:(\d{1,3})\s+)?(days?|weeks?|months?|years?))\b",
+    re.IGNORECASE,
+)
+_PERIOD_DAYS = {"day": 1, "week": 7, "month": 30, "year": 365}
+_TERM_RE = re.compile(r"[^\W_]+")
+# '90-day beta', '30 bar rolling beta'
+_BETA_WINDOW_RE = re.compile(r"\b(\d{1,3})[- ]?(?:days?|bars?|periods?)\s+(?:rolling\s+)?betas?\b", re.IGNORECASE)
+
+
+def _replace_spans(text, matches, replacement):
+    """Replace the span of every SymbolMatch in text with replacement(match)."""
+    for match in reversed(matches):
+        text = text[:match.start] + replacement(match) + text[match.end:]
+    return text
+
+
+class RouteDecision:
+    """Result of routing a question: the function to call and its arguments."""
+
+    __slots__ = ("function_name", "args", "confidence", "source")
+
+    def __init__(self, function_name, args, confidence, source):
+        self.function_name = function_name
+        self.args = args
+        self.confidence = confidence
+        self.source = source
+
+    def __repr__(self):
+        return (f"RouteDecision({self.function_name!r}, {self.args!r}, "
+                f"confidence={self.confidence:.2f}, source={self.source!r})")
+
+
+class IntentRouter:
+    """
+    Keyword/pattern based question parser.
+
+    Parameters:
+    index (SymbolIndex): Company name/alias -> symbol index used to resolve tickers.
+    """
+
+    def __init__(self, index):
+        self.index = index
+
+    def find_companies(self, question):
+        """Return the SymbolMatch of every company name or alias in a question."""
+        return self.index.find(question, STOP_WORDS)
+
+    def resolve_tickers(self, question):
+        """
+        Find every stock symbol in a question, in order of appearance.
+
+        Returns:
+        tuple: (symbols, certainty) where certainty is 1.0 for known symbols and
+        company names, PREFIX_CERTAINTY for partial names ('Goldman'), 0.6 for
+        unknown symbol-like words, the similarity for misspelled names and 0
+        when nothing was found.
+        """
+        found = [
+            (match.start(), match.group(1)) for match in _SYMBOL_RE.finditer(question)
+            if match.group(1) in self.index and match.group(1) not in NOT_TICKERS
+        ]
+        certainty = 1.0
+        for match in self.find_companies(question):
+            found.append((match.start, match.symbol))
+            if match.kind == "prefix":
+                certainty = min(certainty, PREFIX_CERTAINTY)
+        if found:
+            symbols = list(dict.fromkeys(symbol for _, symbol in sorted(found)))
+            return symbols, certainty
+        unknown = [m.group(1) for m in _SYMBOL_RE.finditer(question) if m.group(1) not in NOT_TICKERS]
+        if unknown:
+            return list(dict.fromkeys(unknown)), 0.6
+        # Last resort: a misspelled company name, as certain as it is similar
+        fuzzy = self.index.find_fuzzy(question, STOP_WORDS)
+        if fuzzy:
+            return list(dict.fromkeys(match.symbol for match in fuzzy)), min(match.score for match in fuzzy)
+        return [], 0.0
+
+    def resolve_ticker(self, question):
+        """Return (symbol, certainty) for the first stock symbol in a question."""
+        symbols, certainty = self.resolve_tickers(question)
+        return (symbols[0], certainty) if symbols else (None, 0.0)
+
+    def canonicalize(self, question):
+        """Replace company names and '$'-prefixed symbols in a question with the plain symbol."""
+        question = _DOLLAR_SYMBOL_RE.sub(r"\1", question)
+        return _replace_spans(question, self.find_companies(question), lambda match: match.symbol)
+
+    @staticmethod
+    def parse_indicators(question):
+        """
+        Return the indicators named in a question as dicts like {'name': 'sma', 'window': 50}.
+        """
+        specs = []
+        for match in _INDICATOR_RE.finditer(question):
+            name = match.group(2).lower()
+            name = _INDICATOR_ALIASES.get(name, name.split()[0])
+            spec = {"name": name}
+            window = match.group(1) or match.group(3)
+            if window and name not in ("macd", "vwap"):
+                spec["window"] = int(window)
+            if spec not in specs:
+                specs.append(spec)
+        return specs
+
+    @staticmethod
+    def parse_benchmark(question):
+        """Return the benchmark symbol a portfolio question names ('beta against SPY'), or None."""
+        match = _BENCHMARK_RE.search(question)
+        return match.group(1).upper() if match else None
+
+    @staticmethod
+    def parse_since(question, now=None):
+        """
+        Return the epoch time a question's period starts at, or None when it names no period.
+
+        'today', 'this week', 'this month' and 'this year' start at local
+        midnight of today, the Monday, the 1st and January 1st; 'past 2 weeks'
+        and the like reach back that long from now.
+        """
+        match = _PERIOD_RE.search(question)
+        if not match:
+            return None
+        now = time.time() if now is None else now
+        if match.group(1) or match.group(2):
+            today = time.localtime(now)
+            back = {"week": today.tm_wday, "month": today.tm_mday - 1, "year": today.tm_yday - 1}.get(
+                (match.group(2) or "").lower(), 0)
+            # mktime normalizes a negative day of the month and picks the DST offset itself
+            return time.mktime((today.tm_year, today.tm_mon, today.tm_mday - back, 0, 0, 0, 0, 0, -1))
+        return now - int(match.group(3) or 1) * _PERIOD_DAYS[match.group(4).lower().rstrip("s")] * 24 * 60 * 60
+
+    def search_terms(self, question, symbols):
+        """The words of a search question that are not tickers, company names, periods or question words."""
+        text = _replace_spans(question, self.find_companies(question), lambda match: " ")
+        text = _SYMBOL_RE.sub(lambda match: " " if match.group(1) in symbols else match.group(0), text)
+        text = _PERIOD_RE.sub(" ", text).lower()
+        for _, name, pattern, _ in _KEYWORD_PATTERNS:
+            if name in ("search_documents", "get_stock_news", "get_analyst_data"):
+                text = pattern.sub(" ", text)
+        words = [word for word in _TERM_RE.findall(text) if word not in SEARCH_STOP_WORDS]
+        return " ".join(dict.fromkeys(words))
+
+    def score_intents(self, text):
+        """Return the keyword score of every intent for lower-cased text."""
+        scores = dict.fromkeys(INTENT_KEYWORDS, 0)
+        for _, name, pattern, weight in _KEYWORD_PATTERNS:
+            text, found = pattern.subn(" ", text)
+            if found:
+                scores[name] += weight
+        return scores
+
+    def parse_all(self, question):
+        """
+        Parse a question into one RouteDecision per (intent, ticker) pair.
+
+        'compare news and price for AAPL and MSFT' yields four decisions;
+        portfolio analytics and search are one decision over all the tickers
+        (or over the desk list / every stock when the question names none). Every
+        intent with a primary keyword and at least half the top score is
+        included. All decisions share one confidence, based on how far the
+        weakest included intent is ahead of the strongest excluded one.
+
+        Returns:
+        list: The decisions (at most MAX_CALLS), empty if no intent or ticker was found.
+        """
+        # Company names like 'Wells Fargo & Company' must not count as keywords
+        text = _replace_spans(question, self.find_companies(question), lambda match: " ").lower()
+        scores = self.score_intents(text)
+
+        interval = _INTERVAL_RE.search(question)
+        # Remove the interval so '1d' in 'interval 1d' is not read as the range too
+        without_interval = _INTERVAL_RE.sub(" ", question)
+        chart_range = _RANGE_RE.search(without_interval)
+        region = _REGION_RE.search(question)
+        # In a portfolio question the range is the portfolio's, not a sign of a chart request
+        if (interval or chart_range) and not scores["get_portfolio_analytics"]:
+            scores["get_stock_chart"] += 2
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        best = ranked[0][1]
+        if best == 0:
+            return []
+        symbols, ticker_certainty = self.resolve_tickers(question)
+
+        included = [ranked[0]] + [
+            (name, score) for name, score in ranked[1:]
+            if score >= PRIMARY_KEYWORD_SCORE and score * 2 >= best
+        ]
+        excluded = ranked[len(included):]
+        if any(name == "get_stock_indicators" for name, _ in included):
+            # The indicator chart already shows the prices
+            included = [(name, score) for name, score in included if name != "get_stock_chart"]
+        search_kind = None
+        if any(name == "search_documents" for name, _ in included):
+            # The search covers the news and analyst reports; their keywords only choose which
+            search_kind = "analyst" if scores["get_analyst_data"] else "news" if scores["get_stock_news"] else None
+            included = [(name, score) for name, score in included
+                        if name not in ("get_stock_news", "get_analyst_data")]
+        benchmark = None
+        if any(name == "get_portfolio_analytics" for name, _ in included):
+            benchmark = self.parse_benchmark(question)
+            symbols = [symbol for symbol in symbols if symbol != benchmark]
+        if not symbols:
+            # No stocks named: the portfolio covers the desk list and the search every stock,
+            # and the other intents have nothing to fetch
+            included = [(name, score) for name, score in included if name in UNIVERSE_INTENTS]
+            if not included:
+                return []
+            ticker_certainty = 1.0
+        runner_up = excluded[0][1] if excluded else 0
+
+        # A clear keyword lead gives full intent confidence, a tie gives none
+        intent_confidence = min(1.0, (included[-1][1] - runner_up) / 3.0)
+        confidence = intent_confidence * ticker_certainty
+
+        decisions = []
+        for function_name, _ in included:
+            if function_name == "get_portfolio_analytics":
+                # One decision for all the symbols
+                window = _BETA_WINDOW_RE.search(question)
+                bare_range = _BARE_RANGE_RE.search(without_interval)
+                args = {
+                    "symbols": symbols,
+                    "benchmark": benchmark or DEFAULT_BENCHMARK,
+                    "region": (region.group(1) or region.group(2)).upper() if region else DEFAULT_REGION,
+                    "range": (chart_range or bare_range).group(1).lower() if chart_range or bare_range
+                    else DEFAULT_PORTFOLIO_RANGE,
+                    "interval": interval.group(1).lower() if interval else DEFAULT_PORTFOLIO_INTERVAL,
+                    "window": int(window.group(1)) if window else DEFAULT_BETA_WINDOW,
+                }
+                decisions.append(RouteDecision(function_name, args, confidence, "local"))
+                continue
+            if function_name == "search_documents":
+                args = {
+                    "query": self.search_terms(question, symbols),
+                    "symbols": symbols,
+                    "kind": search_kind,
+                    "since": self.parse_since(question),
+                }
+                decisions.append(RouteDecision(function_name, args, confidence, "local"))
+                continue
+            for symbol in symbols:
+                if function_name == "get_analyst_data":
+                    args = {"symbol": symbol}
+                elif function_name == "get_stock_chart":
+                    args = {
+                        "stock_name": symbol,
+                        "region": (region.group(1) or region.group(2)).upper() if region else DEFAULT_REGION,
+                        "range": chart_range.group(1).lower() if chart_range else None,
+                        "interval": interval.group(1).lower() if interval else None,
+                    }
+                    if args["range"] is None or args["interval"] is None:
+                        confidence = 0.0
+                elif function_name == "get_stock_indicators":
+                    bare_range = _BARE_RANGE_RE.search(without_interval)
+                    args = {
+                        "stock_name": symbol,
+                        "region": (region.group(1) or region.group(2)).upper() if region else DEFAULT_REGION,
+                        "range": (chart_range or bare_range).group(1).lower() if chart_range or bare_range
+                        else DEFAULT_INDICATOR_RANGE,
+                        "interval": interval.group(1).lower() if interval else DEFAULT_INDICATOR_INTERVAL,
+                        "indicators": self.parse_indicators(question),
+                    }
+                else:
+                    args = {"stock_name": symbol}
+                decisions.append(RouteDecision(function_name, args, confidence, "local"))
+
+        for decision in decisions:
+            decision.confidence = confidence
+        return decisions[:MAX_CALLS]
+
+    def parse(self, question):
+        """
+        Parse a question into its first RouteDecision, or return None if no intent or ticker was found.
+        """
+        decisions = self.parse_all(question)
+        return decisions[0] if decisions else None
+
+
+# Process-wide count of how many questions each routing path handled
+route_counter = Counter()
+_counter_lock = threading.Lock()
+
+
+def record_route(source):
+    with _counter_lock:
+        route_counter[source] += 1
+
+
+def route_stats():
+    with _counter_lock:
+        return dict(route_counter)
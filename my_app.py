@@ -1,12 +1,30 @@
+import time
+_rerun_started = time.perf_counter()
+
 import streamlit as st
-import openai
-import requests
-import plotly.graph_objects as go
-import pandas as pd
+import calendar
 import json
+import os
+import sys
+import uuid
+from datetime import datetime
 # from dotenv import load_dotenv
 # import os
-import requests
+# openai, plotly and the chart pipeline are imported lazily, on first use, to keep reruns fast
+import rapidapi_client
+import rate_limiter
+import response_cache
+import response_models
+import shared_cache
+import intent_router
+import routing
+import routing_cache
+import perf_budget
+import tracing
+import symbol_index
+from rapidapi_client import YAHOO_FINANCE15_HOST, YAHOO_FINANCE166_HOST
+import dispatcher
+from stock_api import fetch_chart_series
 
 # Load .env file
 # load_dotenv()
@@ -14,6 +32,10 @@ import requests
 # Fetch the RapidAPI key
 rapidapi_key = st.secrets["RAPIDAPI"]["KEY"]
 newrapidapi_key = st.secrets["NEWRAPIDAPI"]["KEY"]
+
+# Register the keys with the shared keep-alive client (one session per host)
+rapidapi_client.configure(YAHOO_FINANCE15_HOST, rapidapi_key)
+rapidapi_client.configure(YAHOO_FINANCE166_HOST, newrapidapi_key)
 # Sidebar description
 st.sidebar.title('Tiker Talk Application')
 st.sidebar.write("""
@@ -24,6 +46,9 @@ st.sidebar.write("""
     3. **Profile**: Get detailed information about a stock's profile.
     4. **Stock Chart**: Visualize stock trends with charts.
     5. **Stock Analyst Recommendations**: See the latest analyst recommendations for a stock.
+    6. **Technical Indicators**: Overlay SMA, EMA, Bollinger bands, RSI, MACD, VWAP or volatility on the chart.
+    7. **Portfolio Analytics**: Correlations, betas, volatility ranking and drawdowns across many stocks.
+    8. **Search**: Search the news and analyst reports fetched so far, without another API call.
     
     ## How to Ask Questions:
     - **Stock Data**: 
@@ -47,234 +72,35 @@ st.sidebar.write("""
     - **Analyst Recommendations**: 
         - "Give me latest analyst recommendations for AAPL?"
     
+    - **Technical Indicators**: 
+        - "AAPL 6mo with 50-day SMA and RSI"
+        - Range and interval default to 1y and 1d.
+    
+    - **Portfolio Analytics**: 
+        - "Correlation matrix and 90-day beta for AAPL, MSFT and TSLA against SPY"
+        - "Rank the most volatile stocks over 6mo" (no symbols: the desk list)
+    
+    - **Search**: 
+        - "What have analysts said about margins at AAPL this month?"
+        - "Search news for layoffs in the past 2 weeks"
+    
     *Note: Always include the stock symbol (e.g., AAPL) when asking a question.*
 """)
 
-# Stock Symbol mapping (Company Name -> stock Symbol)
-stock_mapping = {
-'Microsoft': 'MSFT',
-'Amazon': 'AMZN',
-'Tesla': 'TSLA',
-'Apple': 'AAPL',
-'Johnson & Johnson': 'JNJ',
-'Bank of America': 'BAC',
-'Salesforce': 'CRM',
-'AbbVie': 'ABBV',
-'SAP SE': 'SAP',
-'Sumitomo Mitsui Financial Group': 'SMFG',
-'Chevron': 'CVX',
-'ASML': 'ASML',
-'Coca-Cola': 'KO',
-'T-Mobile US': 'TMUS',
-'Merck & Co.': 'MRK',
-'Adobe': 'ADBE',
-'Wells Fargo': 'WFC',
-'Toyota Motor': 'TM',
-'Cisco Systems': 'CSCO',
-'Comcast': 'CCZ',
-'ServiceNow': 'NOW',
-'Accenture': 'ACN',
-'PepsiCo': 'PEP',
-'Alibaba': 'BABA',
-'McDonald\'s': 'MCD',
-'IBM': 'IBM',
-'American Express': 'AXP',
-'Linde': 'LIN',
-'AstraZeneca': 'AZN',
-'Berkshire Hathaway Inc.': 'BRK-B',
-'JPMorgan Chase & Co.': 'JPM',
-'Visa Inc.': 'V',
-'Mastercard Incorporated': 'MA',
-'Wells Fargo & Company': 'WFC',
-'Blackstone Inc.': 'BX',
-'The Goldman Sachs Group, Inc.': 'GS',
-'Morgan Stanley': 'MS',
-'Citigroup Inc.': 'C',
-'Royal Bank of Canada': 'RY',
-'BlackRock, Inc.': 'BLK',
-'S&P Global Inc.': 'SPGI',
-'The Charles Schwab Corporation': 'SCHW',
-'KKR & Co. Inc.': 'KKR',
-'The Progressive Corporation': 'PGR',
-'Chubb Limited': 'CB',
-'Marsh & McLennan Companies, Inc.': 'MMC',
-'Apollo Global Management, Inc.': 'APO',
-'The Toronto-Dominion Bank': 'TD',
-'PayPal Holdings, Inc.': 'PYPL',
-'Intercontinental Exchange, Inc.': 'ICE',
-"Moody's Corporation": 'MCO',
-'CME Group Inc.': 'CME'
-}
-
-
-
-# Set up OpenAI API key
-openai.api_key = st.secrets["OPENAI"]["KEY"]
-
-# Fetch real-time stock data using Yahoo Finance API
-def fetch_realtime_stock_data(ticker):
-    #url stores the endpoint from where we get the data requested
-    url = "https://yahoo-finance15.p.rapidapi.com/api/v1/markets/quote"
-
-    #these are params. The type parameter indicates that the request is for stock market data.
-    querystring = {"ticker":ticker,"type":"STOCKS"}
-
-    #headers r mainly used to authenticate api request.
-    headers = {
-    "x-rapidapi-key": rapidapi_key,
-    "x-rapidapi-host": "yahoo-finance15.p.rapidapi.com"
-    }
-
-    try:
-      response = requests.get(url, headers=headers, params=querystring)
-      response.raise_for_status()  # Raise an error for bad HTTP responses
+# Stock symbols, company names and aliases (symbols.tsv, compiled once by symbol_index)
+symbols = symbol_index.get_index()
 
-      # Parse the response
-      data = response.json()
-      if 'body' in data:
-          return data['body']  # Return the entire JSON data
-      else:
-          return {"error": "No data found for the provided ticker."}
-    except requests.exceptions.RequestException as e:
-        return {"error": str(e)}
-
-def get_analyst(symbol, region="US"):
-    """
-    Fetch analyst reports for a given stock ticker symbol.
-
-    Parameters:
-    symbol (str): Stock ticker symbol (e.g., 'AAPL', 'MSFT').
-    region (str): The region for the stock (default is 'US').
-
-    Returns:
-    list: A list of dictionaries containing report details, excluding 'snapshot_url'.
-    """
-    url = "https://yahoo-finance166.p.rapidapi.com/api/stock/get-what-analysts-are-saying"
-    querystring = {"region": region, "symbol": symbol}
-    headers = {
-        "x-rapidapi-key": newrapidapi_key,
-        "x-rapidapi-host": "yahoo-finance166.p.rapidapi.com"
-    }
-
-    try:
-        # Make the API request
-        response = requests.get(url, headers=headers, params=querystring)
-        response.raise_for_status()  # Raise an error for bad HTTP responses
-
-        # Parse the response
-        data = response.json()
-
-        if data and "result" in data and isinstance(data["result"], list):
-            analyst_reports = []
-            for item in data["result"][0]["hits"]:
-                # Extract only the necessary fields, excluding 'snapshot_url'
-                report = {
-                    "report_title": item.get("report_title", "No title available"),
-                    # "investment_rating_status": item.get("investment_rating_status", "No status available"),
-                    # "ticker": item.get("ticker", []),
-                    "author": item.get("author", "Unknown author"),
-                    "pdf_url": item.get("pdf_url", "No URL available"),
-                    "report_type": item.get("report_type", "No type available"),
-                    "abstract": item.get("abstract", "No abstract available"),
-                    # "target_price_status": item.get("target_price_status", "No status available"),
-                    # "investment_rating": item.get("investment_rating", "No rating available"),
-                    # "target_price": item.get("target_price", "No target price available"),
-                    "provider": item.get("provider", "Unknown provider"),
-                    # "company_name": item.get("company_name", "No company name available"),
-                    # "report_date": item.get("report_date", "No date available"),
-                    
-                }
-                
-                analyst_reports.append(report)
-            return analyst_reports  # Return the list of analyst reports
-        else:
-            return {"error": "No analyst reports found for the provided symbol."}
-    except requests.exceptions.RequestException as e:
-        return {"error": str(e)}
 
-# Example usage:
-reports = get_analyst("AAPL")
-if isinstance(reports, list):
-    for report in reports:
-        print(report)
-else:
-    print(reports)  # Print the error message
+# Set up OpenAI API key (openai is only imported when a question needs it)
+def load_openai():
+    import openai
+    openai.api_key = st.secrets["OPENAI"]["KEY"]
+    # Point the client at a stand-in server, e.g. the benchmark's (see benchmark.py)
+    if os.environ.get("TIKERTALK_OPENAI_API_BASE"):
+        openai.api_base = os.environ["TIKERTALK_OPENAI_API_BASE"]
+    return openai
 
-
-# Fetch real-time stock news
-def fetch_realtime_news(ticker):
-    """
-    Fetch real-time stock data news for a given ticker symbol.
-
-    Parameters:
-    ticker (str): Stock ticker symbol (e.g., 'AAPL', 'MSFT').
-
-    Returns:
-    list: A list of dictionaries containing 'description', 'title', and 'pubDate'.
-    """
-    url = "https://yahoo-finance15.p.rapidapi.com/api/v1/markets/news"
-    querystring = {"ticker": ticker, "type": "ALL"}
-    headers = {
-        "x-rapidapi-key": rapidapi_key,
-        "x-rapidapi-host": "yahoo-finance15.p.rapidapi.com"
-    }
-
-    try:
-        # Make the API request
-        response = requests.get(url, headers=headers, params=querystring)
-        response.raise_for_status()  # Raise an error for bad HTTP responses
-
-        # Parse the response
-        data = response.json()
-
-        if data and 'body' in data:  # Check if 'body' exists in the response
-            news_items = []
-            for item in data['body']:
-                # Extract only the necessary fields: description, title, and pubDate
-                news_item = {
-                    'description': item.get('description', 'No description available'),
-                    'title': item.get('title', 'No title available'),
-                    'pubDate': item.get('pubDate', 'No publication date available')
-                }
-                news_items.append(news_item)
-            return news_items  # Return the list of news items with required fields
-        else:
-            return {"error": "No news data found for the provided ticker."}
-    except requests.exceptions.RequestException as e:
-        return {"error": str(e)}
-
-#3rd api fetch the profile
-def fetch_stock_profile(ticker, module):
-    """
-    Fetches stock data from the Yahoo Finance API for the given ticker and module.
-
-    Args:
-        ticker (str): The stock ticker symbol (e.g., "AAPL" for Apple).
-        module (str): The financial data module to retrieve (e.g., "asset-profile").
-        api_key (str): Your RapidAPI key for authentication.
-
-    Returns:
-        dict: The JSON response from the API.
-    """
-    url = "https://yahoo-finance15.p.rapidapi.com/api/v1/markets/stock/modules"
-    
-    querystring = {"ticker": ticker, "module": module}
-    headers = {
-        "x-rapidapi-key": rapidapi_key,
-        "x-rapidapi-host": "yahoo-finance15.p.rapidapi.com"
-    }
-
-    try:
-        response = requests.get(url, headers=headers, params=querystring)
-        response.raise_for_status()  # Raise HTTPError for bad responses
-        data = response.json()
-        if 'body' in data:
-            return data['body']
-    except requests.exceptions.RequestException as e:
-        print(f"Error fetching data: {e}")
-        return None
-
-# Function to fetch stock chart data using Yahoo Finance API
+# Function to fetch and plot stock chart data using Yahoo Finance API
 def fetch_stock_chart(stock_name, region, range, interval):
     """
     Fetches and plots the stock chart for a given symbol.
@@ -288,87 +114,184 @@ def fetch_stock_chart(stock_name, region, range, interval):
     Returns:
         None
     """
-    url = "https://yahoo-finance166.p.rapidapi.com/api/stock/get-chart"
-    querystring = {"region": region, "range": range, "symbol": stock_name, "interval": interval}
-    headers = {
-        "x-rapidapi-key": newrapidapi_key,
-        "x-rapidapi-host": "yahoo-finance166.p.rapidapi.com"
-    }
-
-    try:
-        response = requests.get(url, headers=headers, params=querystring)
-        response.raise_for_status()
-        data = response.json()
-
-        # Extract timestamps and closing prices
-        if 'chart' in data and 'result' in data['chart'] and data['chart']['result']:
-            timestamps = data['chart']['result'][0]['timestamp']
-            close_prices = data['chart']['result'][0]['indicators']['quote'][0]['close']
-            
-            # Convert timestamps to readable dates
-            readable_timestamps = [pd.to_datetime(ts, unit='s') for ts in timestamps]
-
-            # Plot using plotly for interactive chart
-            fig = go.Figure()
-
-            fig.add_trace(go.Scatter(
-                x=readable_timestamps,
-                y=close_prices,
-                mode='lines+markers',
-                name=f"Stock Price: {stock_name}",
-                line=dict(color='blue'),
-                marker=dict(symbol='circle', size=6)
-            ))
-
-            fig.update_layout(
-                title=f"Stock Chart for {stock_name}",
-                xaxis_title="Time",
-                yaxis_title="Close Price",
-                template="plotly_dark",
-                xaxis_rangeslider_visible=True
-            )
-
-            # Display interactive chart in Streamlit
-            st.plotly_chart(fig)
-        else:
-            st.error("Chart data is not available.")
-    
-    except requests.exceptions.RequestException as e:
-        st.error(f"Error: {e}")
-
-#Function to get stock chart
-def get_stock_chart(stock_name, region, range, interval):
-    data = fetch_stock_chart(stock_name, region, range, interval)
-    return data
+    plot_stock_chart(fetch_chart_series(stock_name, region, range, interval), stock_name, region, range, interval)
 
+# Function to plot fetched stock chart data
+def plot_stock_chart(series, stock_name, region, range, interval, indicators=None):
+    """
+    Plots a ChartSeries returned by fetch_chart_series (or shows its error),
+    with the indicators computed over it, if any.
+    """
+    if isinstance(series, dict):
+        st.error(series["error"])
+        return
+
+    import indicators as indicator_engine
+    from chart_series import build_figure
+    from downsample import downsample_indices, point_budget
+
+    # Long series get a zoom window; the window is downsampled from the
+    # full-resolution bars, so narrowing it brings back the detail
+    budget = point_budget()
+    window = series
+    if len(series) > budget:
+        first, last = series.timestamps[0], series.timestamps[-1]
+        zoom = st.slider(
+            "Zoom window",
+            min_value=datetime.utcfromtimestamp(int(first)),
+            max_value=datetime.utcfromtimestamp(int(last)),
+            value=(datetime.utcfromtimestamp(int(first)), datetime.utcfromtimestamp(int(last))),
+            key=f"chart_zoom_{stock_name}_{region}_{range}_{interval}",
+        )
+        start, end = (calendar.timegm(bound.timetuple()) for bound in zoom)
+        in_window = (series.timestamps >= start) & (series.timestamps <= end)
+        window = series.take(in_window)
+        if indicators:
+            indicators = indicator_engine.take(indicators, in_window)
+    # The indicators are thinned out at the same bars as the prices
+    kept = downsample_indices(window, budget)
+    shown = window.take(kept)
+    if indicators:
+        indicators = indicator_engine.take(indicators, kept)
+
+    # Plot using plotly for interactive chart (WebGL for large series)
+    with tracing.span("figure", points=len(shown)):
+        fig = build_figure(shown, title=f"Stock Chart for {stock_name}", indicators=indicators)
+
+    # Display interactive chart in Streamlit
+    with tracing.span("plotly_chart"):
+        st.plotly_chart(fig)
+    if len(shown) < len(window):
+        st.caption(f"Showing {len(shown)} of {len(window)} points. Narrow the zoom window for full detail.")
+
+# Local parser that answers well-formed questions without calling OpenAI
+router = intent_router.IntentRouter(symbols)
+
+# On-disk cache of OpenAI routing decisions, shared across sessions and restarts
+routes_cache = routing_cache.RoutingCache(shared=shared_cache.get_shared_cache())
+
+def route_question(question):
+    """
+    Decide which functions answer the question (see routing.route_question).
+    """
+    return routing.route_question(question, router, routes_cache, load_openai)
 
-# Functions for interacting with OpenAI's GPT model
-def get_stock_data(stock_name):
-    data = fetch_realtime_stock_data(stock_name)
-    return data
+# Headlines kept per ticker in a session, to show below the new ones
+SESSION_NEWS_LIMIT = 50
 
-def get_stock_news(stock_name):
-    news = fetch_realtime_news(stock_name)
-    return news
+def news_cursor(ticker):
+    """The news feed cursor of this session for a ticker (None before its first update)."""
+    return st.session_state.get("news_feeds", {}).get(ticker.upper(), (None, []))[0]
 
-def get_stock_profile(stock_name, module):
-    profile = fetch_stock_profile(stock_name, module)
-    return profile
+def with_news_cursors(calls):
+    """Ask the news calls only for the articles this session has not received yet."""
+    return [
+        (function_name, dict(args, since=news_cursor(args["stock_name"])))
+        if function_name == "get_stock_news" and "stock_name" in args else (function_name, args)
+        for function_name, args in calls
+    ]
 
-def get_analyst_data(symbol, region):
-    analyst_data = get_analyst(symbol)
-    return analyst_data
+def render_news(ticker, update=None):
+    """
+    Show the new articles of a news feed update, followed by the headlines
+    this session received before (as a compact table).
+    """
+    feeds = st.session_state.setdefault("news_feeds", {})
+    cursor, earlier = feeds.get(ticker.upper(), (None, []))
+    if update is not None:
+        entries, cursor = update
+        if entries:
+            st.write(response_models.to_dicts([entry.item for entry in entries]))
+            collapsed = sum(entry.duplicates for entry in entries)
+            if collapsed:
+                st.caption(f"{collapsed} syndicated copies of these stories were collapsed.")
+        else:
+            st.caption("No new headlines since your last refresh.")
+        feeds[ticker.upper()] = (cursor, (list(entries) + earlier)[:SESSION_NEWS_LIMIT])
+    if earlier:
+        st.markdown("**Earlier headlines**")
+        st.dataframe([{"title": entry.item.title, "pubDate": entry.item.pub_date} for entry in earlier],
+                     hide_index=True)
+
+# Show the analytics of a set of stocks
+def render_portfolio(report):
+    from portfolio import build_correlation_figure, build_rolling_beta_figure
+
+    st.plotly_chart(build_correlation_figure(report), use_container_width=True)
+    st.markdown("**Risk ranking** (annualized volatility, beta, drawdowns and return over the range)")
+    st.dataframe(report.ranking(), hide_index=True)
+    if len(report.rolling_beta):
+        st.plotly_chart(build_rolling_beta_figure(report), use_container_width=True)
+    elif report.benchmark:
+        st.caption(f"The range is too short for a {report.window}-bar rolling beta.")
+    for symbol, error in report.missing.items():
+        st.caption(f"{symbol} left out: {error}")
+
+# Show the result of one call
+def render_answer(function_name, args, data):
+    # Failed fetches (including exhausted API quotas) are shown as a message, not as raw JSON
+    if isinstance(data, dict) and set(data) == {"error"}:
+        st.error(data["error"])
+        return
+    if function_name == "get_stock_news":
+        st.subheader(f"Latest News for {args['stock_name']}")
+        # Convert the JSON response into string
+        # news_string = json.dumps(news, indent=4)
+        # st.write(news_string)  # Display the JSON as string
+        render_news(args["stock_name"], data)
+    elif function_name == "get_stock_data":
+        st.subheader(f"Stock Data for {args['stock_name']}")
+        st.write(response_models.to_dicts(data))
+    elif function_name == "get_stock_profile":
+        st.subheader(f"Stock Profile for {args['stock_name']}")
+        if data:
+            st.write(response_models.to_dicts(data) if isinstance(data, response_models.Record) else data)
+        else:
+            st.write("Could not fetch the stock data.")
+    elif function_name == "get_stock_chart":
+        stock_name, region, range, interval = args["stock_name"], args["region"], args["range"], args["interval"]
+        st.subheader(f"Stock chart for {stock_name} in the {region} region with a range of {range} and an interval of {interval}")
+        plot_stock_chart(data, stock_name, region, range, interval)
+    elif function_name == "get_stock_indicators":
+        stock_name, region, range, interval = args["stock_name"], args["region"], args["range"], args["interval"]
+        st.subheader(f"Indicators for {stock_name} in the {region} region with a range of {range} and an interval of {interval}")
+        if isinstance(data, dict):
+            plot_stock_chart(data, stock_name, region, range, interval)
+        else:
+            series, computed = data
+            plot_stock_chart(series, stock_name, region, range, interval, indicators=computed)
+    elif function_name == "get_portfolio_analytics":
+        names = ", ".join(data.symbols) if len(data.symbols) <= 10 else f"{len(data.symbols)} stocks"
+        st.subheader(f"Portfolio analytics for {names} against {data.benchmark} "
+                     f"with a range of {data.range} and an interval of {data.interval}")
+        render_portfolio(data)
+    elif function_name == "search_documents":
+        scope = ", ".join(args.get("symbols") or []) or "all stocks"
+        st.subheader(f"Search results for '{args.get('query') or 'everything'}' in {scope}")
+        if data:
+            st.dataframe([hit.to_dict() for hit in data], hide_index=True)
+        else:
+            st.write("Nothing matching has been fetched yet; ask for the news or analyst reports first.")
+    elif function_name == "get_analyst_data":
+        st.subheader(f"Analyst Recommendations for {args['symbol']}")
+        if data:
+            st.write(response_models.to_dicts(data))
+        else:
+            st.write("Could not fetch analyst recommendations.")
+    else:
+        st.write("Please ask a question to proceed.")
 
 # Streamlit app UI
 st.title("TikerTalk: Real-Time Stock Insights")
 
 # Dropdown for stock selection
-stock_name = st.selectbox("Select Stock Ticker", list(stock_mapping.keys()))
+symbol_labels = symbols.labels()
+stock_label = st.selectbox("Select Stock Ticker", list(symbol_labels))
 
 # Display the symbol for the selected company
-if stock_name:
-    stock_symbol = stock_mapping[stock_name]
-    st.write(f"The selected stock symbol for {stock_name} is **{stock_symbol}**")
+if stock_label:
+    stock_symbol = symbol_labels[stock_label]
+    st.write(f"The selected stock symbol for {symbols.name(stock_symbol)} is **{stock_symbol}**")
 
 # Textbox for user to ask questions
 question = st.text_input(
@@ -391,131 +314,160 @@ st.warning("**Note: Do not forget to include a stock symbol (e.g., AAPL) in your
 
 
 # Button to submit the question
-if st.button("Submit"):
+submitted = st.button("Submit")
+if submitted:
+    # Only chart answers are kept on screen across reruns (for their zoom window)
+    st.session_state.pop("last_charts", None)
     if question:
-        # Use OpenAI to determine whether to fetch stock data or news
-        messages = [{"role": "user", "content": question}]
-        functions = [
-            {
-                "name": "get_stock_news",
-                "description": "Fetch the latest news for a stock.",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "stock_name": {
-                            "type": "string",
-                            "description": "Name of the stock",
-                        }
-                    },
-                    "required": ["stock_name"],
-                },
-            },
-            {
-                "name": "get_stock_data",
-                "description": "Fetch key data about a stock, or stock data such as price and P/E ratio.",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "stock_name": {
-                            "type": "string",
-                            "description": "Name of the stock",
-                        }
-                    },
-                    "required": ["stock_name"],
-                },
-            },
-            {
-                    "name": "get_stock_profile",
-                    "description": "Fetch the company profile of a stock.",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {"stock_name": {"type": "string"}},
-                        "required": ["stock_name"],
-                    },
-            },
-            {
-                    "name": "get_stock_chart",
-                    "description": "Fetch the company chart or dashboard or analytics of a stock.",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {"stock_name": {"type": "string"},
-                                       "region": {"type": "string", "enum": ["US", "IN", "JP", "APAC","EU"]},
-                                        "range": {"type": "string", "enum": ["1d", "5d", "1mo", "3mo", "6mo", "1y", "5y"]},
-                                        "interval": {"type": "string", "enum": ["1m", "5m", "15m", "30m", "1h", "1d", "1wk", "1mo"]}},
-                        "required": ["stock_name", "region", "range", "interval"],
-                    },
-            },
-            {
-                    "name": "get_analyst_data",
-                    "description": "Fetch the analyst recommendations or what analyst has to say about stock?",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {"symbol": {"type": "string"}},
-                                    #    "region": {"type": "string", "enum": ["US", "IN", "JP", "APAC","EU"]},
-                                    #     "range": {"type": "string", "enum": ["1d", "5d", "1mo", "3mo", "6mo", "1y", "5y"]},
-                                    #     "interval": {"type": "string", "enum": ["1m", "5m", "15m", "30m", "1h", "1d", "1wk", "1mo"]}},
-                        "required": ["symbol"],
-                    },
-            }
-        ]
-
-        # Call OpenAI API to decide which function to run
-        response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=messages,
-            functions=functions,
-            function_call="auto"
-        )
-
-        function_name = response["choices"][0]["message"]["function_call"]["name"]
-        args = eval(response["choices"][0]["message"]["function_call"]["arguments"])
-
-        # Based on the response, either fetch stock data or news
-        if function_name == "get_stock_news":
-            stock_name = args["stock_name"]
-            news = get_stock_news(stock_name)
-            st.subheader("Latest News")
-            # Convert the JSON response into string
-            # news_string = json.dumps(news, indent=4)
-            # st.write(news_string)  # Display the JSON as string
-            st.write(news)
-        elif function_name == "get_stock_data":
-            stock_name = args["stock_name"]
-            data = get_stock_data(stock_name)
-            st.subheader("Stock Data")
-            st.write(data)
-        elif function_name == "get_stock_profile":
-            stock_name = args['stock_name']
-            data = get_stock_profile(stock_name,"asset-profile")
-            st.subheader("Stock Profile")
-            if data:
-                st.write(data)
-            else:
-                print("Could not fetch the stock data.")
-        elif function_name == "get_stock_chart":
-            stock_name = args['stock_name']
-            region = args["region"]
-            range = args["range"]
-            interval = args["interval"]
-            st.subheader(f"Stock chart for {stock_name} in the {region} region with a range of {range} and an interval of {interval}")
-            data = get_stock_chart(stock_name, region, range, interval)
-            if data:
-                st.write(data)
-            # else:
-            #     st.write("Could not fetch the stock chart data.")
-
-        elif function_name == "get_analyst_data":
-            symbol = args['symbol']
-            st.subheader(f"Analyst Recommendations for {stock_name}")
-            data = get_analyst_data(symbol, region='US')
-            if data:
-                st.write(data)
-            else:
-                st.write("Could not fetch analyst recommendations.")
-
-        
+        # Every stage of answering the question is timed under one trace ID
+        with tracing.trace("question") as question_trace:
+            # Decide which functions to run (local parser first, OpenAI as fallback)
+            with tracing.span("route"):
+                calls = with_news_cursors(route_question(question))
+            if not calls:
+                st.write("Please ask a question to proceed.")
+            st.session_state["last_charts"] = [
+                (function_name, args) for function_name, args in calls
+                if function_name in ("get_stock_chart", "get_stock_indicators")
+            ]
+
+            # Fetch everything at once and show each answer, in question order, as soon as it arrives
+            slots = [st.container() for _ in calls]
+            for index, function_name, args, data in dispatcher.run_calls(calls):
+                with slots[index], tracing.span("render", function=function_name):
+                    render_answer(function_name, args, data)
+        st.caption(f"Trace {question_trace.trace_id} took {question_trace.duration * 1000:.0f} ms")
+elif st.session_state.get("last_charts"):
+    # Redraw the last charts (served from the cache) when a zoom window changes
+    with tracing.trace("redraw"):
+        for function_name, args in st.session_state["last_charts"]:
+            data = dispatcher.run_call(function_name, args)
+            with tracing.span("render", function=function_name):
+                render_answer(function_name, args, data)
+
+# Watchlist: quotes for many stocks at once, fetched in batches
+with st.expander("Watchlist"):
+    watched_labels = st.multiselect(
+        "Companies to watch", list(symbol_labels), default=[symbols.label(symbol) for symbol in list(symbols.names)[:5]]
+    )
+    watched = sorted(symbol_labels[label] for label in watched_labels)
+    # In live mode the process-wide poller fetches quotes for every session's
+    # watchlist and this session only reads its snapshots
+    live_quotes = st.toggle("Keep quotes updated in the background") and bool(watched)
+    session_id = st.session_state.setdefault("session_id", uuid.uuid4().hex)
+    # pandas, its only heavy import, is already loaded by Streamlit
+    import watchlist
+    if live_quotes:
+        import quote_poller
+        poller = quote_poller.get_poller()
+        poller.subscribe(session_id, watched)
+    elif "quote_poller" in sys.modules:
+        sys.modules["quote_poller"].get_poller().unsubscribe(session_id)
+
+    # Otherwise quotes are only fetched on request, so plain reruns stay free of network I/O
+    if st.button("Refresh quotes") and watched:
+        if live_quotes:
+            poller.refresh_now()
         else:
-            st.write("Please ask a question to proceed.")
+            quotes, errors = watchlist.fetch_quotes(watched)
+            st.session_state["watchlist_table"] = watchlist.update_table(
+                st.session_state.get("watchlist_table"), quotes, watched
+            )
+            for error in errors:
+                st.error(error)
+    if live_quotes:
+        quotes, quotes_version = poller.board.snapshot(watched)
+        if quotes:
+            st.session_state["watchlist_table"] = watchlist.update_table(
+                st.session_state.get("watchlist_table"), quotes, watched
+            )
+        for error in poller.last_errors:
+            st.error(error)
+    watchlist_slot = st.empty()
+    if st.session_state.get("watchlist_table") is not None:
+        watchlist_slot.dataframe(st.session_state["watchlist_table"])
+    watchlist_status = st.empty()
+
+# News feed: only the headlines this session has not seen yet, on request
+with st.expander("News feed"):
+    if stock_label:
+        if st.button(f"Refresh news for {stock_symbol}"):
+            news_args = {"stock_name": stock_symbol, "since": news_cursor(stock_symbol)}
+            render_answer("get_stock_news", news_args, dispatcher.run_call("get_stock_news", news_args))
+        else:
+            render_news(stock_symbol)
+
+# Portfolio analytics over any set of stocks (the desk list when none are picked)
+with st.expander("Portfolio analytics"):
+    portfolio_labels = st.multiselect("Stocks (leave empty for the desk list)", list(symbol_labels))
+    columns = st.columns(4)
+    portfolio_args = {
+        "symbols": [symbol_labels[label] for label in portfolio_labels],
+        "benchmark": columns[0].text_input("Benchmark", intent_router.DEFAULT_BENCHMARK).strip().upper(),
+        "region": intent_router.DEFAULT_REGION,
+        "range": columns[1].selectbox("Range", ["1mo", "3mo", "6mo", "1y", "5y"], index=3),
+        "interval": columns[2].selectbox("Interval", ["1d", "1wk", "1mo"]),
+        "window": int(columns[3].number_input("Beta window (bars)", 5, 250, intent_router.DEFAULT_BETA_WINDOW)),
+    }
+    if st.button("Analyze"):
+        with tracing.trace("portfolio"):
+            render_answer("get_portfolio_analytics", portfolio_args,
+                          dispatcher.run_call("get_portfolio_analytics", portfolio_args))
+
+# How many questions each routing path has handled in this server process
+route_stats = intent_router.route_stats()
+st.sidebar.caption(
+    f"Routing: {route_stats.get('local', 0)} answered by the local parser, "
+    f"{route_stats.get('llm', 0)} by OpenAI, "
+    f"{route_stats.get('llm_cache', 0)} from cached OpenAI decisions"
+)
+rerun_stats = perf_budget.rerun_stats()
+if rerun_stats["count"]:
+    st.sidebar.caption(
+        f"Script run: p50 {rerun_stats['p50'] * 1000:.0f} ms, "
+        f"max {rerun_stats['max'] * 1000:.0f} ms "
+        f"(budget {perf_budget.RERUN_BUDGET_SECONDS * 1000:.0f} ms)"
+    )
+
+# Request budget of each RapidAPI key, as reported by the hosts' rate-limit headers
+with st.sidebar.expander("API quota"):
+    for limiter in rate_limiter.status():
+        label = f"{limiter['host'].split('.')[0]} (key {limiter['key']})"
+        if limiter["quota_limit"]:
+            used = limiter["quota_limit"] - max(0, limiter["quota_remaining"] or 0)
+            resets = ""
+            if limiter["quota_reset_in"] is not None:
+                resets = f", resets in {limiter['quota_reset_in'] / 3600:.1f} h"
+            st.progress(min(1.0, used / limiter["quota_limit"]),
+                        text=f"{label}: {used} of {limiter['quota_limit']} requests used{resets}")
+        else:
+            st.markdown(f"{label}: {limiter['sent']} requests sent, quota not reported yet")
+        paused = f", paused {limiter['paused_for']:.0f}s" if limiter["paused_for"] >= 1 else ""
+        st.caption(
+            f"{limiter['rate']:.1f} req/s, {limiter['queued']} queued, "
+            f"{limiter['throttled']} throttled, {limiter['rejected']} over budget{paused}"
+        )
+    st.caption(f"{response_cache.cache.stats()['stale']} answers served from stale cache while rate limited")
+
+# On-call triage: recent traces and per-stage latency percentiles
+if st.sidebar.checkbox("Show request traces", key="debug_traces"):
+    stage_stats = tracing.stage_stats()
+    if stage_stats:
+        st.sidebar.markdown("**Latency per stage (ms)**")
+        st.sidebar.dataframe([
+            {"stage": stage, "count": stats["count"], "p50": round(stats["p50"] * 1000, 1),
+             "p95": round(stats["p95"] * 1000, 1), "p99": round(stats["p99"] * 1000, 1)}
+            for stage, stats in stage_stats.items()
+        ], hide_index=True)
+    for recent in tracing.recent_traces()[:5]:
+        with st.sidebar.expander(f"{recent['name']} {recent['trace_id']} ({recent['duration'] * 1000:.0f} ms)"):
+            st.dataframe([
+                {"stage": span["stage"], "ms": round(span["duration"] * 1000, 1),
+                 **{key: str(value) for key, value in span["attrs"].items()}}
+                for span in sorted(recent["spans"], key=lambda span: span["started_at"])
+            ], hide_index=True)
+    with st.sidebar.expander("Prometheus metrics"):
+        st.code(tracing.prometheus_text(), language="text")
 
 # # Display a warning message
 # st.warning("Select the appropriate options below only when you want to extract a stock chart.")
@@ -534,3 +486,29 @@ if st.button("Submit"):
 # if st.button("Fetch Stock Chart"):
 #     if stock_symbol:
 #         fetch_stock_chart(stock_symbol, region, range, interval)
+
+# Record how long this script run took against the rerun budget.
+# Runs that answered a question include network time, so they are not counted.
+if not submitted:
+    perf_budget.record_rerun(time.perf_counter() - _rerun_started)
+
+# Live watchlist: keep this run open and push every new poller snapshot into
+# the table. Streamlit only notices a click or a closed tab inside an st call,
+# so the loop writes its status line every LIVE_CHECK_SECONDS, quotes or not.
+LIVE_CHECK_SECONDS = 1.0
+if live_quotes:
+    while True:
+        version = poller.board.wait_for_update(quotes_version, timeout=LIVE_CHECK_SECONDS)
+        poller.subscribe(session_id, watched)
+        if version != quotes_version:
+            quotes_version = version
+            quotes, _ = poller.board.snapshot(watched)
+            if quotes:
+                st.session_state["watchlist_table"] = watchlist.update_table(
+                    st.session_state.get("watchlist_table"), quotes, watched
+                )
+                watchlist_slot.dataframe(st.session_state["watchlist_table"])
+        status = f"Live quotes, checked at {time.strftime('%H:%M:%S')}"
+        if poller.last_errors:
+            status += f" ({len(poller.last_errors)} failed batches: {poller.last_errors[0]})"
+        watchlist_status.caption(status)
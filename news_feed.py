@@ -0,0 +1,220 @@
+"""
+Incremental per-ticker news feed.
+
+markets/news always answers with the whole list of recent articles. The
+feed keeps one NewsLog per ticker that remembers every article it has
+seen, keyed by a stable hash of its title and pubDate, and indexes them
+by publish time. Each article that is new to the log gets the next
+sequence number. A caller keeps the last sequence number it received
+as its cursor, and since() returns only the articles added after it.
+
+Syndicated copies of a story (the same headline with a different source
+suffix or slightly different wording, published close together) are
+collapsed into the first copy: they are counted on its entry instead of
+being returned again. Articles published more than RETENTION_SECONDS
+before the newest one in the log are dropped (measured from the newest
+article, so quiet tickers keep their last stories), and a log never
+holds more than MAX_ENTRIES_PER_TICKER.
+"""
+import bisect
+import hashlib
+import re
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+# Articles published this long before the newest one are dropped from the log
+RETENTION_SECONDS = 7 * 24 * 60 * 60
+# Upper bound on the articles kept per ticker (the oldest go first)
+MAX_ENTRIES_PER_TICKER = 500
+# Headlines at least this similar (word-set Jaccard) are one story...
+DUPLICATE_SIMILARITY = 0.75
+# ...when they were published within this many seconds of each other
+DUPLICATE_WINDOW = 24 * 60 * 60
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+# ' - Reuters', ' | Bloomberg' and similar source suffixes of syndicated headlines
+_SOURCE_SUFFIX_RE = re.compile(r"\s+[-|–—]\s+[^-|–—]{1,40}$")
+_HEADLINE_STOP_WORDS = frozenset(["a", "an", "the", "of", "to", "in", "on", "for", "and", "as", "at", "by", "is"])
+
+
+def item_key(item):
+    """Stable hash of an article's title and pubDate."""
+    text = f"{(item.title or '').strip().lower()}\n{(item.pub_date or '').strip()}"
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+def published_at(item, default=None):
+    """The article's pubDate as epoch seconds, or default when it is missing or malformed."""
+    if not item.pub_date:
+        return default
+    try:
+        return parsedate_to_datetime(item.pub_date).timestamp()
+    except (TypeError, ValueError, IndexError):
+        return default
+
+
+def headline_words(title):
+    """The set of significant words of a headline, without its source suffix."""
+    title = _SOURCE_SUFFIX_RE.sub("", (title or "").lower())
+    return frozenset(word for word in _WORD_RE.findall(title) if word not in _HEADLINE_STOP_WORDS)
+
+
+def similarity(words, other_words):
+    if not words or not other_words:
+        return 0.0
+    return len(words & other_words) / len(words | other_words)
+
+
+class FeedEntry:
+    """One article in a NewsLog; duplicates counts the syndicated copies collapsed into it."""
+
+    __slots__ = ("key", "sequence", "published", "item", "words", "duplicates")
+
+    def __init__(self, key, sequence, published, item, words):
+        self.key = key
+        self.sequence = sequence
+        self.published = published
+        self.item = item
+        self.words = words
+        self.duplicates = 0
+
+
+class NewsLog:
+    """
+    The articles of one ticker, indexed by item hash and by publish time.
+
+    Parameters:
+    retention (float): How far back from the newest article the log reaches, in seconds.
+    max_entries (int): Upper bound on the number of articles kept.
+    """
+
+    def __init__(self, retention=RETENTION_SECONDS, max_entries=MAX_ENTRIES_PER_TICKER):
+        self.retention = retention
+        self.max_entries = max_entries
+        self.sequence = 0
+        self.last_batch = None
+        # item hash -> entry; syndicated copies map to the entry they were collapsed into
+        self._by_key = {}
+        # (published, sequence, entry) sorted by publish time
+        self._by_time = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._by_time)
+
+    def add(self, items, now=None):
+        """
+        Add the articles of a markets/news response. Articles without a
+        (valid) pubDate are taken as published at now.
+
+        Returns:
+        list: The FeedEntry of every article that was new to the log (not a copy of a known one).
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            # The response cache hands back the same tuple until the next upstream fetch
+            if items is self.last_batch:
+                return []
+            self.last_batch = items
+            incoming = [(published_at(item, now), item) for item in items]
+            # Oldest first, so sequence numbers follow publish time within a batch
+            incoming.sort(key=lambda pair: pair[0])
+            newest = max([published for published, _ in incoming] + [self._newest()])
+            added = []
+            for published, item in incoming:
+                key = item_key(item)
+                if key in self._by_key or published < newest - self.retention:
+                    continue
+                words = headline_words(item.title)
+                original = self._find_duplicate(words, published)
+                if original is not None:
+                    original.duplicates += 1
+                    self._by_key[key] = original
+                    continue
+                self.sequence += 1
+                entry = FeedEntry(key, self.sequence, published, item, words)
+                self._by_key[key] = entry
+                bisect.insort(self._by_time, (published, entry.sequence, entry))
+                added.append(entry)
+            self._prune(newest)
+            return added
+
+    def since(self, cursor=None):
+        """
+        Return (entries, cursor): the entries added after cursor (all of
+        them when cursor is None), newest first, and the cursor to pass next time.
+        """
+        cursor = cursor or 0
+        with self._lock:
+            entries = [entry for _, sequence, entry in self._by_time if sequence > cursor]
+            return entries[::-1], self.sequence
+
+    # The helpers below must be called with self._lock held
+
+    def _newest(self):
+        return self._by_time[-1][0] if self._by_time else float("-inf")
+
+    def _find_duplicate(self, words, published):
+        start = bisect.bisect_left(self._by_time, (published - DUPLICATE_WINDOW,))
+        end = bisect.bisect_right(self._by_time, (published + DUPLICATE_WINDOW, float("inf")))
+        for _, _, entry in self._by_time[start:end]:
+            if similarity(words, entry.words) >= DUPLICATE_SIMILARITY:
+                return entry
+        return None
+
+    def _prune(self, newest):
+        cutoff = bisect.bisect_left(self._by_time, (newest - self.retention,))
+        cutoff = max(cutoff, len(self._by_time) - self.max_entries)
+        if cutoff <= 0:
+            return
+        dropped = {id(entry) for _, _, entry in self._by_time[:cutoff]}
+        del self._by_time[:cutoff]
+        self._by_key = {key: entry for key, entry in self._by_key.items() if id(entry) not in dropped}
+
+
+class NewsFeed:
+    """Process-wide NewsLogs, one per ticker."""
+
+    def __init__(self):
+        self._logs = {}
+        self._lock = threading.Lock()
+
+    def log(self, ticker):
+        ticker = ticker.upper()
+        with self._lock:
+            log = self._logs.get(ticker)
+            if log is None:
+                log = self._logs[ticker] = NewsLog()
+            return log
+
+    def update(self, ticker, fetch, cursor=None):
+        """
+        Fetch a ticker's news and return what is new to the caller.
+
+        Parameters:
+        fetch (callable): ticker -> tuple of NewsItem, or a dict with an 'error' key.
+        cursor (int): The cursor from the caller's previous update, or None for everything.
+
+        Returns:
+        tuple: (entries newest first, cursor), or the error dict from fetch.
+        """
+        log = self.log(ticker)
+        items = fetch(ticker)
+        if isinstance(items, dict):
+            return items
+        log.add(items)
+        return log.since(cursor)
+
+
+_feed = None
+_feed_lock = threading.Lock()
+
+
+def get_feed():
+    """Return the process-wide news feed, creating it on first use."""
+    global _feed
+    with _feed_lock:
+        if _feed is None:
+            _feed = NewsFeed()
+        return _feed
@@ -0,0 +1,117 @@
+"""
+Startup and rerun latency budget for the Streamlit script.
+
+Streamlit executes my_app.py from top to bottom on every widget change,
+so the script body must only build the UI: no network I/O and no heavy
+imports until a question actually needs them. The app records how long
+each run that did not answer a question took, and measure_app() runs
+the script headlessly (with Streamlit's AppTest and dummy secrets) so a
+test or CI job can check the numbers:
+
+    python perf_budget.py        # exits with status 1 when over budget
+"""
+import json
+import os
+import sys
+import threading
+import time
+
+# Time allowed for the first run of the script in a fresh process, and for later reruns
+STARTUP_BUDGET_SECONDS = 1.5
+RERUN_BUDGET_SECONDS = 0.15
+
+# Modules the script must not import until a question needs them. Streamlit
+# itself may already have imported some of them; only imports made by the
+# script count against the budget.
+LAZY_MODULES = ("openai", "plotly", "chart_series")
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "my_app.py")
+DUMMY_SECRETS = {
+    "RAPIDAPI": {"KEY": "dummy"},
+    "NEWRAPIDAPI": {"KEY": "dummy"},
+    "OPENAI": {"KEY": "dummy"},
+}
+
+_MAX_SAMPLES = 200
+_samples = []
+_samples_lock = threading.Lock()
+
+
+def record_rerun(seconds):
+    """Record the duration of one script run."""
+    with _samples_lock:
+        _samples.append(seconds)
+        if len(_samples) > _MAX_SAMPLES:
+            del _samples[0]
+
+
+def rerun_stats():
+    """Return count, p50 and max of the recorded script run durations (in seconds)."""
+    with _samples_lock:
+        samples = sorted(_samples)
+    if not samples:
+        return {"count": 0, "p50": 0.0, "max": 0.0}
+    return {"count": len(samples), "p50": samples[len(samples) // 2], "max": samples[-1]}
+
+
+def measure_app(reruns=5, app_path=APP_PATH):
+    """
+    Run the app script headlessly and time its first run and its reruns.
+
+    Should be called in a fresh interpreter, otherwise modules imported
+    earlier make the first run look faster than it is.
+
+    Returns:
+    dict: 'startup' and 'rerun_p50' in seconds, 'lazy_modules_loaded' (list),
+    'network_calls' (int) and 'within_budget' (bool).
+    """
+    from streamlit.testing.v1 import AppTest
+    import rapidapi_client
+
+    network_calls = []
+    original_get = rapidapi_client.HostClient.get
+
+    def counting_get(self, path, params=None):
+        network_calls.append(path)
+        return original_get(self, path, params=params)
+
+    rapidapi_client.HostClient.get = counting_get
+    preloaded = {name for name in LAZY_MODULES if name in sys.modules}
+    try:
+        app = AppTest.from_file(app_path, default_timeout=30)
+        for section, values in DUMMY_SECRETS.items():
+            app.secrets[section] = values
+
+        started = time.perf_counter()
+        app.run()
+        startup = time.perf_counter() - started
+
+        timings = []
+        for _ in range(reruns):
+            started = time.perf_counter()
+            app.run()
+            timings.append(time.perf_counter() - started)
+    finally:
+        rapidapi_client.HostClient.get = original_get
+
+    timings.sort()
+    rerun_p50 = timings[len(timings) // 2] if timings else 0.0
+    lazy_loaded = [name for name in LAZY_MODULES if name in sys.modules and name not in preloaded]
+    return {
+        "startup": startup,
+        "rerun_p50": rerun_p50,
+        "lazy_modules_loaded": lazy_loaded,
+        "network_calls": len(network_calls),
+        "within_budget": (
+            startup <= STARTUP_BUDGET_SECONDS
+            and rerun_p50 <= RERUN_BUDGET_SECONDS
+            and not lazy_loaded
+            and not network_calls
+        ),
+    }
+
+
+if __name__ == "__main__":
+    report = measure_app()
+    print(json.dumps(report, indent=2))
+    sys.exit(0 if report["within_budget"] else 1)
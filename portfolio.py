@@ -0,0 +1,368 @@
+"""
+Cross-sectional analytics over a universe of stocks.
+
+The chart series of every symbol (and of the benchmark) are aligned on
+the union of their timestamps into one (bars x symbols) NumPy matrix,
+with NaN where a symbol has no bar. Everything is then computed on whole
+matrices:
+
+- the return correlation matrix, over the returns both symbols of a pair
+  have (pairwise-complete), from three matrix products;
+- beta against the benchmark over the whole range, and rolling over the
+  last `window` returns, from cumulative sums;
+- annualized volatility, total return, and the maximum and current drawdown.
+
+Reports are cached per (universe, benchmark, region, range, interval,
+window) for REPORT_TTL seconds, so once the bars are local (bar store
+and response cache) a repeated request costs only the lookup.
+"""
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import tracing
+from indicators import SECONDS_PER_DAY, periods_per_year
+
+DEFAULT_BENCHMARK = "SPY"
+DEFAULT_RANGE = "1y"
+DEFAULT_INTERVAL = "1d"
+# Returns in the rolling beta window
+DEFAULT_BETA_WINDOW = 60
+# Pairs with fewer overlapping returns than this get no correlation
+MIN_OBSERVATIONS = 20
+# Seconds a report is reused; matches the freshness of get-chart responses
+REPORT_TTL = 60
+# Most symbols one report covers: every symbol costs a chart fetch, and the
+# correlation matrix and its heatmap grow with the square of the count
+MAX_UNIVERSE = 100
+MAX_REPORTS = 16
+# Chart fetches running at once while a report is built
+FETCH_WORKERS = 8
+
+
+def align_closes(series_list):
+    """
+    Align ChartSeries on the union of their timestamps.
+
+    Daily and longer bars are aligned on the calendar day, since exchanges
+    stamp their daily bars at different times of day.
+
+    Returns:
+    tuple: (timestamps, int64 array of length T; closes, float64 array
+    of shape (T, len(series_list)) with NaN where a series has no bar).
+    """
+    daily = all(periods_per_year(series.timestamps) <= 260 for series in series_list if len(series) > 1)
+    stamps = [series.timestamps // SECONDS_PER_DAY * SECONDS_PER_DAY if daily else series.timestamps
+              for series in series_list]
+    timestamps = np.unique(np.concatenate(stamps)) if stamps else np.empty(0, dtype=np.int64)
+    closes = np.full((len(timestamps), len(series_list)), np.nan)
+    for column, (series, stamp) in enumerate(zip(series_list, stamps)):
+        closes[np.searchsorted(timestamps, stamp), column] = series.close
+    return timestamps, closes
+
+
+def log_returns(closes):
+    """Log returns between consecutive rows (NaN where either close is missing)."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.diff(np.log(closes), axis=0)
+
+
+def pairwise_correlation(returns, min_observations=MIN_OBSERVATIONS):
+    """
+    Pearson correlation of every pair of columns over the rows where both
+    are present, as an (N x N) matrix; NaN for pairs with too few rows.
+    """
+    valid = ~np.isnan(returns)
+    mask = valid.astype(np.float64)
+    x = np.where(valid, returns, 0.0)
+    # Entry (i, j) of each product sums over the rows where both i and j are present
+    count = mask.T @ mask
+    sum_x = x.T @ mask
+    sum_xx = (x * x).T @ mask
+    sum_xy = x.T @ x
+    with np.errstate(divide="ignore", invalid="ignore"):
+        covariance = sum_xy - sum_x * sum_x.T / count
+        variance_i = sum_xx - sum_x * sum_x / count
+        variance_j = variance_i.T
+        correlation = covariance / np.sqrt(variance_i * variance_j)
+    correlation[count < min_observations] = np.nan
+    return np.clip(correlation, -1.0, 1.0)
+
+
+def _window_sums(values, window):
+    """Sums over every run of window consecutive rows, from one cumulative sum."""
+    cumulative = np.concatenate([np.zeros((1,) + values.shape[1:]), np.cumsum(values, axis=0)])
+    return cumulative[window:] - cumulative[:-window]
+
+
+def betas(returns, benchmark_returns, window=None):
+    """
+    Beta of every column against the benchmark returns, over the rows
+    where both are present.
+
+    Returns:
+    numpy.ndarray: One beta per column when window is None, otherwise a
+    (T - window + 1, N) array with the beta of every rolling window
+    (NaN where fewer than half of its rows are present).
+    """
+    valid = ~np.isnan(returns) & ~np.isnan(benchmark_returns)[:, None]
+    y = np.where(valid, returns, 0.0)
+    x = np.where(valid, benchmark_returns[:, None], 0.0)
+    count = valid.astype(np.float64)
+    if window is None:
+        sums = [values.sum(axis=0) for values in (count, x, y, x * y, x * x)]
+        minimum = 2
+    else:
+        sums = [_window_sums(values, window) for values in (count, x, y, x * y, x * x)]
+        minimum = max(2, window // 2)
+    n, sum_x, sum_y, sum_xy, sum_xx = sums
+    with np.errstate(divide="ignore", invalid="ignore"):
+        covariance = sum_xy - sum_x * sum_y / n
+        variance = sum_xx - sum_x * sum_x / n
+        beta = covariance / variance
+    beta[(n < minimum) | ~(variance > 0)] = np.nan
+    return beta
+
+
+def drawdowns(closes):
+    """Drawdown from the running peak of every column (0 at a new high, NaN where a close is missing)."""
+    peaks = np.fmax.accumulate(closes, axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return closes / peaks - 1.0
+
+
+def _last_valid(values):
+    """The last non-NaN value of every column (NaN for all-NaN columns)."""
+    present = ~np.isnan(values)
+    last = len(values) - 1 - np.argmax(present[::-1], axis=0)
+    result = values[last, np.arange(values.shape[1])]
+    result[~present.any(axis=0)] = np.nan
+    return result
+
+
+def _first_valid(values):
+    present = ~np.isnan(values)
+    result = values[np.argmax(present, axis=0), np.arange(values.shape[1])]
+    result[~present.any(axis=0)] = np.nan
+    return result
+
+
+class PortfolioReport:
+    """
+    Analytics of one universe. Arrays are indexed by the position of the
+    symbol in symbols; correlation is (N x N) and rolling_beta is
+    (len(rolling_timestamps) x N).
+    """
+
+    __slots__ = ("symbols", "benchmark", "range", "interval", "window", "timestamps", "correlation",
+                 "volatility", "beta", "rolling_timestamps", "rolling_beta", "max_drawdown",
+                 "current_drawdown", "total_return", "observations", "missing", "computed_at")
+
+    def __init__(self, symbols, benchmark, range, interval, window, timestamps, correlation, volatility,
+                 beta, rolling_timestamps, rolling_beta, max_drawdown, current_drawdown, total_return,
+                 observations, missing):
+        self.symbols = symbols
+        self.benchmark = benchmark
+        self.range = range
+        self.interval = interval
+        self.window = window
+        self.timestamps = timestamps
+        self.correlation = correlation
+        self.volatility = volatility
+        self.beta = beta
+        self.rolling_timestamps = rolling_timestamps
+        self.rolling_beta = rolling_beta
+        self.max_drawdown = max_drawdown
+        self.current_drawdown = current_drawdown
+        self.total_return = total_return
+        self.observations = observations
+        self.missing = missing
+        self.computed_at = time.time()
+
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in (
+            "timestamps", "correlation", "volatility", "beta", "rolling_timestamps", "rolling_beta",
+            "max_drawdown", "current_drawdown", "total_return", "observations"))
+
+    def ranking(self):
+        """One row per symbol, most volatile first."""
+        latest_beta = _last_valid(self.rolling_beta) if len(self.rolling_beta) else np.full(len(self.symbols), np.nan)
+        rows = [
+            {
+                "symbol": symbol,
+                "volatility": self.volatility[i],
+                f"beta vs {self.benchmark}": self.beta[i],
+                f"beta ({self.window} bars)": latest_beta[i],
+                "max drawdown": self.max_drawdown[i],
+                "drawdown": self.current_drawdown[i],
+                "return": self.total_return[i],
+                "bars": int(self.observations[i]),
+            }
+            for i, symbol in enumerate(self.symbols)
+        ]
+        return sorted(rows, key=lambda row: -np.nan_to_num(row["volatility"], nan=-np.inf))
+
+
+def compute_report(series_by_symbol, benchmark_series, benchmark, range, interval,
+                   window=DEFAULT_BETA_WINDOW, missing=None):
+    """
+    Compute a PortfolioReport from already fetched series.
+
+    Parameters:
+    series_by_symbol (dict): symbol -> ChartSeries, in universe order.
+    benchmark_series (ChartSeries): The benchmark's bars, or None (betas are then NaN).
+    """
+    symbols = list(series_by_symbol)
+    columns = list(series_by_symbol.values())
+    if benchmark_series is not None:
+        columns.append(benchmark_series)
+    timestamps, closes = align_closes(columns)
+    returns = log_returns(closes)
+    if benchmark_series is not None:
+        closes, benchmark_returns, returns = closes[:, :-1], returns[:, -1], returns[:, :-1]
+    else:
+        benchmark_returns = np.full(len(returns), np.nan)
+
+    correlation = pairwise_correlation(returns)
+    scale = np.sqrt(periods_per_year(timestamps)) if len(timestamps) > 1 else np.nan
+    observations = (~np.isnan(returns)).sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        volatility = np.nanstd(returns, axis=0, ddof=1) * scale if len(returns) > 1 \
+            else np.full(len(symbols), np.nan)
+    volatility[observations < 2] = np.nan
+
+    beta = betas(returns, benchmark_returns)
+    if len(returns) >= window:
+        rolling_beta = betas(returns, benchmark_returns, window)
+        # Window k covers returns k..k+window-1; it is stamped with its last bar
+        rolling_timestamps = timestamps[window:]
+    else:
+        rolling_beta = np.empty((0, len(symbols)))
+        rolling_timestamps = np.empty(0, dtype=np.int64)
+
+    drawdown = drawdowns(closes)
+    with np.errstate(invalid="ignore"):
+        max_drawdown = np.nanmin(np.where(np.isnan(drawdown), np.inf, drawdown), axis=0)
+    max_drawdown[np.isinf(max_drawdown)] = np.nan
+    total_return = _last_valid(closes) / _first_valid(closes) - 1.0
+
+    return PortfolioReport(
+        symbols, benchmark, range, interval, window, timestamps, correlation, volatility, beta,
+        rolling_timestamps, rolling_beta, max_drawdown, _last_valid(drawdown), total_return,
+        observations, dict(missing or {}),
+    )
+
+
+class PortfolioAnalytics:
+    """
+    Builds PortfolioReports, fetching the series concurrently and caching
+    the reports per (universe, benchmark, region, range, interval, window).
+    """
+
+    def __init__(self, ttl=REPORT_TTL, max_reports=MAX_REPORTS):
+        self.ttl = ttl
+        self.max_reports = max_reports
+        self._reports = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def _fetch_all(self, symbols, fetch):
+        with self._lock:
+            if self._executor is None:
+                # A pool of its own: the report itself may be running on the dispatcher's pool
+                self._executor = ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix="tikertalk-portfolio")
+        futures = [self._executor.submit(tracing.copy_context().run, fetch, symbol) for symbol in symbols]
+        return [future.result() for future in futures]
+
+    def report(self, universe, fetch, benchmark=DEFAULT_BENCHMARK, region="US", range=DEFAULT_RANGE,
+               interval=DEFAULT_INTERVAL, window=DEFAULT_BETA_WINDOW):
+        """
+        Return the PortfolioReport of a universe, from the cache when it is fresh.
+
+        Parameters:
+        universe (list): Stock symbols.
+        fetch (callable): symbol -> ChartSeries, or a dict with an 'error' key.
+
+        Raises:
+        ValueError: When the universe has more than MAX_UNIVERSE symbols, or none of them has any bars.
+        """
+        universe = list(dict.fromkeys(symbol.upper() for symbol in universe))
+        if len(universe) > MAX_UNIVERSE:
+            raise ValueError(f"Portfolio analytics covers at most {MAX_UNIVERSE} stocks; "
+                             f"{len(universe)} were requested.")
+        benchmark = benchmark.upper() if benchmark else None
+        key = (tuple(universe), benchmark, region, range, interval, window)
+        with self._lock:
+            cached = self._reports.get(key)
+            if cached is not None and time.time() - cached.computed_at < self.ttl:
+                self._reports.move_to_end(key)
+                tracing.annotate(cache="hit")
+                return cached
+        tracing.annotate(cache="miss")
+
+        symbols = universe + ([benchmark] if benchmark and benchmark not in universe else [])
+        with tracing.span("portfolio_fetch", symbols=len(symbols)):
+            fetched = dict(zip(symbols, self._fetch_all(symbols, fetch)))
+        missing = {symbol: result["error"] for symbol, result in fetched.items() if isinstance(result, dict)}
+        series_by_symbol = {symbol: fetched[symbol] for symbol in universe if symbol not in missing}
+        if not series_by_symbol:
+            raise ValueError("No chart data is available for the selected stocks.")
+        benchmark_series = fetched.get(benchmark) if benchmark and benchmark not in missing else None
+
+        with tracing.span("portfolio_compute", symbols=len(series_by_symbol)):
+            report = compute_report(series_by_symbol, benchmark_series, benchmark, range, interval,
+                                    window, missing)
+        with self._lock:
+            self._reports[key] = report
+            self._reports.move_to_end(key)
+            while len(self._reports) > self.max_reports:
+                self._reports.popitem(last=False)
+        return report
+
+
+def default_universe():
+    """The curated desk list of the symbol index (not every imported listing)."""
+    import symbol_index
+    return symbol_index.get_index().desk_symbols()
+
+
+def build_correlation_figure(report):
+    """Plotly heatmap of a report's correlation matrix."""
+    import plotly.graph_objects as go
+
+    fig = go.Figure(go.Heatmap(
+        z=report.correlation, x=report.symbols, y=report.symbols,
+        zmin=-1, zmax=1, colorscale="RdBu", reversescale=True,
+        hovertemplate="%{y} / %{x}: %{z:.2f}<extra></extra>",
+    ))
+    size = max(400, 14 * len(report.symbols) + 150)
+    fig.update_layout(
+        title=f"Return correlation ({report.range}, {report.interval} bars)",
+        template="plotly_dark", height=size, yaxis_autorange="reversed",
+    )
+    return fig
+
+
+def build_rolling_beta_figure(report, top=5):
+    """Rolling beta of the top highest-beta symbols against the benchmark."""
+    import plotly.graph_objects as go
+
+    fig = go.Figure()
+    if len(report.rolling_beta):
+        latest = _last_valid(report.rolling_beta)
+        order = np.argsort(-np.nan_to_num(latest, nan=-np.inf))[:top]
+        x = report.rolling_timestamps.astype("datetime64[s]")
+        for column in order:
+            fig.add_trace(go.Scatter(x=x, y=report.rolling_beta[:, column], mode="lines",
+                                     name=report.symbols[column]))
+    fig.update_layout(
+        title=f"Rolling {report.window}-bar beta vs {report.benchmark}",
+        template="plotly_dark", yaxis_title="Beta",
+    )
+    return fig
+
+
+analytics = PortfolioAnalytics()
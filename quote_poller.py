@@ -0,0 +1,167 @@
+"""
+Process-wide background quote poller.
+
+Sessions subscribe to the tickers they watch; a single daemon thread
+polls the union of all subscribed tickers from markets/quote (in batches,
+through watchlist.fetch_quotes) and publishes each snapshot to an
+in-memory QuoteBoard. Sessions read the board without any network I/O,
+so upstream load grows with the number of distinct tickers, not with the
+number of users watching them.
+
+Subscriptions expire when a session stops renewing them (it closed its
+tab), and the thread idles while nobody is subscribed. Polls run at
+BACKGROUND priority, so the rate limiter serves users' questions first.
+"""
+import threading
+import time
+
+import rate_limiter
+
+# Seconds between polls; quotes are cached for 15s, polling faster gains nothing
+POLL_INTERVAL = 15
+# Upper bound on markets/quote requests the poller may make per minute
+MAX_REQUESTS_PER_MINUTE = 20
+# A subscription that is not renewed within this many seconds is dropped
+SUBSCRIPTION_TTL = 5 * 60
+
+
+class QuoteBoard:
+    """
+    In-memory pub/sub of the latest quote per symbol.
+
+    Publishers call publish(); readers call snapshot() or block in
+    wait_for_update() until a newer version is published.
+    """
+
+    def __init__(self):
+        self.version = 0
+        self.updated_at = None
+        self._quotes = {}
+        self._changed = threading.Condition()
+
+    def publish(self, quotes):
+        with self._changed:
+            self._quotes.update(quotes)
+            self.version += 1
+            self.updated_at = time.time()
+            self._changed.notify_all()
+
+    def snapshot(self, symbols=None):
+        """
+        Return (quotes, version) for the given symbols (all symbols when None).
+        """
+        with self._changed:
+            if symbols is None:
+                return dict(self._quotes), self.version
+            return {symbol: self._quotes[symbol] for symbol in symbols if symbol in self._quotes}, self.version
+
+    def wait_for_update(self, version, timeout=None):
+        """Block until a version newer than version is published (or timeout). Returns the current version."""
+        with self._changed:
+            self._changed.wait_for(lambda: self.version > version, timeout=timeout)
+            return self.version
+
+
+class QuotePoller:
+    """
+    Background thread that keeps the QuoteBoard fresh for all subscribed tickers.
+
+    Parameters:
+    fetch_quotes (callable): symbols -> (quotes, errors), e.g. watchlist.fetch_quotes.
+    batch_size (int): Symbols per upstream request, used to respect MAX_REQUESTS_PER_MINUTE.
+    """
+
+    def __init__(self, fetch_quotes, batch_size, board=None):
+        self.fetch_quotes = fetch_quotes
+        self.batch_size = batch_size
+        self.board = board or QuoteBoard()
+        self.last_errors = []
+        self._subscriptions = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def subscribe(self, session_id, symbols):
+        """Register or renew the tickers a session is watching, starting the thread if needed."""
+        symbols = frozenset(symbols)
+        with self._lock:
+            previous = self._subscriptions.get(session_id, (None, None))[0]
+            self._subscriptions[session_id] = (symbols, time.monotonic())
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="quote-poller", daemon=True)
+                self._thread.start()
+        # Poll right away when the watched set changed (the thread may be idle)
+        if symbols != previous:
+            self._wake.set()
+
+    def unsubscribe(self, session_id):
+        with self._lock:
+            self._subscriptions.pop(session_id, None)
+
+    def refresh_now(self):
+        """Ask the thread to poll immediately instead of waiting for the next interval."""
+        self._wake.set()
+
+    def watched_symbols(self):
+        """Return the union of tickers of all live subscriptions, dropping expired ones."""
+        now = time.monotonic()
+        with self._lock:
+            expired = [session_id for session_id, (_, seen) in self._subscriptions.items()
+                       if now - seen > SUBSCRIPTION_TTL]
+            for session_id in expired:
+                del self._subscriptions[session_id]
+            return sorted(set().union(*(symbols for symbols, _ in self._subscriptions.values())))
+
+    def min_gap(self, symbol_count):
+        """Shortest time between polls that keeps within MAX_REQUESTS_PER_MINUTE."""
+        requests_per_poll = -(-symbol_count // self.batch_size)
+        return requests_per_poll * 60.0 / MAX_REQUESTS_PER_MINUTE
+
+    def poll_interval(self, symbol_count):
+        """Seconds between scheduled polls."""
+        return max(POLL_INTERVAL, self.min_gap(symbol_count))
+
+    def poll_once(self):
+        """Fetch quotes for every watched ticker and publish them. Returns the number of tickers polled."""
+        symbols = self.watched_symbols()
+        if symbols:
+            quotes, self.last_errors = self.fetch_quotes(symbols)
+            if quotes:
+                self.board.publish(quotes)
+        return len(symbols)
+
+    def _run(self):
+        last_poll, last_polled = None, 0
+        while True:
+            self._wake.clear()
+            if last_poll is not None:
+                # Early wake-ups (new tickers, refresh_now) still respect the rate limit
+                delay = last_poll + self.min_gap(last_polled) - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            last_poll = time.monotonic()
+            try:
+                with rate_limiter.priority(rate_limiter.BACKGROUND):
+                    last_polled = self.poll_once()
+            except Exception as e:
+                # Keep polling; the error is shown to the sessions instead
+                self.last_errors = [str(e)]
+            if not last_polled:
+                # Nobody is watching: sleep until a session subscribes
+                self._wake.wait()
+                continue
+            self._wake.wait(timeout=self.poll_interval(last_polled))
+
+
+_poller = None
+_poller_lock = threading.Lock()
+
+
+def get_poller():
+    """Return the process-wide poller, creating it on first use."""
+    global _poller
+    with _poller_lock:
+        if _poller is None:
+            import watchlist
+            _poller = QuotePoller(watchlist.fetch_quotes, watchlist.QUOTE_BATCH_SIZE)
+        return _poller
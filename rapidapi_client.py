@@ -0,0 +1,180 @@
+"""
+Shared HTTP client for the RapidAPI hosts used by TikerTalk.
+
+Every host gets one keep-alive requests.Session with a bounded connection
+pool, so reruns reuse the TCP+TLS connection instead of doing a new
+handshake for every question. Requests have connect/read timeouts, are
+retried with jittered exponential backoff on 429/5xx, and each host has a
+limit on how many requests may be in flight at the same time. Requests
+are also paced by the host and key's adaptive RateLimiter (see
+rate_limiter), which every response's rate-limit headers are fed back to.
+"""
+import os
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import rate_limiter
+import tracing
+
+YAHOO_FINANCE15_HOST = "yahoo-finance15.p.rapidapi.com"
+YAHOO_FINANCE166_HOST = "yahoo-finance166.p.rapidapi.com"
+
+# (connect timeout, read timeout) in seconds
+CONNECT_TIMEOUT = 3.05
+READ_TIMEOUT = 15
+
+# Connection pool size and number of concurrent requests allowed per host
+POOL_MAXSIZE = 8
+MAX_CONCURRENT_REQUESTS = 4
+
+# Retry policy for throttled / failing upstream responses
+MAX_RETRIES = 3
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 8.0
+RETRY_STATUS_CODES = frozenset([429, 500, 502, 503, 504])
+
+# Sends every host's requests to this base URL instead (e.g. the benchmark's stand-in server)
+BASE_URL_OVERRIDE = os.environ.get("TIKERTALK_RAPIDAPI_BASE_URL")
+
+
+class HostClient:
+    """
+    Keep-alive client for a single RapidAPI host.
+
+    Parameters:
+    host (str): RapidAPI host name (e.g., 'yahoo-finance15.p.rapidapi.com').
+    api_key (str): RapidAPI key used for this host.
+    base_url (str): Where requests are sent; defaults to https://<host>.
+    """
+
+    def __init__(self, host, api_key, pool_maxsize=POOL_MAXSIZE,
+                 max_concurrent=MAX_CONCURRENT_REQUESTS, max_retries=MAX_RETRIES, base_url=None):
+        self.host = host
+        self.api_key = api_key
+        self.base_url = (base_url or f"https://{host}").rstrip("/")
+        self.max_retries = max_retries
+        self.session = requests.Session()
+        # Retries are handled in get() so that they share the backoff policy
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "x-rapidapi-key": api_key,
+            "x-rapidapi-host": host,
+        })
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        # Shared by every client of this host and key, so it survives reconfiguration
+        self.limiter = rate_limiter.get_limiter(host, api_key)
+
+    def url(self, path):
+        return f"{self.base_url}{path}"
+
+    def get(self, path, params=None):
+        """
+        Send a GET request to the host, retrying on 429/5xx and network errors.
+        Every attempt first waits for the rate limiter, at the caller's priority.
+
+        Returns:
+        requests.Response: The successful response.
+
+        Raises:
+        rate_limiter.QuotaExhausted: When the limiter cannot send the request in time,
+            or the host still answers 429 after all retries.
+        requests.exceptions.RequestException: When the request still fails after all retries.
+        """
+        url = self.url(path)
+        with tracing.span("upstream", host=self.host, path=path):
+            attempt = 0
+            while True:
+                with tracing.span("rate_limit", host=self.host):
+                    self.limiter.acquire()
+                with self._slots:
+                    try:
+                        response = self.session.get(url, params=params,
+                                                    timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+                    except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                        tracing.count("upstream_errors_total", host=self.host, error=type(e).__name__)
+                        if attempt >= self.max_retries:
+                            tracing.annotate(retries=attempt)
+                            raise
+                        response = None
+                if response is not None:
+                    tracing.count("upstream_responses_total", host=self.host, status=response.status_code)
+                    retry_after = _retry_after_seconds(response)
+                    delay = backoff_delay(attempt, retry_after)
+                    # A 429 holds back every request to the host, so the delay is the limiter's pause
+                    self.limiter.update(response.status_code, response.headers, pause=delay)
+                    if response.status_code not in RETRY_STATUS_CODES or attempt >= self.max_retries:
+                        received = len(response.content)
+                        tracing.count("upstream_bytes_total", received, host=self.host)
+                        tracing.annotate(status=response.status_code, bytes=received, retries=attempt)
+                        if response.status_code == 429:
+                            raise rate_limiter.QuotaExhausted(self.host, retry_after)
+                        response.raise_for_status()
+                        return response
+                    response.close()
+                    if response.status_code == 429:
+                        delay = 0
+                else:
+                    delay = backoff_delay(attempt)
+                time.sleep(delay)
+                attempt += 1
+                tracing.count("upstream_retries_total", host=self.host)
+
+    def close(self):
+        self.session.close()
+
+
+def backoff_delay(attempt, retry_after=None):
+    """Full-jitter exponential backoff, never shorter than the server's Retry-After."""
+    delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+    if retry_after is not None:
+        delay = max(delay, min(retry_after, BACKOFF_MAX))
+    return delay
+
+
+def _retry_after_seconds(response):
+    value = response.headers.get("Retry-After")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def configure(host, api_key, base_url=None):
+    """
+    Register the API key for a host. Safe to call on every Streamlit rerun:
+    the existing session is kept unless the key or base URL changes.
+
+    Parameters:
+    base_url (str): Send the host's requests here instead of https://<host>
+        (defaults to BASE_URL_OVERRIDE, when set).
+    """
+    base_url = (base_url or BASE_URL_OVERRIDE or f"https://{host}").rstrip("/")
+    with _clients_lock:
+        client = _clients.get(host)
+        if client is None or client.api_key != api_key or client.base_url != base_url:
+            if client is not None:
+                client.close()
+            _clients[host] = HostClient(host, api_key, base_url=base_url)
+        return _clients[host]
+
+
+def get_client(host):
+    client = _clients.get(host)
+    if client is None:
+        raise RuntimeError(f"No API key configured for {host}. Call configure() first.")
+    return client
+
+
+def get(host, path, params=None):
+    """Shortcut for get_client(host).get(path, params)."""
+    return get_client(host).get(path, params=params)
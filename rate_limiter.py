@@ -0,0 +1,280 @@
+"""
+Adaptive rate limiting and quota tracking per RapidAPI key and host.
+
+Every (host, API key) pair gets a RateLimiter: a token bucket that lets
+short bursts through and then paces requests to its current rate. The
+rate adapts to the upstream: a 429 halves it and pauses the bucket for
+the backoff delay, and every successful response adds a little back, up
+to the configured rate. The RapidAPI rate-limit headers are read on every
+response. 'x-ratelimit-requests-*' tracks the plan's quota, and
+'x-ratelimit-*' tracks the short per-window limit; when a window is used
+up the bucket pauses until it resets.
+
+Callers waiting for a token are served by priority, then in arrival
+order. Interactive requests (the default) go ahead of background
+refreshes such as the quote poller, which runs its fetches inside
+priority(BACKGROUND). Background requests also leave the last
+BACKGROUND_RESERVE share of the quota to interactive ones. When a
+request cannot be sent before its deadline (the quota is gone, or the
+queue is too long), acquire() raises QuotaExhausted, and the response
+cache answers with stale data instead when it has some.
+"""
+import contextvars
+import heapq
+import itertools
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import requests
+
+# Request priorities; lower values are served first
+INTERACTIVE = 0
+BACKGROUND = 10
+
+# Token bucket defaults: sustained requests per second and burst size (per host and key)
+DEFAULT_RATE = float(os.environ.get("TIKERTALK_RAPIDAPI_RATE", 5))
+DEFAULT_BURST = int(os.environ.get("TIKERTALK_RAPIDAPI_BURST", 10))
+# The rate is never lowered below this, however often the host throttles
+MIN_RATE = 0.2
+# Requests per second added back after every successful response
+RATE_RECOVERY = 0.25
+
+# Longest a request may wait for a token, per priority, in seconds
+MAX_WAIT = {INTERACTIVE: 10.0, BACKGROUND: 60.0}
+# Share of the quota that background requests leave to interactive ones
+BACKGROUND_RESERVE = 0.05
+
+_priority = contextvars.ContextVar("tikertalk_priority", default=INTERACTIVE)
+
+
+class QuotaExhausted(requests.exceptions.RequestException):
+    """The request could not be sent before its deadline without exceeding the host's limits."""
+
+    def __init__(self, host, retry_in=None):
+        if retry_in is None or math.isinf(retry_in) or retry_in < 1:
+            message = f"The request budget for {host} is used up; please try again later."
+        else:
+            message = f"The request budget for {host} is used up; please try again in {math.ceil(retry_in)}s."
+        super().__init__(message)
+        self.host = host
+        self.retry_in = retry_in
+
+
+@contextmanager
+def priority(level):
+    """Send the requests made inside the block (and in work submitted with its context) at level."""
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority():
+    return _priority.get()
+
+
+def is_rate_limited(error):
+    """True for QuotaExhausted and for HTTP 429 errors that survived the retries."""
+    if isinstance(error, QuotaExhausted):
+        return True
+    response = getattr(error, "response", None)
+    return isinstance(error, requests.exceptions.HTTPError) and response is not None \
+        and response.status_code == 429
+
+
+def _header_number(headers, name):
+    value = headers.get(name)
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class RateLimiter:
+    """
+    Token bucket with a priority queue for one host and API key.
+
+    Parameters:
+    host (str): RapidAPI host name.
+    key_id (str): Masked API key, for display.
+    rate (float): Sustained requests per second when the host is not throttling.
+    burst (int): Requests that may be sent at once after an idle period.
+    """
+
+    def __init__(self, host, key_id, rate=DEFAULT_RATE, burst=DEFAULT_BURST):
+        self.host = host
+        self.key_id = key_id
+        self.configured_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.paused_until = 0.0
+        # Plan quota from the x-ratelimit-requests-* headers (None until a response reports it)
+        self.quota_limit = None
+        self.quota_remaining = None
+        self.quota_reset_at = None
+        self.sent = 0
+        self.throttled = 0
+        self.rejected = 0
+        self._updated = time.monotonic()
+        self._waiters = []
+        self._sequence = itertools.count()
+        self._changed = threading.Condition()
+
+    def acquire(self, level=None, timeout=None):
+        """
+        Block until a request may be sent.
+
+        Parameters:
+        level (int): Priority; defaults to the caller's priority() (INTERACTIVE).
+        timeout (float): Longest wait, in seconds; defaults to MAX_WAIT for the priority.
+
+        Raises:
+        QuotaExhausted: When the request cannot be sent within timeout.
+        """
+        level = current_priority() if level is None else level
+        if timeout is None:
+            timeout = MAX_WAIT.get(level, MAX_WAIT[BACKGROUND])
+        deadline = time.monotonic() + timeout
+        waiter = (level, next(self._sequence))
+        with self._changed:
+            heapq.heappush(self._waiters, waiter)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    if self._waiters[0] != waiter:
+                        # Someone ahead in the queue; they notify when they are done
+                        if now >= deadline:
+                            raise QuotaExhausted(self.host, self._wait_time(now, level))
+                        self._changed.wait(deadline - now)
+                        continue
+                    wait = self._wait_time(now, level)
+                    if wait <= 0:
+                        self.tokens -= 1
+                        self.sent += 1
+                        if self.quota_remaining is not None:
+                            self.quota_remaining -= 1
+                        return
+                    if now + wait > deadline:
+                        raise QuotaExhausted(self.host, wait)
+                    self._changed.wait(wait)
+            except QuotaExhausted:
+                self.rejected += 1
+                raise
+            finally:
+                self._waiters.remove(waiter)
+                heapq.heapify(self._waiters)
+                self._changed.notify_all()
+
+    def update(self, status, headers, pause=None):
+        """
+        Adapt to an upstream response.
+
+        Parameters:
+        status (int): HTTP status code.
+        headers (Mapping): Response headers (case-insensitive, as on requests.Response).
+        pause (float): For a 429, how long to hold back every request to the host.
+        """
+        now = time.monotonic()
+        with self._changed:
+            self._refill(now)
+            limit = _header_number(headers, "x-ratelimit-requests-limit")
+            remaining = _header_number(headers, "x-ratelimit-requests-remaining")
+            reset = _header_number(headers, "x-ratelimit-requests-reset")
+            if remaining is not None:
+                self.quota_limit = int(limit) if limit is not None else self.quota_limit
+                self.quota_remaining = int(remaining)
+                self.quota_reset_at = now + reset if reset is not None else None
+
+            remaining = _header_number(headers, "x-ratelimit-remaining")
+            reset = _header_number(headers, "x-ratelimit-reset")
+            if remaining is not None:
+                self.tokens = min(self.tokens, remaining)
+                if remaining <= 0 and reset is not None:
+                    self.paused_until = max(self.paused_until, now + reset)
+
+            if status == 429:
+                self.throttled += 1
+                self.rate = max(MIN_RATE, self.rate / 2)
+                self.tokens = min(self.tokens, 0.0)
+                self.paused_until = max(self.paused_until, now + (pause if pause is not None else 1 / self.rate))
+            elif status < 500:
+                self.rate = min(self.configured_rate, self.rate + RATE_RECOVERY)
+            self._changed.notify_all()
+
+    def status(self):
+        """Return the limiter's state as a dict (for the quota panel)."""
+        now = time.monotonic()
+        with self._changed:
+            self._refill(now)
+            quota_reset_in = None
+            if self.quota_reset_at is not None:
+                quota_reset_in = max(0.0, self.quota_reset_at - now)
+            return {
+                "host": self.host,
+                "key": self.key_id,
+                "rate": self.rate,
+                "tokens": self.tokens,
+                "queued": len(self._waiters),
+                "paused_for": max(0.0, self.paused_until - now),
+                "quota_limit": self.quota_limit,
+                "quota_remaining": self.quota_remaining,
+                "quota_reset_in": quota_reset_in,
+                "sent": self.sent,
+                "throttled": self.throttled,
+                "rejected": self.rejected,
+            }
+
+    # The helpers below must be called with self._changed held
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if self.quota_reset_at is not None and now >= self.quota_reset_at:
+            # A new quota period; the next response reports its size
+            self.quota_remaining = None
+            self.quota_reset_at = None
+
+    def _wait_time(self, now, level):
+        """Seconds until a request at level may be sent (inf when the quota does not reset)."""
+        wait = max(0.0, self.paused_until - now)
+        if self.tokens < 1:
+            wait = max(wait, (1 - self.tokens) / self.rate)
+        if self.quota_remaining is not None:
+            reserve = 0
+            if level >= BACKGROUND and self.quota_limit:
+                reserve = math.ceil(self.quota_limit * BACKGROUND_RESERVE)
+            if self.quota_remaining <= reserve:
+                wait = max(wait, self.quota_reset_at - now if self.quota_reset_at is not None else math.inf)
+        return wait
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(host, api_key, rate=None, burst=None):
+    """
+    Return the process-wide limiter of a host and key, creating it on first
+    use with the given rate and burst (DEFAULT_RATE and DEFAULT_BURST when None).
+    """
+    with _limiters_lock:
+        limiter = _limiters.get((host, api_key))
+        if limiter is None:
+            key_id = f"...{api_key[-4:]}" if api_key else "none"
+            limiter = _limiters[(host, api_key)] = RateLimiter(
+                host, key_id, rate=rate or DEFAULT_RATE, burst=burst or DEFAULT_BURST
+            )
+        return limiter
+
+
+def status():
+    """Return the status() of every limiter, ordered by host."""
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return [limiter.status() for limiter in sorted(limiters, key=lambda limiter: (limiter.host, limiter.key_id))]
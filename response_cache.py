@@ -0,0 +1,296 @@
+"""
+TTL response cache in front of the RapidAPI fetchers.
+
+Entries are keyed on (endpoint, ticker, region, range, interval, module)
+and expire after a per-endpoint TTL: quotes go stale in seconds, while
+company profiles and analyst reports are good for hours. The cache is
+bounded by an approximate memory budget (the size of the raw response
+body) and evicts least recently used entries first. Concurrent requests
+for the same key are coalesced so only one of them goes upstream.
+
+Expired entries are kept (within the memory budget) for up to
+MAX_STALE_SECONDS. When a refresh fails because the host's rate limit or
+quota is used up, the stale value is returned instead of the error.
+
+With a shared tier (see shared_cache), a local miss first looks for
+another server process's result and only one process at a time fetches
+a key from upstream, so scaling out does not multiply upstream calls.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+import rapidapi_client
+import rate_limiter
+import response_models
+import shared_cache
+import tracing
+
+# Freshness policy per endpoint path, in seconds
+ENDPOINT_TTLS = {
+    "/api/v1/markets/quote": 15,
+    "/api/v1/markets/news": 5 * 60,
+    "/api/v1/markets/stock/modules": 12 * 60 * 60,
+    "/api/stock/get-chart": 60,
+    "/api/stock/get-what-analysts-are-saying": 6 * 60 * 60,
+}
+DEFAULT_TTL = 60
+
+# Approximate memory budget for cached responses
+MAX_CACHE_BYTES = 32 * 1024 * 1024
+# How long after expiry an entry may still be served while the upstream is rate limited
+MAX_STALE_SECONDS = 24 * 60 * 60
+
+
+class _Entry:
+    __slots__ = ("value", "size", "expires_at")
+
+    def __init__(self, value, size, expires_at):
+        self.value = value
+        self.size = size
+        self.expires_at = expires_at
+
+
+class _Flight:
+    """A fetch in progress that other callers for the same key wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class ResponseCache:
+    """
+    Thread-safe LRU cache with per-entry expiry and request coalescing.
+
+    Parameters:
+    max_bytes (int): Memory budget for the cached values.
+    max_stale (float): Seconds an expired entry is kept as a fallback for rate-limited refreshes.
+    shared (shared_cache.SharedCache): Cache tier shared with other server processes, if any.
+    """
+
+    def __init__(self, max_bytes=MAX_CACHE_BYTES, max_stale=MAX_STALE_SECONDS, shared=None):
+        self.max_bytes = max_bytes
+        self.max_stale = max_stale
+        self.shared = shared
+        self.shared_hits = 0
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.stale = 0
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the cached value for key, or None if it is missing or expired."""
+        with self._lock:
+            entry = self._lookup(key)
+            return entry.value if entry is not None else None
+
+    def set(self, key, value, size, ttl):
+        with self._lock:
+            self._store(key, value, size, ttl)
+
+    def get_or_fetch(self, key, ttl, loader):
+        """
+        Return the cached value for key, calling loader() on a miss.
+
+        loader must return a (value, size_in_bytes) tuple. Exceptions raised
+        by loader are passed on to every caller waiting on the key and the
+        failure is not cached, except that rate-limit errors are answered
+        with the expired value when there still is one.
+        """
+        with self._lock:
+            entry = self._lookup(key)
+            if entry is not None:
+                self.hits += 1
+                _record_cache_result("hit")
+                return entry.value
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                self.misses += 1
+                flight = self._inflight[key] = _Flight()
+            else:
+                self.coalesced += 1
+        if not leader:
+            _record_cache_result("coalesced")
+        elif self.shared is None:
+            _record_cache_result("miss")
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            if self.shared is not None:
+                value, size, ttl = self._load_shared(key, ttl, loader)
+            else:
+                value, size = loader()
+            flight.value = value
+            with self._lock:
+                self._store(key, value, size, ttl)
+            return value
+        except BaseException as e:
+            stale = self._stale_value(key) if rate_limiter.is_rate_limited(e) else None
+            if stale is None:
+                flight.error = e
+                raise
+            _record_cache_result("stale")
+            flight.value = stale
+            return stale
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.done.set()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "stale": self.stale,
+                "shared_hits": self.shared_hits,
+            }
+
+    def _load_shared(self, key, ttl, loader):
+        """
+        Load key through the shared tier: take another process's fresh result,
+        or fetch it while holding the key's cross-process lock and publish it.
+
+        Returns:
+        tuple: (value, size, seconds the value stays fresh).
+        """
+        shared_key = shared_cache.encode_key(key)
+        deadline = time.monotonic() + shared_cache.FLIGHT_MAX_WAIT
+        waited = False
+        while True:
+            entry = self.shared.get(shared_key)
+            if entry is not None and entry.expires_at > time.time():
+                with self._lock:
+                    self.shared_hits += 1
+                _record_cache_result("shared_coalesced" if waited else "shared_hit")
+                return entry.value, entry.size, entry.expires_at - time.time()
+            if self.shared.acquire(shared_key):
+                _record_cache_result("miss")
+                try:
+                    value, size = loader()
+                    self.shared.set(shared_key, value, size, ttl, self.max_stale)
+                    return value, size, ttl
+                finally:
+                    self.shared.release(shared_key)
+            if time.monotonic() >= deadline:
+                # The other process is taking too long; fetch without the lock
+                _record_cache_result("miss")
+                value, size = loader()
+                return value, size, ttl
+            waited = True
+            time.sleep(shared_cache.FLIGHT_POLL_INTERVAL)
+
+    def _stale_value(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at + self.max_stale > time.monotonic():
+                self.stale += 1
+                return entry.value
+        if self.shared is not None:
+            # Another process may still have it
+            entry = self.shared.get(shared_cache.encode_key(key))
+            if entry is not None:
+                with self._lock:
+                    self.stale += 1
+                return entry.value
+        return None
+
+    # The helpers below must be called with self._lock held
+
+    def _lookup(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        now = time.monotonic()
+        if entry.expires_at <= now:
+            # Kept as a fallback while it is young enough (see _stale_value)
+            if entry.expires_at + self.max_stale <= now:
+                self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _store(self, key, value, size, ttl):
+        if key in self._entries:
+            self._remove(key)
+        if size > self.max_bytes:
+            return
+        self._entries[key] = _Entry(value, size, time.monotonic() + ttl)
+        self.current_bytes += size
+        while self.current_bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self.current_bytes -= entry.size
+
+
+def _record_cache_result(result):
+    tracing.annotate(cache=result)
+    tracing.count("cache_requests_total", result=result)
+
+
+def make_key(path, params):
+    """Build the cache key (endpoint, ticker, region, range, interval, module)."""
+    params = params or {}
+    ticker = params.get("ticker") or params.get("symbol")
+    return (
+        path,
+        ticker.upper() if ticker else None,
+        params.get("region"),
+        params.get("range"),
+        params.get("interval"),
+        params.get("module"),
+    )
+
+
+# Process-wide cache shared by every Streamlit session (and, with
+# TIKERTALK_SHARED_CACHE set, backed by the other server processes' results)
+cache = ResponseCache(shared=shared_cache.get_shared_cache())
+
+
+def fetch_json(host, path, params=None, parse=None):
+    """
+    Fetch a RapidAPI endpoint through the cache and return the parsed JSON.
+
+    Parameters:
+    parse (callable): Turns the decoded JSON into what is cached and
+        returned (e.g. response_models records), so the full response is
+        not kept. Every caller of an endpoint should pass the same parse.
+
+    Raises:
+    requests.exceptions.RequestException: When the upstream request fails.
+    """
+    def load():
+        response = rapidapi_client.get(host, path, params=params)
+        with tracing.span("parse_json", path=path):
+            data = response_models.loads(response.content)
+        if parse is None:
+            return data, len(response.content)
+        value = parse(data)
+        return value, response_models.approximate_size(value)
+
+    ttl = ENDPOINT_TTLS.get(path, DEFAULT_TTL)
+    with tracing.span("fetch", path=path):
+        return cache.get_or_fetch(make_key(path, params), ttl, load)
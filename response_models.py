@@ -0,0 +1,263 @@
+"""
+Compact records for the RapidAPI responses.
+
+Responses are decoded once (with orjson when it is installed, otherwise
+the standard library's json) and turned into __slots__ records that keep
+only the fields the app shows, with their types checked on the way in:
+text fields hold str or None, numeric fields float/int or None. Missing
+values are stored as None and only replaced by 'No title available' and
+the like when a record is turned back into a dict for display.
+
+Chart bars are not records: they are parsed into NumPy arrays by
+chart_series.parse_chart.
+"""
+import json
+import sys
+
+try:
+    import orjson
+except ImportError:  # optional; json.loads is used instead
+    orjson = None
+
+
+def loads(content):
+    """Decode a JSON response body (bytes or str)."""
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+def _text(value):
+    if value is None:
+        return None
+    return value if isinstance(value, str) else str(value)
+
+
+def _number(value):
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return value
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class Record:
+    """
+    Base class of the response records.
+
+    Subclasses list their fields in FIELDS as (attribute, JSON key, converter)
+    and may give display placeholders for missing values in DEFAULTS.
+    """
+
+    __slots__ = ()
+    FIELDS = ()
+    DEFAULTS = {}
+
+    def __init__(self, *values):
+        for (attribute, _, _), value in zip(self.FIELDS, values):
+            setattr(self, attribute, value)
+
+    @classmethod
+    def from_json(cls, item):
+        """Build a record from one JSON object; returns None if item is not an object."""
+        if not isinstance(item, dict):
+            return None
+        return cls(*(convert(item.get(key)) for _, key, convert in cls.FIELDS))
+
+    def to_dict(self):
+        """The record as {JSON key: value}, with placeholders for missing values."""
+        return {
+            key: self.DEFAULTS.get(attribute) if getattr(self, attribute) is None else getattr(self, attribute)
+            for attribute, key, _ in self.FIELDS
+        }
+
+    def __eq__(self, other):
+        return type(self) is type(other) and all(
+            getattr(self, attribute) == getattr(other, attribute) for attribute, _, _ in self.FIELDS
+        )
+
+    def __repr__(self):
+        values = ", ".join(f"{attribute}={getattr(self, attribute)!r}" for attribute, _, _ in self.FIELDS)
+        return f"{type(self).__name__}({values})"
+
+
+def _slots(fields):
+    return tuple(attribute for attribute, _, _ in fields)
+
+
+class Quote(Record):
+    """One markets/quote entry."""
+
+    FIELDS = (
+        ("symbol", "symbol", _text),
+        ("short_name", "shortName", _text),
+        ("currency", "currency", _text),
+        ("exchange", "exchange", _text),
+        ("price", "regularMarketPrice", _number),
+        ("change", "regularMarketChange", _number),
+        ("change_percent", "regularMarketChangePercent", _number),
+        ("volume", "regularMarketVolume", _number),
+        ("day_high", "regularMarketDayHigh", _number),
+        ("day_low", "regularMarketDayLow", _number),
+        ("open", "regularMarketOpen", _number),
+        ("previous_close", "regularMarketPreviousClose", _number),
+        ("market_time", "regularMarketTime", _number),
+        ("market_cap", "marketCap", _number),
+        ("trailing_pe", "trailingPE", _number),
+        ("forward_pe", "forwardPE", _number),
+        ("eps", "epsTrailingTwelveMonths", _number),
+        ("year_high", "fiftyTwoWeekHigh", _number),
+        ("year_low", "fiftyTwoWeekLow", _number),
+        ("market_state", "marketState", _text),
+    )
+    __slots__ = _slots(FIELDS)
+
+
+class NewsItem(Record):
+    """One markets/news article."""
+
+    FIELDS = (
+        ("title", "title", _text),
+        ("description", "description", _text),
+        ("pub_date", "pubDate", _text),
+    )
+    DEFAULTS = {
+        "title": "No title available",
+        "description": "No description available",
+        "pub_date": "No publication date available",
+    }
+    __slots__ = _slots(FIELDS)
+
+
+class Officer(Record):
+    """One entry of an asset profile's companyOfficers."""
+
+    FIELDS = (
+        ("name", "name", _text),
+        ("title", "title", _text),
+        ("age", "age", _number),
+    )
+    __slots__ = _slots(FIELDS)
+
+
+def _officers(value):
+    if not isinstance(value, list):
+        return ()
+    return tuple(officer for officer in map(Officer.from_json, value) if officer is not None)
+
+
+class Profile(Record):
+    """The asset-profile module of stock/modules."""
+
+    FIELDS = (
+        ("address", "address1", _text),
+        ("city", "city", _text),
+        ("state", "state", _text),
+        ("zip", "zip", _text),
+        ("country", "country", _text),
+        ("phone", "phone", _text),
+        ("website", "website", _text),
+        ("industry", "industry", _text),
+        ("sector", "sector", _text),
+        ("summary", "longBusinessSummary", _text),
+        ("employees", "fullTimeEmployees", _number),
+        ("officers", "companyOfficers", _officers),
+    )
+    __slots__ = _slots(FIELDS)
+
+    def to_dict(self):
+        data = super().to_dict()
+        data["companyOfficers"] = [officer.to_dict() for officer in self.officers]
+        return data
+
+
+class AnalystReport(Record):
+    """One hit of get-what-analysts-are-saying."""
+
+    FIELDS = (
+        ("report_title", "report_title", _text),
+        ("author", "author", _text),
+        ("pdf_url", "pdf_url", _text),
+        ("report_type", "report_type", _text),
+        ("abstract", "abstract", _text),
+        ("provider", "provider", _text),
+        ("report_date", "report_date", _number),
+    )
+    DEFAULTS = {
+        "report_title": "No title available",
+        "author": "Unknown author",
+        "pdf_url": "No URL available",
+        "report_type": "No type available",
+        "abstract": "No abstract available",
+        "provider": "Unknown provider",
+    }
+    __slots__ = _slots(FIELDS)
+
+
+def parse_records(record_type, items):
+    """Parse a list of JSON objects into a tuple of records, skipping anything that is not an object."""
+    if isinstance(items, dict):
+        items = [items]
+    if not isinstance(items, list):
+        return ()
+    return tuple(record for record in map(record_type.from_json, items) if record is not None)
+
+
+def to_dicts(records):
+    """Records (or a single record) as plain dicts, for st.write and JSON output."""
+    if isinstance(records, Record):
+        return records.to_dict()
+    return [record.to_dict() for record in records]
+
+
+def approximate_size(value):
+    """
+    Approximate memory held by a parsed value, in bytes, for the response
+    cache's budget: records (and tuples of them) plus their field values,
+    NumPy-backed objects through their nbytes() method.
+    """
+    if hasattr(value, "nbytes") and callable(value.nbytes):
+        return value.nbytes()
+    if isinstance(value, Record):
+        size = sys.getsizeof(value)
+        for attribute, _, _ in value.FIELDS:
+            size += approximate_size(getattr(value, attribute))
+        return size
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(approximate_size(item) for item in value)
+    if value is None or isinstance(value, bool):
+        return 0
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(approximate_size(k) + approximate_size(v) for k, v in value.items())
+    return sys.getsizeof(value)
+
+
+# Response parsers, passed to response_cache.fetch_json so only the records are cached
+
+def parse_quotes(data):
+    """markets/quote response -> tuple of Quote (None when the response has no body)."""
+    body = data.get("body") if isinstance(data, dict) else None
+    return parse_records(Quote, body) if body is not None else None
+
+
+def parse_news(data):
+    """markets/news response -> tuple of NewsItem (None when the response has no body)."""
+    body = data.get("body") if isinstance(data, dict) else None
+    return parse_records(NewsItem, body) if body is not None else None
+
+
+def parse_profile(data):
+    """stock/modules asset-profile response -> Profile (None when the response has no body)."""
+    body = data.get("body") if isinstance(data, dict) else None
+    return Profile.from_json(body)
+
+
+def parse_analyst_reports(data):
+    """get-what-analysts-are-saying response -> tuple of AnalystReport (None when it has no result)."""
+    results = data.get("result") if isinstance(data, dict) else None
+    if not isinstance(results, list) or not results or not isinstance(results[0], dict):
+        return None
+    return parse_records(AnalystReport, results[0].get("hits"))
@@ -0,0 +1,180 @@
+"""
+Question routing: which functions answer a question.
+
+The local intent router is tried first; OpenAI function calling (with
+the FUNCTIONS schemas) is only used when its confidence is too low, and
+those decisions are remembered in the routing cache. Nothing here
+touches Streamlit, so the benchmark can drive it directly.
+"""
+import intent_router
+import routing_cache
+import tracing
+
+# Function schemas the OpenAI model chooses from
+FUNCTIONS = [
+    {
+        "name": "get_stock_news",
+        "description": "Fetch the latest news for a stock.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "stock_name": {
+                    "type": "string",
+                    "description": "Name of the stock",
+                }
+            },
+            "required": ["stock_name"],
+        },
+    },
+    {
+        "name": "get_stock_data",
+        "description": "Fetch key data about a stock, or stock data such as price and P/E ratio.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "stock_name": {
+                    "type": "string",
+                    "description": "Name of the stock",
+                }
+            },
+            "required": ["stock_name"],
+        },
+    },
+    {
+            "name": "get_stock_profile",
+            "description": "Fetch the company profile of a stock.",
+            "parameters": {
+                "type": "object",
+                "properties": {"stock_name": {"type": "string"}},
+                "required": ["stock_name"],
+            },
+    },
+    {
+            "name": "get_stock_chart",
+            "description": "Fetch the company chart or dashboard or analytics of a stock.",
+            "parameters": {
+                "type": "object",
+                "properties": {"stock_name": {"type": "string"},
+                               "region": {"type": "string", "enum": ["US", "IN", "JP", "APAC","EU"]},
+                                "range": {"type": "string", "enum": ["1d", "5d", "1mo", "3mo", "6mo", "1y", "5y"]},
+                                "interval": {"type": "string", "enum": ["1m", "5m", "15m", "30m", "1h", "1d", "1wk", "1mo"]}},
+                "required": ["stock_name", "region", "range", "interval"],
+            },
+    },
+    {
+            "name": "get_stock_indicators",
+            "description": "Fetch the stock chart with technical indicators such as SMA, EMA, Bollinger bands, RSI, MACD, VWAP or volatility.",
+            "parameters": {
+                "type": "object",
+                "properties": {"stock_name": {"type": "string"},
+                               "region": {"type": "string", "enum": ["US", "IN", "JP", "APAC","EU"]},
+                                "range": {"type": "string", "enum": ["1d", "5d", "1mo", "3mo", "6mo", "1y", "5y"]},
+                                "interval": {"type": "string", "enum": ["1m", "5m", "15m", "30m", "1h", "1d", "1wk", "1mo"]},
+                                "indicators": {
+                                    "type": "array",
+                                    "items": {
+                                        "type": "object",
+                                        "properties": {
+                                            "name": {"type": "string", "enum": intent_router.INDICATOR_NAMES},
+                                            "window": {"type": "integer", "description": "Lookback in bars, e.g. 50 for a 50-day SMA"},
+                                        },
+                                        "required": ["name"],
+                                    },
+                                }},
+                "required": ["stock_name", "region", "range", "interval", "indicators"],
+            },
+    },
+    {
+            "name": "get_analyst_data",
+            "description": "Fetch the analyst recommendations or what analyst has to say about stock?",
+            "parameters": {
+                "type": "object",
+                "properties": {"symbol": {"type": "string"}},
+                            #    "region": {"type": "string", "enum": ["US", "IN", "JP", "APAC","EU"]},
+                            #     "range": {"type": "string", "enum": ["1d", "5d", "1mo", "3mo", "6mo", "1y", "5y"]},
+                            #     "interval": {"type": "string", "enum": ["1m", "5m", "15m", "30m", "1h", "1d", "1wk", "1mo"]}},
+                "required": ["symbol"],
+            },
+    },
+    {
+            "name": "get_portfolio_analytics",
+            "description": "Compare risk across several stocks (or all tracked stocks): return correlation matrix, beta against a benchmark, volatility ranking and drawdowns.",
+            "parameters": {
+                "type": "object",
+                "properties": {"symbols": {"type": "array", "items": {"type": "string"},
+                                           "description": "Stock symbols; leave empty for all tracked stocks"},
+                               "benchmark": {"type": "string", "description": "Symbol the betas are measured against, e.g. SPY"},
+                               "range": {"type": "string", "enum": ["1mo", "3mo", "6mo", "1y", "5y"]},
+                               "interval": {"type": "string", "enum": ["1d", "1wk", "1mo"]},
+                               "window": {"type": "integer", "description": "Rolling beta window in bars, e.g. 60"}},
+                "required": [],
+            },
+    },
+    {
+            "name": "search_documents",
+            "description": "Search the news articles and analyst report abstracts fetched earlier for what was said about a topic.",
+            "parameters": {
+                "type": "object",
+                "properties": {"query": {"type": "string", "description": "Topic words, e.g. 'margins'"},
+                               "symbols": {"type": "array", "items": {"type": "string"},
+                                           "description": "Stock symbols; leave empty to search all stocks"},
+                               "kind": {"type": "string", "enum": ["news", "analyst"]},
+                               "days": {"type": "integer", "description": "Only items published in the last N days"}},
+                "required": ["query"],
+            },
+    }
+]
+
+
+
+def route_question(question, router, routes_cache, load_openai):
+    """
+    Decide which functions answer the question.
+
+    The local parser is tried first; OpenAI function calling is only used
+    when its confidence is below intent_router.CONFIDENCE_THRESHOLD, and its
+    decisions are remembered in the routing cache.
+
+    Parameters:
+    question (str): The user's question.
+    router (IntentRouter): The local parser.
+    routes_cache (RoutingCache): Earlier OpenAI decisions.
+    load_openai (callable): Returns the configured openai module.
+
+    Returns:
+    list: (function_name, args) calls, one per intent and ticker in the question.
+    """
+    decisions = router.parse_all(question)
+    if decisions and decisions[0].confidence >= intent_router.CONFIDENCE_THRESHOLD:
+        intent_router.record_route("local")
+        tracing.annotate(source="local", calls=len(decisions))
+        return [(decision.function_name, decision.args) for decision in decisions]
+
+    # Reuse an earlier OpenAI decision for the same normalized question
+    cache_key = routing_cache.normalize_question(question, router)
+    cached = routes_cache.get(cache_key)
+    if cached is not None:
+        intent_router.record_route("llm_cache")
+        tracing.annotate(source="llm_cache", calls=len(cached))
+        return cached
+
+    # Use OpenAI to determine whether to fetch stock data or news
+    messages = [{"role": "user", "content": question}]
+
+    # Call OpenAI API to decide which functions to run (it may pick several in parallel)
+    openai = load_openai()
+    with tracing.span("openai"):
+        response = openai.ChatCompletion.create(
+            model="gpt-3.5-turbo",
+            messages=messages,
+            tools=[{"type": "function", "function": schema} for schema in FUNCTIONS],
+            tool_choice="auto"
+        )
+    intent_router.record_route("llm")
+
+    calls = routing_cache.parse_function_calls(response["choices"][0]["message"])
+    tracing.annotate(source="llm", calls=len(calls))
+    if calls:
+        routes_cache.set(cache_key, calls)
+    return calls
+
@@ -0,0 +1,179 @@
+"""
+Persistent cache of OpenAI routing decisions.
+
+When the LLM router is needed, its function-call decision (the list of
+function names and parsed arguments) is stored under a normalized form of the question:
+case-folded, whitespace-collapsed and with the company name or ticker
+replaced by the canonical symbol. The store is a small SQLite file, so it
+survives restarts and is shared by every Streamlit session and server
+process on the machine. The least recently used rows are evicted once
+MAX_ENTRIES is exceeded. With a shared cache tier (see shared_cache),
+decisions are also published there for server processes on other machines.
+"""
+import json
+import os
+import re
+import sqlite3
+import time
+from contextlib import contextmanager
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+DB_PATH = os.path.join(CACHE_DIR, "routing_cache.sqlite3")
+MAX_ENTRIES = 5000
+# How long a decision stays in the shared cache tier
+SHARED_TTL = 30 * 24 * 60 * 60
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_TRAILING_PUNCTUATION_RE = re.compile(r"[\s?!.]+$")
+
+
+def normalize_question(question, router=None):
+    """
+    Normalize a question for use as a cache key.
+
+    Parameters:
+    question (str): The user's question.
+    router (IntentRouter): Optional router used to canonicalize the ticker.
+
+    Returns:
+    str: The normalized question (e.g., 'latest news for tsla').
+    """
+    if router is not None:
+        question = router.canonicalize(question)
+    question = _WHITESPACE_RE.sub(" ", question.casefold()).strip()
+    return _TRAILING_PUNCTUATION_RE.sub("", question)
+
+
+def parse_function_arguments(arguments):
+    """
+    Strictly parse the JSON arguments of an OpenAI function call.
+
+    Raises:
+    ValueError: If the arguments are not a JSON object.
+    """
+    args = json.loads(arguments)
+    if not isinstance(args, dict):
+        raise ValueError("Function call arguments must be a JSON object.")
+    return args
+
+
+def parse_function_calls(message):
+    """
+    Extract the (function_name, args) calls from an OpenAI chat completion message.
+
+    Handles both parallel 'tool_calls' and the older single 'function_call'.
+
+    Raises:
+    ValueError: If the arguments of a call are not a JSON object.
+    """
+    if message.get("tool_calls"):
+        functions = [tool_call["function"] for tool_call in message["tool_calls"]
+                     if tool_call.get("type", "function") == "function"]
+    elif message.get("function_call"):
+        functions = [message["function_call"]]
+    else:
+        functions = []
+    return [(function["name"], parse_function_arguments(function["arguments"])) for function in functions]
+
+
+def checked_calls(calls):
+    """
+    Return cached calls as a list of (function_name, args) tuples.
+
+    Raises:
+    ValueError: If calls is not a list of (function name, JSON object) pairs.
+    """
+    try:
+        calls = [(function_name, args) for function_name, args in calls]
+    except (TypeError, ValueError) as e:
+        raise ValueError("Cached calls must be (function name, arguments) pairs.") from e
+    if not all(isinstance(function_name, str) and isinstance(args, dict) for function_name, args in calls):
+        raise ValueError("Cached function call arguments must be JSON objects.")
+    return calls
+
+
+class RoutingCache:
+    """
+    SQLite-backed map from normalized question to a list of (function_name, args) calls.
+
+    Parameters:
+    path (str): Location of the SQLite file.
+    max_entries (int): Number of rows kept before the least recently used are evicted.
+    shared (shared_cache.SharedCache): Cache tier shared with other machines, if any.
+    """
+
+    def __init__(self, path=DB_PATH, max_entries=MAX_ENTRIES, shared=None):
+        self.path = path
+        self.max_entries = max_entries
+        self.shared = shared
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS route_calls ("
+                " question TEXT PRIMARY KEY,"
+                " calls TEXT NOT NULL,"
+                " last_used REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS route_calls_last_used ON route_calls (last_used)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key):
+        """Return the list of (function_name, args) calls for a normalized question, or None."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT calls FROM route_calls WHERE question = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return self._get_shared(key)
+            conn.execute("UPDATE route_calls SET last_used = ? WHERE question = ?", (time.time(), key))
+        try:
+            return checked_calls(json.loads(row[0]))
+        except ValueError:
+            self.delete(key)
+            return None
+
+    def _get_shared(self, key):
+        if self.shared is None:
+            return None
+        entry = self.shared.get(f"route|{key}")
+        if entry is None or entry.expires_at <= time.time():
+            return None
+        try:
+            # Written by another process, possibly an older version of the app
+            calls = checked_calls(entry.value)
+        except ValueError:
+            return None
+        # Kept locally from now on
+        self.set(key, calls, publish=False)
+        return calls
+
+    def set(self, key, calls, publish=True):
+        if publish and self.shared is not None:
+            self.shared.set(f"route|{key}", [tuple(call) for call in calls], 0, SHARED_TTL, 0)
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO route_calls (question, calls, last_used) VALUES (?, ?, ?)",
+                (key, json.dumps([list(call) for call in calls], sort_keys=True), time.time()),
+            )
+            conn.execute(
+                "DELETE FROM route_calls WHERE question IN ("
+                " SELECT question FROM route_calls ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def delete(self, key):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM route_calls WHERE question = ?", (key,))
+
+    def __len__(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM route_calls").fetchone()[0]
@@ -0,0 +1,348 @@
+"""
+Local full-text index over the fetched news and analyst reports.
+
+Every markets/news article and every analyst report fetched from
+RapidAPI is added to an SQLite FTS5 index (porter-stemmed, so 'margins'
+finds 'margin'), with the ticker, kind ('news' or 'analyst'), provider,
+report type and publish date as filter columns. Questions like 'what
+have analysts said about margins at AAPL this month' are then answered
+from the index in milliseconds, without another RapidAPI call.
+
+Indexing never slows down an answer. The fetchers only put the new
+records on a queue; one daemon thread turns them into documents and
+writes them in batches of up to BATCH_SIZE documents (one transaction
+each), waiting at most FLUSH_INTERVAL for a batch to fill. When the
+queue is full, records are dropped and counted rather than blocking the
+fetch. The index is an
+SQLite file in WAL mode, shared by every server process on the machine;
+documents are keyed by a hash of their content, so the same article
+fetched twice (or by two processes) is stored once. Documents published
+more than RETENTION_SECONDS ago are purged.
+"""
+import hashlib
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+import tracing
+from news_feed import item_key, published_at
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+DB_PATH = os.path.join(CACHE_DIR, "search_index.sqlite3")
+
+# Documents written per transaction
+BATCH_SIZE = 200
+# Longest a queued document waits for its batch to fill, in seconds
+FLUSH_INTERVAL = 0.5
+# Fetches whose documents may wait on the queue; beyond that they are dropped
+MAX_PENDING = 1000
+# Documents published longer ago than this are purged
+RETENTION_SECONDS = 365 * 24 * 60 * 60
+# The index is purged every this many batches
+PURGE_EVERY = 100
+DEFAULT_LIMIT = 20
+
+KINDS = ("news", "analyst")
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS documents ("
+    " id INTEGER PRIMARY KEY,"
+    " key TEXT NOT NULL UNIQUE,"
+    " kind TEXT NOT NULL,"
+    " ticker TEXT NOT NULL,"
+    " provider TEXT,"
+    " report_type TEXT,"
+    " published REAL,"
+    " title TEXT,"
+    " body TEXT,"
+    " url TEXT,"
+    " indexed_at REAL NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS documents_ticker_published ON documents (ticker, published)",
+    "CREATE INDEX IF NOT EXISTS documents_published ON documents (published)",
+    # External-content FTS table: the text is stored once, in documents
+    "CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5("
+    " title, body, content='documents', content_rowid='id', tokenize='porter unicode61')",
+    "CREATE TRIGGER IF NOT EXISTS documents_ai AFTER INSERT ON documents BEGIN"
+    " INSERT INTO documents_fts (rowid, title, body) VALUES (new.id, new.title, new.body); END",
+    "CREATE TRIGGER IF NOT EXISTS documents_ad AFTER DELETE ON documents BEGIN"
+    " INSERT INTO documents_fts (documents_fts, rowid, title, body) VALUES ('delete', old.id, old.title, old.body);"
+    " END",
+)
+
+_COLUMNS = ("key", "kind", "ticker", "provider", "report_type", "published", "title", "body", "url")
+_TERM_RE = re.compile(r"[^\W_]+")
+# Title matches count twice as much as body matches
+_RANK = "bm25(documents_fts, 2.0, 1.0)"
+
+
+def _hash(*parts):
+    text = "\n".join("" if part is None else str(part) for part in parts)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+def news_documents(ticker, items):
+    """NewsItem records -> document tuples (in _COLUMNS order)."""
+    ticker = ticker.upper()
+    return [
+        (f"news|{ticker}|{item_key(item)}", "news", ticker, None, None, published_at(item),
+         item.title, item.description, None)
+        for item in items
+    ]
+
+
+def analyst_documents(ticker, reports):
+    """AnalystReport records -> document tuples (in _COLUMNS order)."""
+    ticker = ticker.upper()
+    return [
+        (f"analyst|{ticker}|{_hash(report.report_title, report.pdf_url, report.report_date)}", "analyst", ticker,
+         report.provider, report.report_type, report.report_date / 1000 if report.report_date else None,
+         report.report_title, report.abstract, report.pdf_url)
+        for report in reports
+    ]
+
+
+_DOCUMENT_BUILDERS = {"news": news_documents, "analyst": analyst_documents}
+
+
+def match_query(text):
+    """
+    Turn free text into an FTS5 query: every word quoted (so FTS5 syntax
+    in the text is taken literally) and OR-ed, for bm25 to rank.
+    Returns None when the text has no words.
+    """
+    terms = list(dict.fromkeys(term.lower() for term in _TERM_RE.findall(text or "")))
+    return " OR ".join(f'"{term}"' for term in terms) or None
+
+
+class SearchHit:
+    """One search result; snippet is the best matching fragment, with the matches in bold."""
+
+    __slots__ = ("kind", "ticker", "provider", "report_type", "published", "title", "snippet", "url", "score")
+
+    def __init__(self, kind, ticker, provider, report_type, published, title, snippet, url, score):
+        self.kind = kind
+        self.ticker = ticker
+        self.provider = provider
+        self.report_type = report_type
+        self.published = published
+        self.title = title
+        self.snippet = snippet
+        self.url = url
+        self.score = score
+
+    def to_dict(self):
+        published = time.strftime("%Y-%m-%d %H:%M", time.gmtime(self.published)) if self.published else None
+        return {
+            "published": published, "ticker": self.ticker, "kind": self.kind, "provider": self.provider,
+            "title": self.title, "snippet": self.snippet, "url": self.url,
+        }
+
+    def __repr__(self):
+        return f"SearchHit({self.kind!r}, {self.ticker!r}, {self.title!r}, score={self.score:.2f})"
+
+
+class SearchIndex:
+    """
+    FTS5 index of news and analyst documents with a batching background writer.
+
+    Parameters:
+    path (str): Location of the SQLite file.
+    batch_size (int): Documents written per transaction.
+    flush_interval (float): Longest a queued document waits for its batch to fill, in seconds.
+    max_pending (int): Queued add() calls beyond which new ones are dropped.
+    """
+
+    def __init__(self, path=DB_PATH, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL, max_pending=MAX_PENDING):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.written = 0
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._batches = 0
+        self._thread = None
+        self._ready = False
+        self._lock = threading.Lock()
+        self._schema_lock = threading.Lock()
+
+    def _ensure_schema(self):
+        # Done by the first search or write, so creating the index costs a fetch nothing
+        with self._schema_lock:
+            if self._ready:
+                return
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with self._connect() as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                for statement in SCHEMA:
+                    conn.execute(statement)
+            self._ready = True
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def add(self, kind, ticker, records):
+        """
+        Queue a ticker's records ('news' NewsItems or 'analyst' AnalystReports)
+        for the writer thread. Never blocks; drops them when the queue is full.
+        """
+        if not records:
+            return
+        try:
+            self._queue.put_nowait((kind, ticker, records))
+        except queue.Full:
+            self.dropped += len(records)
+            tracing.count("search_index_dropped_total", len(records), kind=kind)
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="search-index-writer", daemon=True)
+                self._thread.start()
+
+    def add_news(self, ticker, items):
+        self.add("news", ticker, items)
+
+    def add_analyst_reports(self, ticker, reports):
+        self.add("analyst", ticker, reports)
+
+    def flush(self):
+        """Block until every queued document has been written."""
+        self._queue.join()
+
+    def search(self, query, symbols=None, kind=None, since=None, limit=DEFAULT_LIMIT):
+        """
+        Return the documents matching query, best first.
+
+        Parameters:
+        query (str): Free text; when it has no words, the newest documents matching the filters are returned.
+        symbols (list): Only documents of these tickers (all tickers when empty).
+        kind (str): 'news' or 'analyst' to search only one kind.
+        since (float): Only documents published at or after this epoch time.
+
+        Returns:
+        list: SearchHit objects.
+        """
+        match = match_query(query)
+        where, params = [], []
+        if symbols:
+            where.append(f"d.ticker IN ({', '.join('?' * len(symbols))})")
+            params.extend(symbol.upper() for symbol in symbols)
+        if kind:
+            where.append("d.kind = ?")
+            params.append(kind)
+        if since is not None:
+            where.append("d.published >= ?")
+            params.append(since)
+        if match:
+            sql = (
+                f"SELECT d.kind, d.ticker, d.provider, d.report_type, d.published, d.title,"
+                f" snippet(documents_fts, -1, '**', '**', '…', 16), d.url, {_RANK}"
+                f" FROM documents_fts JOIN documents d ON d.id = documents_fts.rowid"
+                f" WHERE documents_fts MATCH ?{''.join(' AND ' + clause for clause in where)}"
+                f" ORDER BY {_RANK}, d.published DESC LIMIT ?"
+            )
+            params = [match] + params
+        else:
+            sql = (
+                "SELECT d.kind, d.ticker, d.provider, d.report_type, d.published, d.title, d.body, d.url, 0"
+                f" FROM documents d{' WHERE ' + ' AND '.join(where) if where else ''}"
+                " ORDER BY d.published DESC LIMIT ?"
+            )
+        self._ensure_schema()
+        with tracing.span("search_index", terms=match.count(" OR ") + 1 if match else 0):
+            with self._connect() as conn:
+                rows = conn.execute(sql, params + [limit]).fetchall()
+            tracing.annotate(hits=len(rows))
+        return [SearchHit(*row) for row in rows]
+
+    def stats(self):
+        self._ensure_schema()
+        with self._connect() as conn:
+            counts = dict(conn.execute("SELECT kind, COUNT(*) FROM documents GROUP BY kind").fetchall())
+        return {"documents": counts, "pending": self._queue.qsize(), "written": self.written, "dropped": self.dropped}
+
+    def _run(self):
+        self._ensure_schema()
+        conn = sqlite3.connect(self.path, timeout=5)
+        while True:
+            batch = [self._queue.get()]
+            size = len(batch[0][2])
+            deadline = time.monotonic() + self.flush_interval
+            while size < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    entry = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                batch.append(entry)
+                size += len(entry[2])
+            try:
+                self._write(conn, [document for kind, ticker, records in batch
+                                   for document in _DOCUMENT_BUILDERS[kind](ticker, records)])
+            except sqlite3.Error as e:
+                # Keep the writer alive; the documents are indexed again when next fetched
+                tracing.count("search_index_errors_total", error=type(e).__name__)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write(self, conn, documents):
+        now = time.time()
+        with tracing.span("search_index_write", documents=len(documents)), conn:
+            cursor = conn.executemany(
+                f"INSERT OR IGNORE INTO documents ({', '.join(_COLUMNS)}, indexed_at)"
+                f" VALUES ({', '.join('?' * len(_COLUMNS))}, ?)",
+                [document + (now,) for document in documents],
+            )
+            # Ignored duplicates are not counted
+            written = cursor.rowcount
+            self._batches += 1
+            if self._batches % PURGE_EVERY == 0:
+                conn.execute("DELETE FROM documents WHERE COALESCE(published, indexed_at) < ?",
+                             (now - RETENTION_SECONDS,))
+        self.written += written
+        tracing.count("search_index_documents_total", written)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """Return the process-wide search index, creating it on first use."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = SearchIndex()
+        return _index
+
+
+def search(query, symbols=None, kind=None, since=None, days=None, limit=DEFAULT_LIMIT):
+    """
+    Search the fetched news and analyst reports.
+
+    Parameters:
+    since (float): Only documents published at or after this epoch time.
+    days (float): Only documents published in the last days days, when since is not given.
+
+    Returns:
+    list: SearchHit objects, best first.
+    """
+    if kind not in KINDS:
+        kind = None
+    if since is None and days:
+        since = time.time() - float(days) * 24 * 60 * 60
+    return get_index().search(query, symbols, kind, since, limit)
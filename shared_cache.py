@@ -0,0 +1,409 @@
+"""
+Cache tier shared by every Streamlit server process.
+
+Each server process has its own ResponseCache. When several processes
+run behind a load balancer, a SharedCache stops each of them from
+fetching the same quote, chart or profile from RapidAPI again. Every
+process checks the SharedCache before going upstream and publishes what
+it fetches, and a lock in the shared store lets only one process fetch
+a key at a time. The others wait for its result (single-flight across
+processes).
+
+The store is chosen by the TIKERTALK_SHARED_CACHE environment variable:
+
+    sqlite:///path/to/cache.sqlite3   one SQLite file in WAL mode, for the
+                                      processes of one machine (no service needed)
+    redis://host:6379/0               a Redis-compatible server, for several
+                                      machines (needs the optional redis package)
+
+Unset, there is no shared tier and every process caches on its own.
+Values are stored in formats that decoding cannot run code from:
+ChartSeries as a JSON header followed by the raw bytes of its arrays,
+everything else (decoded JSON, routing decisions, response_models
+records) as JSON, with tuples and records tagged so they come back as
+they went in. Only the record types in RECORD_TYPES are rebuilt. Values
+are zlib-compressed above COMPRESS_THRESHOLD bytes.
+"""
+import json
+import os
+import sqlite3
+import struct
+import sys
+import threading
+import time
+import uuid
+import zlib
+
+import numpy as np
+
+import response_models
+import tracing
+
+try:
+    import orjson
+except ImportError:  # optional; json.dumps is used instead
+    orjson = None
+
+SHARED_CACHE_URL = os.environ.get("TIKERTALK_SHARED_CACHE")
+# Bumped whenever the cached value types change, so old entries are ignored
+SCHEMA_VERSION = 3
+
+# Values larger than this are compressed
+COMPRESS_THRESHOLD = 1024
+# How long a process may hold a fetch lock before others take over, in seconds
+FLIGHT_LEASE = 30.0
+# How often a waiting process checks for the leader's result, in seconds
+FLIGHT_POLL_INTERVAL = 0.05
+# Longest a process waits for another's fetch before fetching itself, in seconds
+FLIGHT_MAX_WAIT = 20.0
+# Approximate size budget of the SQLite store; the oldest entries are evicted beyond it
+MAX_SQLITE_BYTES = 256 * 1024 * 1024
+# The SQLite store is purged of dead entries every this many writes
+PURGE_EVERY = 200
+
+_PLAIN = b"\x00"
+_COMPRESSED = b"\x01"
+_JSON = b"J"
+_SERIES = b"S"
+_HEADER_LENGTH = struct.Struct("<I")
+# Keys marking tagged values in the JSON; decoded API responses never use them
+_TUPLE = "$tuple"
+_RECORD = "$record"
+
+# The records that may be rebuilt from the store, by name
+RECORD_TYPES = {
+    record_type.__name__: record_type
+    for record_type in (
+        response_models.Quote,
+        response_models.NewsItem,
+        response_models.Officer,
+        response_models.Profile,
+        response_models.AnalystReport,
+    )
+}
+
+
+def _tag(value):
+    """Turn tuples and records into tagged JSON objects, recursively."""
+    if isinstance(value, response_models.Record):
+        if RECORD_TYPES.get(type(value).__name__) is not type(value):
+            raise TypeError(f"Cannot store {type(value).__name__} in the shared cache")
+        return {_RECORD: type(value).__name__, "values": [_tag(getattr(value, name)) for name, _, _ in value.FIELDS]}
+    if isinstance(value, tuple):
+        return {_TUPLE: [_tag(item) for item in value]}
+    if isinstance(value, list):
+        return [_tag(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _tag(item) for key, item in value.items()}
+    return value
+
+
+def _untag(value):
+    if isinstance(value, list):
+        return [_untag(item) for item in value]
+    if isinstance(value, dict):
+        if _TUPLE in value:
+            return tuple(_untag(item) for item in value[_TUPLE])
+        if _RECORD in value:
+            # KeyError for any other name, so nothing but a known record is built
+            return RECORD_TYPES[value[_RECORD]](*(_untag(item) for item in value["values"]))
+        return {key: _untag(item) for key, item in value.items()}
+    return value
+
+
+def _dumps_json(value):
+    value = _tag(value)
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, separators=(",", ":")).encode("utf-8")
+
+
+def _dumps_series(series):
+    from chart_series import OHLCV_FIELDS
+    columns = [series.timestamps] + [getattr(series, name) for name in OHLCV_FIELDS]
+    header = json.dumps({
+        "symbol": series.symbol,
+        "length": len(series),
+        "dtypes": [column.dtype.str for column in columns],
+    }).encode("utf-8")
+    return b"".join(
+        [_HEADER_LENGTH.pack(len(header)), header] + [np.ascontiguousarray(column).tobytes() for column in columns]
+    )
+
+
+def _loads_series(payload):
+    from chart_series import ChartSeries
+    (header_length,) = _HEADER_LENGTH.unpack_from(payload)
+    offset = _HEADER_LENGTH.size + header_length
+    header = json.loads(bytes(payload[_HEADER_LENGTH.size:offset]))
+    length = header["length"]
+    columns = []
+    for dtype in map(np.dtype, header["dtypes"]):
+        # Plain numbers only; frombuffer never builds objects, this just rejects odd headers early
+        if dtype.kind not in "biuf":
+            raise ValueError(f"Unexpected chart column type {dtype}")
+        columns.append(np.frombuffer(payload, dtype=dtype, count=length, offset=offset))
+        offset += dtype.itemsize * length
+    return ChartSeries(header["symbol"], *columns)
+
+
+def dumps(value):
+    """Serialize a cache value to compact bytes."""
+    # chart_series is imported on first use; until then no value can be a ChartSeries
+    chart_series = sys.modules.get("chart_series")
+    if chart_series is not None and isinstance(value, chart_series.ChartSeries):
+        blob = _SERIES + _dumps_series(value)
+    else:
+        blob = _JSON + _dumps_json(value)
+    if len(blob) > COMPRESS_THRESHOLD:
+        return _COMPRESSED + zlib.compress(blob, 1)
+    return _PLAIN + blob
+
+
+def loads(blob):
+    blob = bytes(blob)
+    if blob[:1] == _COMPRESSED:
+        blob = zlib.decompress(blob[1:])
+    else:
+        blob = blob[1:]
+    if blob[:1] == _SERIES:
+        # A bytearray, so the arrays viewing it are writable like freshly parsed ones
+        return _loads_series(bytearray(blob[1:]))
+    if blob[:1] == _JSON:
+        return _untag(response_models.loads(blob[1:]))
+    raise ValueError("Unknown shared cache value format")
+
+
+def encode_key(key):
+    """Turn a ResponseCache key tuple into the store's string key."""
+    return f"v{SCHEMA_VERSION}|" + "|".join("" if part is None else str(part) for part in key)
+
+
+class SharedEntry:
+    __slots__ = ("value", "size", "expires_at", "stale_until")
+
+    def __init__(self, value, size, expires_at, stale_until):
+        self.value = value
+        self.size = size
+        self.expires_at = expires_at
+        self.stale_until = stale_until
+
+
+class SQLiteBackend:
+    """
+    Shared store in one SQLite file (WAL mode), for processes on the same machine.
+    Expiry times are wall-clock epoch seconds, since they are compared across processes.
+    """
+
+    def __init__(self, path, max_bytes=MAX_SQLITE_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._writes = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY,"
+                " value BLOB NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " expires_at REAL NOT NULL,"
+                " stale_until REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_stale_until ON entries (stale_until)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS flights ("
+                " key TEXT PRIMARY KEY,"
+                " owner TEXT NOT NULL,"
+                " lease_until REAL NOT NULL)"
+            )
+
+    def _connection(self):
+        # One connection per thread; SQLite connections must not be shared between threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._connection().execute(
+            "SELECT value, size, expires_at, stale_until FROM entries WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or row[3] <= time.time():
+            return None
+        return row
+
+    def set(self, key, blob, size, expires_at, stale_until):
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, expires_at, stale_until) VALUES (?, ?, ?, ?, ?)",
+                (key, sqlite3.Binary(blob), size, expires_at, stale_until),
+            )
+        self._writes += 1
+        if self._writes % PURGE_EVERY == 0:
+            self.purge()
+
+    def acquire(self, key, owner, lease):
+        now = time.time()
+        conn = self._connection()
+        with conn:
+            conn.execute("DELETE FROM flights WHERE key = ? AND lease_until <= ?", (key, now))
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO flights (key, owner, lease_until) VALUES (?, ?, ?)", (key, owner, now + lease)
+            )
+            return cursor.rowcount == 1
+
+    def release(self, key, owner):
+        conn = self._connection()
+        with conn:
+            conn.execute("DELETE FROM flights WHERE key = ? AND owner = ?", (key, owner))
+
+    def purge(self):
+        """Drop dead entries, then the oldest ones while the store is over its size budget."""
+        now = time.time()
+        conn = self._connection()
+        with conn:
+            conn.execute("DELETE FROM entries WHERE stale_until <= ?", (now,))
+            conn.execute("DELETE FROM flights WHERE lease_until <= ?", (now,))
+            total = conn.execute("SELECT COALESCE(SUM(LENGTH(value)), 0) FROM entries").fetchone()[0]
+            if total > self.max_bytes:
+                conn.execute(
+                    "DELETE FROM entries WHERE key IN ("
+                    " SELECT key FROM entries ORDER BY expires_at LIMIT"
+                    " (SELECT COUNT(*) / 4 + 1 FROM entries))"
+                )
+
+    def clear(self):
+        conn = self._connection()
+        with conn:
+            conn.execute("DELETE FROM entries")
+            conn.execute("DELETE FROM flights")
+
+
+class RedisBackend:
+    """Shared store on a Redis-compatible server, for processes on several machines."""
+
+    PREFIX = "tikertalk:cache:"
+    FLIGHT_PREFIX = "tikertalk:flight:"
+    _HEADER = struct.Struct("<Qdd")
+    # Deletes a fetch lock only if this process still owns it
+    _RELEASE_SCRIPT = (
+        "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) else return 0 end"
+    )
+
+    def __init__(self, url):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("A redis:// shared cache needs the 'redis' package (pip install redis).") from e
+        self.client = redis.Redis.from_url(url)
+        self._release = self.client.register_script(self._RELEASE_SCRIPT)
+
+    def get(self, key):
+        blob = self.client.get(self.PREFIX + key)
+        if blob is None:
+            return None
+        size, expires_at, stale_until = self._HEADER.unpack_from(blob)
+        return blob[self._HEADER.size:], size, expires_at, stale_until
+
+    def set(self, key, blob, size, expires_at, stale_until):
+        # Redis drops the entry itself once it is too old to serve even as stale data
+        keep_ms = max(1, int((stale_until - time.time()) * 1000))
+        self.client.set(self.PREFIX + key, self._HEADER.pack(size, expires_at, stale_until) + blob, px=keep_ms)
+
+    def acquire(self, key, owner, lease):
+        return bool(self.client.set(self.FLIGHT_PREFIX + key, owner, nx=True, px=int(lease * 1000)))
+
+    def release(self, key, owner):
+        self._release(keys=[self.FLIGHT_PREFIX + key], args=[owner])
+
+    def purge(self):
+        pass
+
+    def clear(self):
+        for prefix in (self.PREFIX, self.FLIGHT_PREFIX):
+            for name in self.client.scan_iter(match=prefix + "*"):
+                self.client.delete(name)
+
+
+class SharedCache:
+    """
+    Serializing front end of a backend. A failing backend never fails a
+    request: errors are counted and treated as a miss.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+    def get(self, key):
+        """Return the SharedEntry for key (possibly expired but still within its stale window), or None."""
+        try:
+            row = self.backend.get(key)
+            if row is None:
+                return None
+            blob, size, expires_at, stale_until = row
+            return SharedEntry(loads(blob), size, expires_at, stale_until)
+        except Exception as e:
+            _record_error("get", e)
+            return None
+
+    def set(self, key, value, size, ttl, max_stale):
+        try:
+            now = time.time()
+            self.backend.set(key, dumps(value), size, now + ttl, now + ttl + max_stale)
+        except Exception as e:
+            _record_error("set", e)
+
+    def acquire(self, key, lease=FLIGHT_LEASE):
+        """Try to become the one process fetching key. True when this process should fetch it."""
+        try:
+            return self.backend.acquire(key, f"{self.owner}-{threading.get_ident()}", lease)
+        except Exception as e:
+            # Without the lock, fetching ourselves is the safe choice
+            _record_error("acquire", e)
+            return True
+
+    def release(self, key):
+        try:
+            self.backend.release(key, f"{self.owner}-{threading.get_ident()}")
+        except Exception as e:
+            _record_error("release", e)
+
+    def clear(self):
+        self.backend.clear()
+
+
+def _record_error(operation, error):
+    tracing.count("shared_cache_errors_total", operation=operation, error=type(error).__name__)
+
+
+def from_url(url):
+    """Create the SharedCache described by a sqlite:/// or redis:// URL (a bare path means SQLite)."""
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return SharedCache(RedisBackend(url))
+    if url.startswith("sqlite:///"):
+        url = url[len("sqlite:///"):]
+    return SharedCache(SQLiteBackend(url))
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_cache():
+    """Return the process-wide SharedCache configured by TIKERTALK_SHARED_CACHE, or None when unset."""
+    global _shared
+    if not SHARED_CACHE_URL:
+        return None
+    with _shared_lock:
+        if _shared is None:
+            _shared = from_url(SHARED_CACHE_URL)
+        return _shared
@@ -0,0 +1,245 @@
+"""
+Local stand-in for the RapidAPI and OpenAI endpoints.
+
+StandinServer replays the recorded responses in benchmark_fixtures/ over
+HTTP on 127.0.0.1, so the fetchers, the router and the chart pipeline can
+be exercised without API keys or network access. Each endpoint can be
+given a latency (with jitter) and an error rate; failed requests answer
+with a retryable status and 'Retry-After: 0', like a throttled upstream.
+With a quota, the RapidAPI endpoints send RapidAPI's
+'X-RateLimit-Requests-*' headers and answer 429 once it is used up.
+
+Responses are adapted to the request where the app depends on it:
+markets/quote answers every requested ticker, and get-chart is shifted
+to end now, or replaced by a synthetic series of chart_bars bars to test
+large payloads.
+"""
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_fixtures")
+
+# Request path -> fixture file (without .json)
+ENDPOINT_FIXTURES = {
+    "/api/v1/markets/quote": "quote",
+    "/api/v1/markets/news": "news",
+    "/api/v1/markets/stock/modules": "modules",
+    "/api/stock/get-chart": "get-chart",
+    "/api/stock/get-what-analysts-are-saying": "analysts",
+    "/v1/chat/completions": "chat_completion",
+}
+
+# Bar spacing of synthetic charts per get-chart interval, in seconds
+INTERVAL_SECONDS = {
+    "1m": 60, "5m": 300, "15m": 900, "30m": 1800, "1h": 3600,
+    "1d": 86400, "1wk": 7 * 86400, "1mo": 30 * 86400,
+}
+
+
+class EndpointBehaviour:
+    """Latency and failure settings of one endpoint."""
+
+    __slots__ = ("latency", "jitter", "error_rate", "error_status")
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, error_status=503):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+
+
+def synthetic_chart(symbol, bars, interval, end=None, seed=0):
+    """
+    Build a get-chart response with bars random-walk OHLCV bars ending at end.
+    """
+    rng = np.random.default_rng(seed)
+    step = INTERVAL_SECONDS.get(interval, 86400)
+    end = int(end or time.time()) // step * step
+    timestamps = end - step * np.arange(bars - 1, -1, -1, dtype=np.int64)
+    close = 100.0 * np.exp(np.cumsum(rng.normal(0, 0.01, bars)))
+    spread = np.abs(rng.normal(0, 0.004, bars)) * close
+    quote = {
+        "open": np.round(close - spread / 2, 4).tolist(),
+        "high": np.round(close + spread, 4).tolist(),
+        "low": np.round(close - spread, 4).tolist(),
+        "close": np.round(close, 4).tolist(),
+        "volume": rng.integers(10_000, 5_000_000, bars).tolist(),
+    }
+    return {"chart": {"result": [{
+        "meta": {"symbol": symbol, "dataGranularity": interval},
+        "timestamp": timestamps.tolist(),
+        "indicators": {"quote": [quote]},
+    }], "error": None}}
+
+
+class StandinServer:
+    """
+    Threaded HTTP server replaying the fixtures.
+
+    Parameters:
+    fixtures_dir (str): Directory with one <fixture>.json per endpoint.
+    latency, jitter (float): Default response delay and its +/- spread, in seconds.
+    error_rate (float): Default share of requests answered with error_status.
+    chart_bars (int): When set, get-chart answers with that many synthetic bars.
+    quota (int): When set, RapidAPI requests allowed per quota_period seconds.
+    seed (int): Seed for the latency and error draws.
+
+    Use as a context manager; the url attribute is the base URL to send requests to.
+    """
+
+    def __init__(self, fixtures_dir=FIXTURES_DIR, latency=0.0, jitter=0.0, error_rate=0.0,
+                 error_status=503, chart_bars=None, quota=None, quota_period=3600, seed=None):
+        self.fixtures = {}
+        for path, name in ENDPOINT_FIXTURES.items():
+            with open(os.path.join(fixtures_dir, f"{name}.json"), encoding="utf-8") as f:
+                self.fixtures[path] = json.load(f)
+        self.default = EndpointBehaviour(latency, jitter, error_rate, error_status)
+        self.behaviours = {}
+        self.chart_bars = chart_bars
+        self.quota = quota
+        self.quota_period = quota_period
+        self.quota_used = 0
+        self._quota_started = time.monotonic()
+        self.requests = {}
+        self.errors = {}
+        self._random = random.Random(seed)
+        self._charts = {}
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+        self.url = None
+
+    def configure(self, path, **settings):
+        """Override the latency/jitter/error_rate/error_status of one endpoint path."""
+        base = self.behaviours.get(path, self.default)
+        values = {name: getattr(base, name) for name in EndpointBehaviour.__slots__}
+        values.update(settings)
+        self.behaviours[path] = EndpointBehaviour(**values)
+
+    def start(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                self._answer()
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                self.rfile.read(length)
+                self._answer()
+
+            def _answer(self):
+                parts = urlsplit(self.path)
+                query = {name: values[-1] for name, values in parse_qs(parts.query).items()}
+                status, headers, body = server.respond(parts.path, query)
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="standin-server", daemon=True)
+        self._thread.start()
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}"
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def respond(self, path, query):
+        """Return (status, headers, body bytes) for a request."""
+        behaviour = self.behaviours.get(path, self.default)
+        with self._lock:
+            self.requests[path] = self.requests.get(path, 0) + 1
+            delay = max(0.0, behaviour.latency + self._random.uniform(-behaviour.jitter, behaviour.jitter))
+            failed = self._random.random() < behaviour.error_rate
+            if failed:
+                self.errors[path] = self.errors.get(path, 0) + 1
+        if delay:
+            time.sleep(delay)
+
+        if path not in self.fixtures:
+            return 404, {"Content-Type": "application/json"}, b'{"message": "Endpoint not found"}'
+        quota_headers = {}
+        if self.quota is not None and path != "/v1/chat/completions":
+            quota_headers = self._spend_quota()
+            if quota_headers["X-RateLimit-Requests-Remaining"] == "0" and self.quota_used > self.quota:
+                headers = dict(quota_headers, **{"Content-Type": "application/json",
+                                                 "Retry-After": quota_headers["X-RateLimit-Requests-Reset"]})
+                return 429, headers, b'{"message": "You have exceeded the rate limit per hour for your plan"}'
+        if failed:
+            headers = {"Content-Type": "application/json", "Retry-After": "0"}
+            return behaviour.error_status, headers, b'{"message": "Stand-in error"}'
+
+        if path == "/api/stock/get-chart":
+            body = self._chart(query)
+        else:
+            payload = self.fixtures[path]
+            if path == "/api/v1/markets/quote":
+                payload = self._quotes(payload, query.get("ticker", ""))
+            body = json.dumps(payload).encode()
+        return 200, dict(quota_headers, **{"Content-Type": "application/json"}), body
+
+    def _spend_quota(self):
+        with self._lock:
+            now = time.monotonic()
+            if now - self._quota_started >= self.quota_period:
+                self._quota_started, self.quota_used = now, 0
+            self.quota_used += 1
+            return {
+                "X-RateLimit-Requests-Limit": str(self.quota),
+                "X-RateLimit-Requests-Remaining": str(max(0, self.quota - self.quota_used)),
+                "X-RateLimit-Requests-Reset": str(int(self._quota_started + self.quota_period - now)),
+            }
+
+    @staticmethod
+    def _quotes(payload, tickers):
+        template = payload["body"][0]
+        return dict(payload, body=[dict(template, symbol=ticker) for ticker in tickers.split(",") if ticker])
+
+    def _chart(self, query):
+        symbol = query.get("symbol", "")
+        interval = query.get("interval", "1d")
+        if self.chart_bars:
+            # Generated once per symbol, size and interval; the payload, not the generator, is being measured
+            key = (symbol, self.chart_bars, interval)
+            with self._lock:
+                cached = self._charts.get(key)
+            if cached is None:
+                cached = json.dumps(synthetic_chart(symbol, self.chart_bars, interval)).encode()
+                with self._lock:
+                    self._charts[key] = cached
+            return cached
+
+        fixture = self.fixtures["/api/stock/get-chart"]
+        result = dict(fixture["chart"]["result"][0])
+        # Shift the recorded bars so they end now, as a live response would
+        timestamps = result["timestamp"]
+        shift = int(time.time()) - timestamps[-1]
+        result["timestamp"] = [timestamp + shift for timestamp in timestamps]
+        result["meta"] = dict(result["meta"], symbol=symbol)
+        return json.dumps({"chart": {"result": [result], "error": None}}).encode()
@@ -0,0 +1,249 @@
+"""
+RapidAPI fetchers for quotes, news, company profiles and analyst reports.
+
+These functions do no Streamlit rendering and import nothing heavy, so
+the app script can import them without slowing down its reruns. They
+return the compact records of response_models (or NumPy-backed chart
+series), which are also what the response cache keeps.
+"""
+import requests
+
+import response_cache
+import response_models
+import search_index
+import tracing
+from rapidapi_client import YAHOO_FINANCE15_HOST, YAHOO_FINANCE166_HOST
+
+# Fetch real-time stock data using Yahoo Finance API
+def fetch_realtime_stock_data(ticker):
+    #path stores the endpoint from where we get the data requested
+    path = "/api/v1/markets/quote"
+
+    #these are params. The type parameter indicates that the request is for stock market data.
+    querystring = {"ticker":ticker,"type":"STOCKS"}
+
+    #the shared client adds the auth headers and reuses the connection to the host.
+    try:
+      # Served from the shared response cache when still fresh, parsed into Quote records
+      quotes = response_cache.fetch_json(YAHOO_FINANCE15_HOST, path, params=querystring,
+                                         parse=response_models.parse_quotes)
+      if quotes:
+          return quotes  # Return the quotes
+      else:
+          return {"error": "No data found for the provided ticker."}
+    except requests.exceptions.RequestException as e:
+        return {"error": str(e)}
+
+def get_analyst(symbol, region="US"):
+    """
+    Fetch analyst reports for a given stock ticker symbol.
+
+    Parameters:
+    symbol (str): Stock ticker symbol (e.g., 'AAPL', 'MSFT').
+    region (str): The region for the stock (default is 'US').
+
+    Returns:
+    tuple: AnalystReport records (title, author, pdf_url, report_type, abstract, provider, report_date).
+    """
+    path = "/api/stock/get-what-analysts-are-saying"
+    querystring = {"region": region, "symbol": symbol}
+
+    def parse(data):
+        reports = response_models.parse_analyst_reports(data)
+        if reports:
+            # Queued for the search index's writer thread; adds no latency here
+            search_index.get_index().add_analyst_reports(symbol, reports)
+        return reports
+
+    try:
+        # Make the API request
+        # Served from the shared response cache when still fresh; only the
+        # report fields we show are kept (see response_models.AnalystReport)
+        analyst_reports = response_cache.fetch_json(YAHOO_FINANCE166_HOST, path, params=querystring,
+                                                    parse=parse)
+
+        if analyst_reports is not None:
+            return analyst_reports  # Return the analyst reports
+        else:
+            return {"error": "No analyst reports found for the provided symbol."}
+    except requests.exceptions.RequestException as e:
+        return {"error": str(e)}
+
+
+# Fetch real-time stock news
+def fetch_realtime_news(ticker):
+    """
+    Fetch real-time stock data news for a given ticker symbol.
+
+    Parameters:
+    ticker (str): Stock ticker symbol (e.g., 'AAPL', 'MSFT').
+
+    Returns:
+    tuple: NewsItem records with the 'description', 'title', and 'pubDate' of each article.
+    """
+    path = "/api/v1/markets/news"
+    querystring = {"ticker": ticker, "type": "ALL"}
+
+    def parse(data):
+        items = response_models.parse_news(data)
+        if items:
+            # Queued for the search index's writer thread; adds no latency here
+            search_index.get_index().add_news(ticker, items)
+        return items
+
+    try:
+        # Make the API request
+        # Served from the shared response cache when still fresh; only
+        # description, title and pubDate are kept (see response_models.NewsItem)
+        news_items = response_cache.fetch_json(YAHOO_FINANCE15_HOST, path, params=querystring,
+                                               parse=parse)
+
+        if news_items is not None:  # Check if the response had a body
+            return news_items  # Return the news items
+        else:
+            return {"error": "No news data found for the provided ticker."}
+    except requests.exceptions.RequestException as e:
+        return {"error": str(e)}
+
+# Fetch only the news a caller has not seen yet
+def fetch_news_updates(ticker, cursor=None):
+    """
+    Fetch a ticker's news through the process-wide news feed, which drops
+    the articles already returned to the caller and syndicated copies.
+
+    Parameters:
+    ticker (str): Stock ticker symbol (e.g., 'TSLA').
+    cursor (int): The cursor returned by the caller's previous update, or None for all articles.
+
+    Returns:
+    tuple: (FeedEntry list, newest first, cursor), or a dict with an 'error' key.
+    """
+    from news_feed import get_feed
+    with tracing.span("news_feed", cursor=cursor):
+        update = get_feed().update(ticker, fetch_realtime_news, cursor)
+        if not isinstance(update, dict):
+            tracing.annotate(new=len(update[0]))
+        return update
+
+#3rd api fetch the profile
+def fetch_stock_profile(ticker, module):
+    """
+    Fetches stock data from the Yahoo Finance API for the given ticker and module.
+
+    Args:
+        ticker (str): The stock ticker symbol (e.g., "AAPL" for Apple).
+        module (str): The financial data module to retrieve (e.g., "asset-profile").
+
+    Returns:
+        Profile: The asset profile record for module "asset-profile"; the
+        response body as a dict for other modules; None when the response
+        has no body, or a dict with an 'error' key when the request fails.
+    """
+    path = "/api/v1/markets/stock/modules"
+    
+    querystring = {"ticker": ticker, "module": module}
+
+    try:
+        # Served from the shared response cache when still fresh
+        if module == "asset-profile":
+            return response_cache.fetch_json(YAHOO_FINANCE15_HOST, path, params=querystring,
+                                             parse=response_models.parse_profile)
+        data = response_cache.fetch_json(YAHOO_FINANCE15_HOST, path, params=querystring)
+        if isinstance(data, dict) and 'body' in data:
+            return data['body']
+        return None
+    except requests.exceptions.RequestException as e:
+        return {"error": str(e)}
+
+
+# Fetch stock chart data as NumPy OHLCV arrays
+def fetch_chart_series(stock_name, region, range, interval):
+    """
+    Fetches the chart bars for a given symbol, through the local bar store.
+
+    Parameters:
+    stock_name (str): Stock symbol (e.g., 'AAPL').
+    region (str): Region code (e.g., 'US').
+    range (str): Range of data (e.g., '1d' for one day).
+    interval (str): Interval between data points (e.g., '5m' for 5 minutes).
+
+    Returns:
+    ChartSeries: The bars with a close price, or a dict with an 'error' key.
+    """
+    # numpy is only needed once somebody asks for a chart
+    from bar_store import get_store
+    from chart_series import parse_chart
+
+    path = "/api/stock/get-chart"
+
+    def parse(data):
+        with tracing.span("parse_chart"):
+            return parse_chart(data, stock_name)
+
+    def fetch(fetch_range):
+        querystring = {"region": region, "range": fetch_range, "symbol": stock_name, "interval": interval}
+        # Served from the shared response cache when still fresh; the cache keeps the arrays, not the JSON
+        return response_cache.fetch_json(YAHOO_FINANCE166_HOST, path, params=querystring, parse=parse)
+
+    try:
+        # Only the bars missing from the local store are downloaded
+        with tracing.span("bar_store", range=range, interval=interval):
+            series = get_store().get_series(stock_name, region, range, interval, fetch)
+    except requests.exceptions.RequestException as e:
+        return {"error": f"Error: {e}"}
+
+    if series is None or not len(series):
+        return {"error": "Chart data is not available."}
+    return series
+
+# Fetch stock chart data together with technical indicators
+def fetch_indicator_chart(stock_name, region, range, interval, indicators):
+    """
+    Fetches the chart bars for a given symbol and computes indicators over them.
+
+    Parameters:
+    stock_name, region, range, interval (str): As for fetch_chart_series.
+    indicators (list): Dicts like {'name': 'sma', 'window': 50}.
+
+    Returns:
+    tuple: (ChartSeries, [(label, panel, {output: array}), ...]), or a dict with an 'error' key.
+    """
+    series = fetch_chart_series(stock_name, region, range, interval)
+    if isinstance(series, dict):
+        return series
+
+    from indicators import engine
+    try:
+        # Cached per series, so repeated and refreshed requests only compute the new bars
+        with tracing.span("indicators", bars=len(series), count=len(indicators)):
+            computed = engine.compute_all((stock_name.upper(), region, range, interval), series, indicators)
+    except (ValueError, TypeError) as e:
+        return {"error": f"Error: {e}"}
+    return series, computed
+
+
+def fetch_portfolio_analytics(symbols, benchmark, region, range, interval, window):
+    """
+    Computes correlation, beta, volatility and drawdown analytics across a set of stocks.
+
+    Parameters:
+    symbols (list): Stock symbols (at most portfolio.MAX_UNIVERSE); the desk list of the symbol index when empty.
+    benchmark (str): Symbol the betas are measured against (e.g., 'SPY').
+    region, range, interval (str): As for fetch_chart_series.
+    window (int): Number of returns in the rolling beta window.
+
+    Returns:
+    PortfolioReport: The analytics, or a dict with an 'error' key.
+    """
+    from portfolio import analytics, default_universe
+
+    universe = symbols or default_universe()
+    try:
+        # Cached per universe and range; the series come through the bar store like single charts
+        with tracing.span("portfolio", symbols=len(universe), range=range, interval=interval):
+            return analytics.report(
+                universe, lambda symbol: fetch_chart_series(symbol, region, range, interval),
+                benchmark=benchmark, region=region, range=range, interval=interval, window=window,
+            )
+    except (ValueError, TypeError) as e:
+        return {"error": f"Error: {e}"}
@@ -0,0 +1,462 @@
+"""
+Prebuilt index for resolving company names to ticker symbols.
+
+The listed universe lives in symbols.tsv (symbol, name, '|'-separated
+aliases and a desk flag, one company per row). The desk flag marks the
+curated list the app offers by default (the former stock_mapping), which
+stays small however large the imported universe grows. SymbolIndex
+compiles the file into:
+
+- a token trie over normalized names and aliases ('The Goldman Sachs
+  Group, Inc.' -> 'goldman sachs'), used to find companies in a question
+  in one left-to-right scan. A partial name counts when only one company
+  lies below it ('Goldman', 'Wells').
+- a trigram index over the same keys, used to resolve misspelled names
+  ('Microsft') by Dice similarity.
+
+The compiled index is saved to .cache as JSON and reloaded on startup
+while symbols.tsv is unchanged, so resolution costs a few dict lookups.
+Run
+
+    python symbol_index.py import nasdaqlisted.txt otherlisted.txt
+
+to extend symbols.tsv with the full listed universe from the NASDAQ
+Trader symbol directory files (imported rows are not on the desk list).
+"""
+import csv
+import json
+import os
+import re
+import sys
+import threading
+from collections import Counter
+
+try:
+    import orjson
+except ImportError:  # optional; json is used instead
+    orjson = None
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SYMBOLS_PATH = os.path.join(BASE_DIR, "symbols.tsv")
+CACHE_PATH = os.path.join(BASE_DIR, ".cache", "symbol_index.json")
+# Compiled indexes were pickled here before; the file is removed once the JSON snapshot is written
+LEGACY_CACHE_PATH = os.path.join(BASE_DIR, ".cache", "symbol_index.pickle")
+# Bump when the compiled layout changes, so stale snapshots are rebuilt
+INDEX_VERSION = 3
+
+# Minimum Dice similarity of trigram sets for a fuzzy match
+FUZZY_THRESHOLD = 0.6
+# Shorter words and phrases are never matched fuzzily or by prefix
+MIN_PARTIAL_LENGTH = 4
+# Longest phrase (in words) tried against the fuzzy index
+MAX_FUZZY_WORDS = 3
+
+# Legal-form words dropped from the end of company names
+NAME_SUFFIXES = frozenset([
+    "inc", "incorporated", "corp", "corporation", "co", "company", "companies", "group", "holding",
+    "holdings", "plc", "ltd", "limited", "llc", "lp", "se", "sa", "ag", "nv", "the",
+])
+
+_WORD_RE = re.compile(r"[A-Za-z0-9]+(?:[&'’.][A-Za-z0-9]+)*")
+_INNER_PUNCTUATION_RE = re.compile(r"[&'’.]")
+# Trie node keys: words never contain these characters
+_SYMBOL_KEY = "$"
+_BELOW_KEY = "*"
+
+
+def tokenize(text):
+    """
+    Split text into normalized words.
+
+    Returns:
+    list: (start, end, word) per word, where word is lower-cased with inner
+    punctuation removed ('S&P' -> 'sp', "McDonald's" -> 'mcdonalds').
+    """
+    return [
+        (match.start(), match.end(), _INNER_PUNCTUATION_RE.sub("", match.group().lower()))
+        for match in _WORD_RE.finditer(text)
+    ]
+
+
+def normalize_name(name):
+    """Return the words of a company name without legal-form suffixes or a leading 'the'."""
+    words = [word for _, _, word in tokenize(name)]
+    while len(words) > 1 and words[-1] in NAME_SUFFIXES:
+        words.pop()
+    if len(words) > 1 and words[0] == "the":
+        words.pop(0)
+    return tuple(words)
+
+
+def trigrams(text):
+    padded = f" {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def read_symbols(path=SYMBOLS_PATH):
+    """Read symbols.tsv into a list of (symbol, name, aliases, desk)."""
+    with open(path, newline="", encoding="utf-8") as f:
+        return [
+            (row["symbol"], row["name"], [alias for alias in (row.get("aliases") or "").split("|") if alias],
+             (row.get("desk") or "").strip() == "1")
+            for row in csv.DictReader(f, delimiter="\t")
+        ]
+
+
+def write_symbols(entries, path=SYMBOLS_PATH):
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f, delimiter="\t", lineterminator="\n")
+        writer.writerow(["symbol", "name", "aliases", "desk"])
+        for symbol, name, aliases, desk in entries:
+            writer.writerow([symbol, name, "|".join(aliases), "1" if desk else ""])
+    os.replace(temporary, path)
+
+
+def read_listing(path):
+    """
+    Read a NASDAQ Trader symbol directory file (nasdaqlisted.txt or otherlisted.txt).
+
+    Returns:
+    list: (symbol, name, [], False) per listed security, without test issues.
+    """
+    entries = []
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f, delimiter="|"):
+            symbol = row.get("Symbol") or row.get("ACT Symbol")
+            if not symbol or symbol.startswith("File Creation Time") or row.get("Test Issue") == "Y":
+                continue
+            # 'Apple Inc. - Common Stock' -> 'Apple Inc.'
+            name = row.get("Security Name", "").split(" - ")[0].strip()
+            entries.append((symbol.replace(".", "-"), name or symbol, [], False))
+    return entries
+
+
+class SymbolMatch:
+    """A company found in a text: where, which symbol, and how ('exact', 'prefix' or 'fuzzy')."""
+
+    __slots__ = ("start", "end", "symbol", "kind", "score")
+
+    def __init__(self, start, end, symbol, kind, score):
+        self.start = start
+        self.end = end
+        self.symbol = symbol
+        self.kind = kind
+        self.score = score
+
+    def __repr__(self):
+        return f"SymbolMatch({self.symbol!r}, {self.kind!r}, {self.score:.2f}, span=({self.start}, {self.end}))"
+
+
+class SymbolIndex:
+    """
+    Name/alias -> symbol index built from (symbol, name, aliases, desk) entries.
+
+    Symbols that appear more than once are merged, keeping the first name.
+    """
+
+    def __init__(self, entries):
+        self.names = {}
+        self.desk = set()
+        self._trie = {}
+        keys = {}
+        for symbol, name, aliases, desk in entries:
+            symbol = symbol.upper()
+            self.names.setdefault(symbol, name)
+            if desk:
+                self.desk.add(symbol)
+            for text in [name] + list(aliases):
+                words = normalize_name(text)
+                if words:
+                    self._insert(words, symbol)
+                    keys.setdefault(" ".join(words), symbol)
+
+        # The first word of a name is a fuzzy key too, when it names one company only
+        first_words = Counter()
+        for key, symbol in keys.items():
+            first_words[(key.split()[0], symbol)] += 1
+        owners = Counter(word for word, _ in first_words)
+        for word, symbol in first_words:
+            if owners[word] == 1 and len(word) >= MIN_PARTIAL_LENGTH:
+                keys.setdefault(word, symbol)
+
+        self._keys = list(keys.items())
+        self._key_trigrams = []
+        self._postings = {}
+        for key_id, (key, _) in enumerate(self._keys):
+            grams = trigrams(key)
+            self._key_trigrams.append(len(grams))
+            for gram in grams:
+                self._postings.setdefault(gram, []).append(key_id)
+        self.symbols = frozenset(self.names)
+        self._labels = None
+
+    def to_state(self):
+        """The compiled tables as JSON-compatible data, for from_state()."""
+        return {
+            "names": self.names,
+            "desk": sorted(self.desk),
+            "trie": _trie_to_state(self._trie),
+            "keys": self._keys,
+            "key_trigrams": self._key_trigrams,
+            "postings": self._postings,
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        """Rebuild an index from to_state() data without compiling symbols.tsv again."""
+        index = cls.__new__(cls)
+        index.names = state["names"]
+        index.desk = set(state["desk"])
+        index._trie = _trie_from_state(state["trie"])
+        index._keys = [tuple(pair) for pair in state["keys"]]
+        index._key_trigrams = state["key_trigrams"]
+        index._postings = state["postings"]
+        index.symbols = frozenset(index.names)
+        index._labels = None
+        return index
+
+    def _insert(self, words, symbol):
+        node = self._trie
+        for word in words:
+            node = node.setdefault(word, {})
+            node.setdefault(_BELOW_KEY, set()).add(symbol)
+        node.setdefault(_SYMBOL_KEY, symbol)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, symbol):
+        return symbol in self.names
+
+    def name(self, symbol):
+        """Return the company name of a symbol (the symbol itself when unknown)."""
+        return self.names.get(symbol, symbol)
+
+    def label(self, symbol):
+        """Return 'Company Name (SYMBOL)' for display."""
+        return f"{self.name(symbol)} ({symbol})"
+
+    def sorted_symbols(self):
+        """Return every symbol, ordered by company name."""
+        return sorted(self.names, key=lambda symbol: (self.names[symbol].lower(), symbol))
+
+    def desk_symbols(self):
+        """Return the symbols of the curated desk list, ordered by company name."""
+        return [symbol for symbol in self.sorted_symbols() if symbol in self.desk]
+
+    def labels(self):
+        """Return {'Company Name (SYMBOL)': symbol} for every symbol, ordered by company name."""
+        if self._labels is None:
+            self._labels = {self.label(symbol): symbol for symbol in self.sorted_symbols()}
+        return self._labels
+
+    def find(self, text, stop_words=frozenset()):
+        """
+        Find company names and aliases in text, longest match first, in order of appearance.
+
+        A name cut short ('Goldman') matches when only one company lies
+        below it. Matches made only of stop words are ignored.
+
+        Returns:
+        list: SymbolMatch per company mention, with kind 'exact' or 'prefix'.
+        """
+        words = tokenize(text)
+        matches = []
+        i = 0
+        while i < len(words):
+            node, best = self._trie, None
+            for j in range(i, len(words)):
+                node = node.get(words[j][2])
+                if node is None:
+                    break
+                if _SYMBOL_KEY in node:
+                    best = (j, node[_SYMBOL_KEY], "exact")
+                elif len(node[_BELOW_KEY]) == 1:
+                    best = (j, next(iter(node[_BELOW_KEY])), "prefix")
+            if best is not None:
+                j, symbol, kind = best
+                matched = [word for _, _, word in words[i:j + 1]]
+                partial_too_short = kind == "prefix" and len(" ".join(matched)) < MIN_PARTIAL_LENGTH
+                if not partial_too_short and not all(word in stop_words for word in matched):
+                    # 'Wells Fargo & Company' is indexed as 'wells fargo'; the suffix belongs to the match
+                    while j + 1 < len(words) and words[j + 1][2] in NAME_SUFFIXES and words[j + 1][2] != "the":
+                        j += 1
+                    matches.append(SymbolMatch(words[i][0], words[j][1], symbol, kind, 1.0))
+                    i = j + 1
+                    continue
+            i += 1
+        return matches
+
+    def fuzzy(self, query, limit=5):
+        """
+        Return up to limit (symbol, score) pairs for the keys most similar to query.
+        """
+        query = " ".join(normalize_name(query))
+        if len(query) < MIN_PARTIAL_LENGTH:
+            return []
+        grams = trigrams(query)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self._postings.get(gram, ()))
+        best = {}
+        for key_id, count in shared.items():
+            score = 2.0 * count / (len(grams) + self._key_trigrams[key_id])
+            symbol = self._keys[key_id][1]
+            if score >= FUZZY_THRESHOLD and score > best.get(symbol, 0.0):
+                best[symbol] = score
+        return sorted(best.items(), key=lambda item: item[1], reverse=True)[:limit]
+
+    def find_fuzzy(self, text, stop_words=frozenset()):
+        """
+        Find misspelled company names in text.
+
+        Every phrase of up to MAX_FUZZY_WORDS words without stop words or
+        digits is compared with the fuzzy index; the best match of each run
+        of such words is kept.
+
+        Returns:
+        list: SymbolMatch per run of words that resembles a company, with kind 'fuzzy'.
+        """
+        words = tokenize(text)
+        runs, run = [], []
+        for word in words:
+            if word[2] in stop_words or any(char.isdigit() for char in word[2]):
+                if run:
+                    runs.append(run)
+                run = []
+            else:
+                run.append(word)
+        if run:
+            runs.append(run)
+
+        matches = []
+        for run in runs:
+            best = None
+            for i in range(len(run)):
+                for j in range(i, min(len(run), i + MAX_FUZZY_WORDS)):
+                    found = self.fuzzy(" ".join(word for _, _, word in run[i:j + 1]), limit=1)
+                    if found and (best is None or found[0][1] > best.score):
+                        best = SymbolMatch(run[i][0], run[j][1], found[0][0], "fuzzy", found[0][1])
+            if best is not None:
+                matches.append(best)
+        return matches
+
+    def resolve(self, query):
+        """
+        Resolve a symbol, company name, alias or misspelled name to one symbol.
+
+        Returns:
+        tuple: (symbol, kind) with kind 'symbol', 'exact', 'prefix' or 'fuzzy', or (None, None).
+        """
+        if query.strip().upper() in self.names:
+            return query.strip().upper(), "symbol"
+        matches = self.find(query)
+        if matches:
+            return matches[0].symbol, matches[0].kind
+        found = self.fuzzy(query, limit=1)
+        if found:
+            return found[0][0], "fuzzy"
+        return None, None
+
+
+def _trie_to_state(node):
+    # The sets of symbols below a node become sorted lists
+    return {
+        word: sorted(child) if word == _BELOW_KEY else child if word == _SYMBOL_KEY else _trie_to_state(child)
+        for word, child in node.items()
+    }
+
+
+def _trie_from_state(node):
+    return {
+        word: set(child) if word == _BELOW_KEY else child if word == _SYMBOL_KEY else _trie_from_state(child)
+        for word, child in node.items()
+    }
+
+
+def _source_stamp(path):
+    stat = os.stat(path)
+    return [INDEX_VERSION, stat.st_size, stat.st_mtime_ns]
+
+
+def _dumps(data):
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(",", ":")).encode("utf-8")
+
+
+def _loads(blob):
+    if orjson is not None:
+        return orjson.loads(blob)
+    return json.loads(blob)
+
+
+def load_index(path=SYMBOLS_PATH, cache_path=CACHE_PATH):
+    """
+    Load the compiled index for path from cache_path, rebuilding it when path changed.
+    """
+    stamp = _source_stamp(path)
+    try:
+        with open(cache_path, "rb") as f:
+            cached = _loads(f.read())
+        if cached["stamp"] == stamp:
+            return SymbolIndex.from_state(cached["index"])
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+
+    index = SymbolIndex(read_symbols(path))
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        temporary = f"{cache_path}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as f:
+            f.write(_dumps({"stamp": stamp, "index": index.to_state()}))
+        os.replace(temporary, cache_path)
+        if cache_path == CACHE_PATH and os.path.exists(LEGACY_CACHE_PATH):
+            os.remove(LEGACY_CACHE_PATH)
+    except OSError:
+        # A read-only checkout still works, it just rebuilds on every start
+        pass
+    return index
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """Return the process-wide symbol index, loading it on first use."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = load_index()
+        return _index
+
+
+def import_listings(paths, symbols_path=SYMBOLS_PATH):
+    """
+    Add every security of the given listing files to symbols.tsv.
+    Existing rows (and their aliases) are kept as they are.
+
+    Returns:
+    int: Number of symbols added.
+    """
+    entries = read_symbols(symbols_path)
+    known = {symbol for symbol, _, _, _ in entries}
+    added = 0
+    for path in paths:
+        for symbol, name, aliases, desk in read_listing(path):
+            if symbol not in known:
+                known.add(symbol)
+                entries.append((symbol, name, aliases, desk))
+                added += 1
+    write_symbols(entries, symbols_path)
+    return added
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "import":
+        print(f"Added {import_listings(sys.argv[2:])} symbols to {SYMBOLS_PATH}")
+    else:
+        print(f"usage: {sys.argv[0]} import LISTING_FILE...")
+        sys.exit(2)
@@ -0,0 +1,74 @@
+import math
+
+import numpy as np
+
+from chart_series import ChartSeries
+from downsample import downsample_series, lttb_indices, point_budget
+
+
+def reference_lttb(x, y, threshold):
+    """Largest-Triangle-Three-Buckets as published (Steinarsson 2013), one point at a time."""
+    n = len(x)
+    every = (n - 2) / (threshold - 2)
+    sampled = [0]
+    a = 0
+    for i in range(threshold - 2):
+        avg_start = math.floor((i + 1) * every) + 1
+        avg_end = min(math.floor((i + 2) * every) + 1, n)
+        avg_x = sum(x[avg_start:avg_end]) / (avg_end - avg_start)
+        avg_y = sum(y[avg_start:avg_end]) / (avg_end - avg_start)
+        best, best_area = None, -1.0
+        for j in range(math.floor(i * every) + 1, math.floor((i + 1) * every) + 1):
+            area = abs((x[a] - avg_x) * (y[j] - y[a]) - (x[a] - x[j]) * (avg_y - y[a]))
+            if area > best_area:
+                best, best_area = j, area
+        sampled.append(best)
+        a = best
+    sampled.append(n - 1)
+    return sampled
+
+
+def _series(close):
+    n = len(close)
+    ones = np.ones(n)
+    return ChartSeries("TEST", np.arange(n, dtype=np.int64) * 60, ones, ones, ones, np.asarray(close, float), ones)
+
+
+def test_matches_reference_implementation():
+    rng = np.random.default_rng(7)
+    x = np.arange(1000, dtype=np.float64)
+    y = np.cumsum(rng.normal(size=1000))
+    for threshold in (3, 10, 137, 999):
+        assert lttb_indices(x, y, threshold).tolist() == reference_lttb(x.tolist(), y.tolist(), threshold)
+
+
+def test_keeps_endpoints_and_returns_sorted_unique_indices():
+    y = np.sin(np.linspace(0, 20, 5000))
+    indices = lttb_indices(np.arange(5000), y, 300)
+    assert len(indices) == 300
+    assert indices[0] == 0 and indices[-1] == 4999
+    assert np.all(np.diff(indices) > 0)
+
+
+def test_keeps_a_spike():
+    y = np.zeros(10_000)
+    y[6543] = 50.0
+    assert 6543 in lttb_indices(np.arange(10_000), y, 100)
+
+
+def test_small_inputs_are_kept_whole():
+    assert lttb_indices(np.arange(5), np.arange(5), 10).tolist() == [0, 1, 2, 3, 4]
+    assert lttb_indices(np.arange(5), np.arange(5), 2).tolist() == [0, 1, 2, 3, 4]
+
+
+def test_downsample_series():
+    series = _series(np.cumsum(np.ones(2000)))
+    assert downsample_series(series, 2000) is series
+    smaller = downsample_series(series, 500)
+    assert len(smaller) == 500
+    assert smaller.timestamps[0] == series.timestamps[0] and smaller.timestamps[-1] == series.timestamps[-1]
+
+
+def test_point_budget():
+    assert point_budget(700, 2) == 1400
+    assert point_budget(1, 1) == 3
@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+
+from chart_series import ChartSeries
+from indicators import INDICATORS, IndicatorEngine
+
+SPECS = [{"name": name} for name in INDICATORS]
+
+
+def _series(n, seed=1, step=300):
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(size=n))
+    spread = rng.uniform(0.1, 1.0, size=n)
+    timestamps = 1_700_000_000 + np.arange(n, dtype=np.int64) * step
+    return ChartSeries("TEST", timestamps, close - 0.2, close + spread, close - spread, close,
+                       rng.uniform(1e3, 1e5, size=n))
+
+
+def _assert_same(warm, cold):
+    assert [label for label, _, _ in warm] == [label for label, _, _ in cold]
+    for (label, _, warm_outputs), (_, _, cold_outputs) in zip(warm, cold):
+        for output in cold_outputs:
+            np.testing.assert_allclose(warm_outputs[output], cold_outputs[output], rtol=1e-9, atol=1e-9,
+                                       equal_nan=True, err_msg=f"{label} {output}")
+
+
+def test_new_bars_are_computed_incrementally_and_match_a_cold_compute():
+    full = _series(1500)
+    engine = IndicatorEngine()
+    engine.compute_all(("TEST",), full.take(slice(0, 1400)), SPECS)
+    warm = engine.compute_all(("TEST",), full, SPECS)
+
+    assert engine.incremental_updates == len(SPECS)
+    _assert_same(warm, IndicatorEngine().compute_all(("TEST",), full, SPECS))
+
+
+def test_restated_last_bar_is_recomputed():
+    series = _series(500)
+    engine = IndicatorEngine()
+    engine.compute_all(("TEST",), series, SPECS)
+    close = series.close.copy()
+    close[-1] += 5.0
+    restated = ChartSeries("TEST", series.timestamps, series.open, series.high, series.low, close, series.volume)
+    warm = engine.compute_all(("TEST",), restated, SPECS)
+
+    assert engine.incremental_updates == len(SPECS)
+    _assert_same(warm, IndicatorEngine().compute_all(("TEST",), restated, SPECS))
+
+
+def test_series_with_a_moved_start_is_computed_from_scratch():
+    full = _series(1500)
+    engine = IndicatorEngine()
+    engine.compute_all(("TEST",), full.take(slice(0, 1400)), SPECS)
+    slid = full.take(slice(100, None))
+    warm = engine.compute_all(("TEST",), slid, SPECS)
+
+    assert engine.incremental_updates == 0
+    assert engine.full_computes == 2 * len(SPECS)
+    _assert_same(warm, IndicatorEngine().compute_all(("TEST",), slid, SPECS))
+
+
+def test_unchanged_series_is_served_from_the_cache():
+    series = _series(300)
+    engine = IndicatorEngine()
+    first = engine.compute(("TEST",), series, "sma", {"window": 50})
+    again = engine.compute(("TEST",), series, "sma", {"window": 50})
+    assert engine.full_computes == 1 and engine.incremental_updates == 0
+    np.testing.assert_array_equal(first["sma"], again["sma"])
+
+
+def test_sma_values():
+    series = _series(60)
+    sma = IndicatorEngine().compute(("TEST",), series, "sma", {"window": 20})["sma"]
+    assert np.isnan(sma[:19]).all()
+    assert sma[-1] == pytest.approx(series.close[-20:].mean())
+
+
+def test_unknown_indicator():
+    with pytest.raises(ValueError):
+        IndicatorEngine().compute(("TEST",), _series(10), "ichimoku")
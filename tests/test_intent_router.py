@@ -0,0 +1,98 @@
+import time
+
+import pytest
+
+import symbol_index
+from intent_router import CONFIDENCE_THRESHOLD, IntentRouter
+
+
+@pytest.fixture(scope="module")
+def router():
+    return IntentRouter(symbol_index.get_index())
+
+
+def _calls(router, question):
+    return [(decision.function_name, decision.args) for decision in router.parse_all(question)]
+
+
+def test_price_question(router):
+    assert _calls(router, "What is the latest price for AAPL?") == [("get_stock_data", {"stock_name": "AAPL"})]
+
+
+def test_company_names_resolve_to_tickers(router):
+    assert _calls(router, "Give me latest news for Goldman") == [("get_stock_news", {"stock_name": "GS"})]
+    assert _calls(router, "Give me latest analyst recommendations for JP Morgan") == [
+        ("get_analyst_data", {"symbol": "JPM"}),
+    ]
+
+
+def test_chart_arguments(router):
+    assert _calls(router, "Show me the chart for MSFT in US region for 1d with interval 5m") == [
+        ("get_stock_chart", {"stock_name": "MSFT", "region": "US", "range": "1d", "interval": "5m"}),
+    ]
+
+
+def test_every_intent_for_every_ticker(router):
+    calls = _calls(router, "compare news and price for AAPL and MSFT")
+    assert sorted(calls, key=repr) == sorted([
+        ("get_stock_news", {"stock_name": "AAPL"}),
+        ("get_stock_news", {"stock_name": "MSFT"}),
+        ("get_stock_data", {"stock_name": "AAPL"}),
+        ("get_stock_data", {"stock_name": "MSFT"}),
+    ], key=repr)
+
+
+def test_indicators(router):
+    assert _calls(router, "AAPL 6mo with 50-day SMA and RSI") == [
+        ("get_stock_indicators", {
+            "stock_name": "AAPL", "region": "US", "range": "6mo", "interval": "1d",
+            "indicators": [{"name": "sma", "window": 50}, {"name": "rsi"}],
+        }),
+    ]
+
+
+def test_unparseable_question_is_left_to_the_model(router):
+    assert router.parse_all("how is the company doing?") == []
+    assert all(decision.confidence >= CONFIDENCE_THRESHOLD
+               for decision in router.parse_all("What is the latest price for AAPL?"))
+
+
+# Sunday 18 October 2026, 15:30 local time
+NOW = time.mktime((2026, 10, 18, 15, 30, 0, 0, 0, -1))
+
+
+def _midnight(year, month, day):
+    return time.mktime((year, month, day, 0, 0, 0, 0, 0, -1))
+
+
+@pytest.mark.parametrize("question, since", [
+    ("news about AAPL today", _midnight(2026, 10, 18)),
+    ("what happened this week", _midnight(2026, 10, 12)),
+    ("analyst notes this month", _midnight(2026, 10, 1)),
+    ("everything from the current year", _midnight(2026, 1, 1)),
+    ("in the past 2 weeks", NOW - 14 * 24 * 3600),
+    ("over the last day", NOW - 24 * 3600),
+    ("no period here", None),
+])
+def test_parse_since(question, since):
+    assert IntentRouter.parse_since(question, NOW) == since
+
+
+def test_this_month_on_the_first_starts_at_midnight():
+    now = time.mktime((2026, 10, 1, 9, 0, 0, 0, 0, -1))
+    assert IntentRouter.parse_since("this month", now) == _midnight(2026, 10, 1)
+
+
+def test_search_question(router):
+    [(name, args)] = _calls(router, "what have analysts said about margins at AAPL this month")
+    assert name == "search_documents"
+    assert args["query"] == "margins"
+    assert args["symbols"] == ["AAPL"]
+    assert args["kind"] == "analyst"
+    assert time.localtime(args["since"])[1:6] == (time.localtime().tm_mon, 1, 0, 0, 0)
+
+
+def test_search_without_tickers_searches_everything(router):
+    [(name, args)] = _calls(router, "search news mentioning layoffs")
+    assert name == "search_documents"
+    assert (args["query"], args["symbols"], args["kind"], args["since"]) == ("layoffs", [], "news", None)
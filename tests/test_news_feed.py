@@ -0,0 +1,69 @@
+from email.utils import formatdate
+
+from news_feed import NewsFeed, NewsLog
+from response_models import NewsItem
+
+NOW = 1_790_000_000.0
+HOUR = 3600
+
+
+def _item(title, hours_ago, description="Body"):
+    return NewsItem(title, description, formatdate(NOW - hours_ago * HOUR))
+
+
+def _titles(entries):
+    return [entry.item.title for entry in entries]
+
+
+def test_cursor_returns_only_new_articles_newest_first():
+    log = NewsLog()
+    log.add((_item("Apple opens a new campus", 5), _item("Tesla recalls sedans", 3)), now=NOW)
+    entries, cursor = log.since()
+    assert _titles(entries) == ["Tesla recalls sedans", "Apple opens a new campus"]
+
+    log.add((_item("Apple opens a new campus", 5), _item("Tesla recalls sedans", 3),
+             _item("Nvidia tops forecasts", 1)), now=NOW)
+    entries, next_cursor = log.since(cursor)
+    assert _titles(entries) == ["Nvidia tops forecasts"]
+    assert log.since(next_cursor) == ([], next_cursor)
+
+
+def test_syndicated_copies_are_collapsed():
+    log = NewsLog()
+    added = log.add((
+        _item("Fed holds rates steady as inflation cools - Reuters", 4),
+        _item("Fed holds rates steady as inflation cools | Yahoo Finance", 3),
+        _item("Fed holds interest rates steady as inflation cools", 2),
+    ), now=NOW)
+    assert len(added) == 1 and added[0].duplicates == 2
+    assert len(log) == 1
+
+
+def test_same_headline_far_apart_is_a_new_story():
+    log = NewsLog()
+    log.add((_item("Markets close higher", 60), _item("Markets close higher", 1)), now=NOW)
+    assert len(log) == 2
+
+
+def test_old_articles_and_overflow_are_dropped():
+    log = NewsLog(retention=10 * HOUR, max_entries=3)
+    log.add(tuple(_item(f"Story number {n} about topic {n * 7}", hours_ago=n) for n in range(6)), now=NOW)
+    assert _titles(log.since()[0]) == [f"Story number {n} about topic {n * 7}" for n in range(3)]
+    log.add((_item("A much older story", 30),), now=NOW)
+    assert len(log) == 3
+
+
+def test_the_same_cached_batch_is_skipped():
+    log = NewsLog()
+    batch = (_item("Apple opens a new campus", 5),)
+    assert len(log.add(batch, now=NOW)) == 1
+    assert log.add(batch, now=NOW) == []
+
+
+def test_feed_passes_errors_through_and_keys_by_ticker():
+    feed = NewsFeed()
+    assert feed.update("aapl", lambda ticker: {"error": "boom"}) == {"error": "boom"}
+    entries, cursor = feed.update("aapl", lambda ticker: (_item(f"{ticker} story", 1),))
+    assert _titles(entries) == ["aapl story"]
+    assert feed.log("AAPL") is feed.log("aapl")
+    assert feed.update("AAPL", lambda ticker: (_item(f"{ticker} story", 1),), cursor) == ([], cursor)
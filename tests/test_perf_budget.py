@@ -0,0 +1,31 @@
+import json
+import os
+import subprocess
+import sys
+
+import perf_budget
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_app_runs_within_budget():
+    # measure_app() needs a fresh interpreter, or modules imported by other tests make startup look fast
+    output = subprocess.run(
+        [sys.executable, "-c", "import json, perf_budget; print(json.dumps(perf_budget.measure_app()))"],
+        cwd=ROOT, capture_output=True, text=True, timeout=300, check=True,
+    ).stdout
+    report = json.loads(output.strip().splitlines()[-1])
+
+    assert report["network_calls"] == 0
+    assert report["lazy_modules_loaded"] == []
+    assert report["startup"] <= perf_budget.STARTUP_BUDGET_SECONDS
+    assert report["rerun_p50"] <= perf_budget.RERUN_BUDGET_SECONDS
+    assert report["within_budget"]
+
+
+def test_rerun_stats():
+    del perf_budget._samples[:]
+    assert perf_budget.rerun_stats() == {"count": 0, "p50": 0.0, "max": 0.0}
+    for seconds in (0.3, 0.1, 0.2):
+        perf_budget.record_rerun(seconds)
+    assert perf_budget.rerun_stats() == {"count": 3, "p50": 0.2, "max": 0.3}
@@ -0,0 +1,41 @@
+import pytest
+
+import shared_cache
+from routing_cache import RoutingCache, checked_calls
+
+
+@pytest.fixture
+def shared(tmp_path):
+    return shared_cache.from_url(f"sqlite:///{tmp_path / 'shared.sqlite3'}")
+
+
+def test_decisions_are_shared_between_processes(tmp_path, shared):
+    first = RoutingCache(str(tmp_path / "a.sqlite3"), shared=shared)
+    second = RoutingCache(str(tmp_path / "b.sqlite3"), shared=shared)
+    first.set("news for tsla", [("get_stock_news", {"stock_name": "TSLA"})])
+
+    assert second.get("news for tsla") == [("get_stock_news", {"stock_name": "TSLA"})]
+    # Installed locally, so it survives the shared entry
+    shared.clear()
+    assert second.get("news for tsla") == [("get_stock_news", {"stock_name": "TSLA"})]
+
+
+@pytest.mark.parametrize("value", [
+    None,
+    "get_stock_news",
+    {"get_stock_news": {}},
+    [("get_stock_news", "TSLA")],
+    [("get_stock_news", {"stock_name": "TSLA"}, "extra")],
+    [(42, {})],
+])
+def test_malformed_shared_entries_are_a_miss(tmp_path, shared, value):
+    shared.set("route|news for tsla", value, 0, 60, 0)
+    cache = RoutingCache(str(tmp_path / "routes.sqlite3"), shared=shared)
+    assert cache.get("news for tsla") is None
+    assert len(cache) == 0
+
+
+def test_checked_calls():
+    assert checked_calls([["get_stock_data", {"stock_name": "AAPL"}]]) == [("get_stock_data", {"stock_name": "AAPL"})]
+    with pytest.raises(ValueError):
+        checked_calls([["get_stock_data"]])
@@ -0,0 +1,55 @@
+import time
+from email.utils import formatdate
+
+import pytest
+
+from response_models import AnalystReport, NewsItem
+from search_index import SearchIndex, match_query
+
+NOW = time.time()
+DAY = 24 * 3600
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = SearchIndex(str(tmp_path / "search.sqlite3"), flush_interval=0.01)
+    index.add_news("aapl", [
+        NewsItem("Apple margins beat estimates", "Gross margin rose on services", formatdate(NOW - DAY)),
+        NewsItem("Apple unveils a new iPhone", "Demand looks strong", formatdate(NOW - 40 * DAY)),
+    ])
+    index.add_news("MSFT", [NewsItem("Microsoft cloud margins widen", "Azure grew", formatdate(NOW - 2 * DAY))])
+    index.add_analyst_reports("AAPL", [
+        AnalystReport("Margin outlook", "A. Analyst", "https://example.com/r.pdf", "Analyst Report",
+                      "We expect margins to expand", "Research Co", (NOW - 3 * DAY) * 1000),
+    ])
+    index.flush()
+    return index
+
+
+def test_stemmed_terms_match(index):
+    titles = {hit.title for hit in index.search("margin")}
+    assert titles == {"Apple margins beat estimates", "Microsoft cloud margins widen", "Margin outlook"}
+
+
+def test_filters(index):
+    assert {hit.ticker for hit in index.search("margins", symbols=["msft"])} == {"MSFT"}
+    assert [hit.kind for hit in index.search("margins", kind="analyst")] == ["analyst"]
+    assert {hit.title for hit in index.search("apple", since=NOW - 7 * DAY)} == {"Apple margins beat estimates"}
+
+
+def test_same_article_is_indexed_once(index):
+    index.add_news("AAPL", [NewsItem("Apple margins beat estimates", "Gross margin rose on services",
+                                     formatdate(NOW - DAY))])
+    index.flush()
+    assert index.stats()["documents"] == {"news": 3, "analyst": 1}
+
+
+def test_empty_query_returns_newest_first(index):
+    assert [hit.title for hit in index.search("", symbols=["AAPL"])] == [
+        "Apple margins beat estimates", "Margin outlook", "Apple unveils a new iPhone",
+    ]
+
+
+def test_match_query_quotes_every_term():
+    assert match_query('margins AND "guidance" margins') == '"margins" OR "and" OR "guidance"'
+    assert match_query("?!") is None
@@ -0,0 +1,89 @@
+import threading
+
+import numpy as np
+import pytest
+
+import shared_cache
+from chart_series import ChartSeries
+from response_models import AnalystReport, NewsItem, Profile, Quote
+
+
+def _round_trip(value):
+    return shared_cache.loads(shared_cache.dumps(value))
+
+
+@pytest.mark.parametrize("value", [
+    None,
+    {"body": [{"symbol": "AAPL", "price": 1.5, "tags": ["a", None]}]},
+    [("get_stock_news", {"stock_name": "TSLA"}), ("get_stock_data", {"stock_name": "AAPL"})],
+    (Quote.from_json({"symbol": "AAPL", "regularMarketPrice": 189.5, "marketCap": 3e12}),),
+    tuple(NewsItem(f"Headline {n} " * 20, "Body", "Mon, 12 Oct 2026 10:00:00 GMT") for n in range(40)),
+    AnalystReport("Title", None, "https://example.com", "Report", "Abstract", "Provider", 1.79e12),
+])
+def test_values_come_back_unchanged(value):
+    restored = _round_trip(value)
+    assert restored == value
+    assert type(restored) is type(value)
+
+
+def test_nested_records_come_back_as_records():
+    profile = Profile.from_json({"city": "Cupertino", "companyOfficers": [{"name": "Tim", "age": 63}]})
+    restored = _round_trip(profile)
+    assert restored == profile
+    assert isinstance(restored.officers, tuple) and restored.officers[0].name == "Tim"
+
+
+def test_chart_series_round_trip():
+    n = 5000
+    rng = np.random.default_rng(3)
+    series = ChartSeries("AAPL", 1_700_000_000 + np.arange(n, dtype=np.int64) * 60,
+                         *(rng.normal(size=n) for _ in range(5)))
+    restored = _round_trip(series)
+    assert restored.symbol == "AAPL"
+    for name in ("timestamps", "open", "high", "low", "close", "volume"):
+        np.testing.assert_array_equal(getattr(restored, name), getattr(series, name))
+        assert getattr(restored, name).dtype == getattr(series, name).dtype
+    restored.close[0] = 0.0  # writable, like freshly parsed arrays
+
+
+OBJECT_HEADER = b'{"symbol": "X", "length": 1, "dtypes": ["|O", "|O", "|O", "|O", "|O", "|O"]}'
+
+
+@pytest.mark.parametrize("blob, error", [
+    (b'\x00J{"$record": "os.system", "values": ["true"]}', KeyError),
+    (b"\x00\x80\x05N.", ValueError),  # a pickle
+    (b"\x00S" + len(OBJECT_HEADER).to_bytes(4, "little") + OBJECT_HEADER + bytes(48), ValueError),
+])
+def test_untrusted_blobs_are_rejected(blob, error):
+    with pytest.raises(error):
+        shared_cache.loads(blob)
+
+
+def test_keys_carry_the_schema_version():
+    key = shared_cache.encode_key(("/api/quote", "AAPL", None))
+    assert key == f"v{shared_cache.SCHEMA_VERSION}|/api/quote|AAPL|"
+
+
+def test_sqlite_store(tmp_path):
+    cache = shared_cache.from_url(f"sqlite:///{tmp_path / 'shared.sqlite3'}")
+    cache.set("quote", {"price": 1.0}, 10, ttl=60, max_stale=60)
+    entry = cache.get("quote")
+    assert entry.value == {"price": 1.0} and entry.size == 10
+    assert cache.get("missing") is None
+
+
+def test_only_one_process_fetches_a_key(tmp_path):
+    cache = shared_cache.from_url(f"sqlite:///{tmp_path / 'shared.sqlite3'}")
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.acquire("quote"))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(results) == [False] * 7 + [True]
+
+
+def test_unstorable_values_are_counted_not_raised(tmp_path):
+    cache = shared_cache.from_url(f"sqlite:///{tmp_path / 'shared.sqlite3'}")
+    cache.set("array", np.arange(3), 24, ttl=60, max_stale=60)
+    assert cache.get("array") is None
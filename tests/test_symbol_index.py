@@ -0,0 +1,40 @@
+import os
+import shutil
+
+import symbol_index
+
+
+def test_snapshot_reloads_an_equivalent_index(tmp_path):
+    symbols_path = tmp_path / "symbols.tsv"
+    cache_path = tmp_path / "symbol_index.json"
+    shutil.copy(symbol_index.SYMBOLS_PATH, symbols_path)
+    built = symbol_index.load_index(str(symbols_path), str(cache_path))
+    assert cache_path.exists()
+
+    loaded = symbol_index.load_index(str(symbols_path), str(cache_path))
+    assert loaded is not built
+    for question in ("news for Goldman", "Wells Fargo & Company earnings", "price of Microsft", "jp morgan"):
+        assert loaded.resolve(question) == built.resolve(question)
+        assert [(m.symbol, m.kind) for m in loaded.find(question)] == [(m.symbol, m.kind) for m in built.find(question)]
+    assert loaded.fuzzy("Microsft") == built.fuzzy("Microsft")
+    assert loaded.desk_symbols() == built.desk_symbols()
+
+
+def test_changed_symbols_file_is_compiled_again(tmp_path):
+    symbols_path = tmp_path / "symbols.tsv"
+    cache_path = tmp_path / "symbol_index.json"
+    shutil.copy(symbol_index.SYMBOLS_PATH, symbols_path)
+    symbol_index.load_index(str(symbols_path), str(cache_path))
+
+    entries = symbol_index.read_symbols(str(symbols_path)) + [("ZZZQ", "Zebra Quartz Holdings", ["zebraq"], False)]
+    symbol_index.write_symbols(entries, str(symbols_path))
+    os.utime(symbols_path, ns=(1, 1))
+    assert symbol_index.load_index(str(symbols_path), str(cache_path)).resolve("Zebra Quartz") == ("ZZZQ", "exact")
+
+
+def test_corrupt_snapshot_is_rebuilt(tmp_path):
+    symbols_path = tmp_path / "symbols.tsv"
+    cache_path = tmp_path / "symbol_index.json"
+    shutil.copy(symbol_index.SYMBOLS_PATH, symbols_path)
+    cache_path.write_bytes(b"\x80\x05not json")
+    assert symbol_index.load_index(str(symbols_path), str(cache_path)).resolve("Goldman")[0] == "GS"
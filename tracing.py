@@ -0,0 +1,292 @@
+"""
+Request tracing and per-stage latency metrics.
+
+Every question gets a trace with its own trace ID; the stages that answer
+it (routing, the OpenAI call, each fetch, the upstream request, JSON
+parsing, indicator and figure construction, Streamlit rendering) run in
+span() blocks that record their duration and attributes such as the
+upstream status code, bytes received, cache hit/miss and retry count.
+The current trace and span live in context variables, so work submitted
+to the dispatcher's thread pool (with the caller's context) is attached
+to the question that asked for it.
+
+Independently of traces, every span duration is added to a per-stage
+sample window, from which stage_stats() computes p50/p95/p99 and
+prometheus_text() renders them in the Prometheus text exposition format.
+When the TIKERTALK_TRACE_LOG environment variable names a file, every
+finished trace is appended to it as one JSON line; when
+TIKERTALK_METRICS_FILE does, the Prometheus text is rewritten there after
+every trace (for node_exporter's textfile collector).
+"""
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from contextlib import contextmanager
+
+# JSONL file finished traces are appended to; tracing to a file is off when unset
+TRACE_LOG_PATH = os.environ.get("TIKERTALK_TRACE_LOG")
+# Prometheus text file rewritten after every trace; off when unset
+METRICS_PATH = os.environ.get("TIKERTALK_METRICS_FILE")
+# Durations kept per stage for the percentiles
+MAX_SAMPLES_PER_STAGE = 1000
+# Finished traces kept in memory for the debug panel
+MAX_RECENT_TRACES = 20
+QUANTILES = (0.5, 0.95, 0.99)
+
+_current_trace = contextvars.ContextVar("tikertalk_trace", default=None)
+_current_span = contextvars.ContextVar("tikertalk_span", default=None)
+
+
+class Span:
+    """One timed stage of a request."""
+
+    __slots__ = ("stage", "span_id", "parent_id", "started_at", "duration", "attrs")
+
+    def __init__(self, stage, parent_id, attrs):
+        self.stage = stage
+        self.span_id = uuid.uuid4().hex[:8]
+        self.parent_id = parent_id
+        self.started_at = time.time()
+        self.duration = None
+        self.attrs = attrs
+
+    def to_dict(self):
+        return {
+            "stage": self.stage,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "started_at": self.started_at,
+            "duration": self.duration,
+            "attrs": self.attrs,
+        }
+
+
+class Trace:
+    """All spans of one request, under one trace ID."""
+
+    def __init__(self, name, attrs):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.attrs = attrs
+        self.started_at = time.time()
+        self.duration = None
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def to_dict(self):
+        with self._lock:
+            spans = [span.to_dict() for span in self.spans]
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "attrs": self.attrs,
+            "started_at": self.started_at,
+            "duration": self.duration,
+            "spans": spans,
+        }
+
+
+class Metrics:
+    """Process-wide per-stage durations and labelled counters."""
+
+    def __init__(self, max_samples=MAX_SAMPLES_PER_STAGE):
+        self.max_samples = max_samples
+        self._samples = {}
+        self._totals = Counter()
+        self._counts = Counter()
+        self._counters = Counter()
+        self._lock = threading.Lock()
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            samples = self._samples.get(stage)
+            if samples is None:
+                samples = self._samples[stage] = deque(maxlen=self.max_samples)
+            samples.append(seconds)
+            self._totals[stage] += seconds
+            self._counts[stage] += 1
+
+    def count(self, name, amount=1, **labels):
+        with self._lock:
+            self._counters[(name, tuple(sorted(labels.items())))] += amount
+
+    def stage_stats(self):
+        """
+        Return {stage: {'count', 'sum', 'p50', 'p95', 'p99'}} with durations in seconds.
+        The percentiles cover the last max_samples spans of each stage.
+        """
+        with self._lock:
+            samples = {stage: sorted(values) for stage, values in self._samples.items()}
+            totals, counts = dict(self._totals), dict(self._counts)
+        stats = {}
+        for stage, values in sorted(samples.items()):
+            stats[stage] = {"count": counts[stage], "sum": totals[stage]}
+            for quantile in QUANTILES:
+                stats[stage][f"p{int(quantile * 100)}"] = values[min(len(values) - 1, int(quantile * len(values)))]
+        return stats
+
+    def counters(self):
+        """Return {(name, ((label, value), ...)): total}."""
+        with self._lock:
+            return dict(self._counters)
+
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
+            self._totals.clear()
+            self._counts.clear()
+            self._counters.clear()
+
+
+metrics = Metrics()
+_recent = deque(maxlen=MAX_RECENT_TRACES)
+_recent_lock = threading.Lock()
+_log_lock = threading.Lock()
+
+
+@contextmanager
+def trace(name, **attrs):
+    """
+    Start a new trace for one request; spans opened inside it (also in
+    threads started with its context) are attached to it.
+
+    Yields:
+    Trace: The trace, whose trace_id can be shown to the user.
+    """
+    current = Trace(name, attrs)
+    trace_token = _current_trace.set(current)
+    span_token = _current_span.set(None)
+    started = time.perf_counter()
+    try:
+        yield current
+    finally:
+        current.duration = time.perf_counter() - started
+        _current_span.reset(span_token)
+        _current_trace.reset(trace_token)
+        metrics.observe(name, current.duration)
+        with _recent_lock:
+            _recent.append(current)
+        if TRACE_LOG_PATH:
+            _write_line(TRACE_LOG_PATH, current.to_dict())
+        if METRICS_PATH:
+            _write_metrics(METRICS_PATH)
+
+
+@contextmanager
+def span(stage, **attrs):
+    """
+    Time one stage. The duration always feeds the stage's percentiles; the
+    span itself is recorded on the current trace, if there is one.
+
+    Yields:
+    Span: The span; set attributes with annotate() or span.attrs.
+    """
+    parent = _current_span.get()
+    current = Span(stage, parent.span_id if parent is not None else None, attrs)
+    token = _current_span.set(current)
+    started = time.perf_counter()
+    try:
+        yield current
+    except BaseException as e:
+        current.attrs["error"] = type(e).__name__
+        raise
+    finally:
+        current.duration = time.perf_counter() - started
+        _current_span.reset(token)
+        metrics.observe(stage, current.duration)
+        owner = _current_trace.get()
+        if owner is not None:
+            owner.add(current)
+
+
+def annotate(**attrs):
+    """Add attributes to the current span (ignored outside of a span)."""
+    current = _current_span.get()
+    if current is not None:
+        current.attrs.update(attrs)
+
+
+def count(name, amount=1, **labels):
+    """Add amount to a labelled counter, e.g. count('cache_requests_total', result='hit')."""
+    metrics.count(name, amount, **labels)
+
+
+def current_trace_id():
+    current = _current_trace.get()
+    return current.trace_id if current is not None else None
+
+
+def copy_context():
+    """Return a copy of the caller's context, for running work in another thread under its trace."""
+    return contextvars.copy_context()
+
+
+def stage_stats():
+    """Return the per-stage count, sum and p50/p95/p99 durations (see Metrics.stage_stats)."""
+    return metrics.stage_stats()
+
+
+def recent_traces():
+    """Return the last finished traces as dicts, newest first."""
+    with _recent_lock:
+        traces = list(_recent)
+    return [finished.to_dict() for finished in reversed(traces)]
+
+
+def _write_line(path, record):
+    line = json.dumps(record, default=str)
+    with _log_lock:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+def _write_metrics(path):
+    text = prometheus_text()
+    with _log_lock:
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(temporary, path)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(pairs):
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+
+def prometheus_text(prefix="tikertalk"):
+    """
+    Render the stage percentiles and counters in the Prometheus text exposition format.
+    """
+    lines = [
+        f"# HELP {prefix}_stage_seconds Time spent in each request stage.",
+        f"# TYPE {prefix}_stage_seconds summary",
+    ]
+    for stage, stats in metrics.stage_stats().items():
+        for quantile in QUANTILES:
+            labels = _labels([("stage", stage), ("quantile", quantile)])
+            lines.append(f"{prefix}_stage_seconds{labels} {stats[f'p{int(quantile * 100)}']:.6f}")
+        lines.append(f"{prefix}_stage_seconds_sum{_labels([('stage', stage)])} {stats['sum']:.6f}")
+        lines.append(f"{prefix}_stage_seconds_count{_labels([('stage', stage)])} {stats['count']}")
+
+    by_name = {}
+    for (name, labels), total in sorted(metrics.counters().items()):
+        by_name.setdefault(name, []).append((labels, total))
+    for name, series in by_name.items():
+        lines.append(f"# TYPE {prefix}_{name} counter")
+        for labels, total in series:
+            lines.append(f"{prefix}_{name}{_labels(labels)} {total:g}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,128 @@
+"""
+Batch quotes for watchlists.
+
+The markets/quote endpoint accepts a comma-separated list of tickers, so
+a watchlist of ~50 names is packed into a few upstream calls of
+QUOTE_BATCH_SIZE symbols each. The batches run concurrently on the
+dispatcher's bounded thread pool, and come back as response_models.Quote
+records. Quotes are kept in one columnar pandas
+table indexed by symbol, which update_table() refreshes in place: only
+rows whose values changed are written, new symbols are appended and
+symbols that left the watchlist are dropped.
+"""
+import pandas as pd
+import requests
+
+import dispatcher
+import response_cache
+import response_models
+from rapidapi_client import YAHOO_FINANCE15_HOST
+
+QUOTE_PATH = "/api/v1/markets/quote"
+# Symbols packed into one markets/quote request
+QUOTE_BATCH_SIZE = 20
+
+# Table column -> attribute of response_models.Quote
+QUOTE_FIELDS = {
+    "name": "short_name",
+    "price": "price",
+    "change": "change",
+    "change %": "change_percent",
+    "P/E": "trailing_pe",
+    "volume": "volume",
+}
+COLUMNS = list(QUOTE_FIELDS)
+NUMERIC_COLUMNS = COLUMNS[1:]
+
+
+def _batches(symbols, size):
+    for start in range(0, len(symbols), size):
+        yield symbols[start:start + size]
+
+
+def fetch_quote_batch(symbols):
+    """
+    Fetch quotes for up to QUOTE_BATCH_SIZE symbols in one request.
+
+    Returns:
+    dict: symbol -> Quote, or a dict with an 'error' key.
+    """
+    querystring = {"ticker": ",".join(symbols), "type": "STOCKS"}
+    try:
+        quotes = response_cache.fetch_json(YAHOO_FINANCE15_HOST, QUOTE_PATH, params=querystring,
+                                           parse=response_models.parse_quotes)
+    except requests.exceptions.RequestException as e:
+        return {"error": str(e)}
+    if not quotes:
+        return {"error": "No data found for the provided tickers."}
+    return {quote.symbol: quote for quote in quotes if quote.symbol}
+
+
+def fetch_quotes(symbols):
+    """
+    Fetch quotes for many symbols with as few upstream calls as possible.
+
+    Parameters:
+    symbols (list): Stock symbols (e.g., ['AAPL', 'MSFT']).
+
+    Returns:
+    tuple: (quotes, errors) where quotes maps symbol -> Quote and errors lists the failed batches.
+    """
+    # Sorted so the same watchlist always produces the same batches (and cache keys)
+    symbols = sorted(set(symbols))
+    calls = [("quote_batch", {"symbols": batch}) for batch in _batches(symbols, QUOTE_BATCH_SIZE)]
+    handlers = {"quote_batch": lambda args: fetch_quote_batch(args["symbols"])}
+
+    quotes, errors = {}, []
+    for _, _, _, result in dispatcher.run_calls(calls, handlers):
+        if "error" in result:
+            errors.append(result["error"])
+        else:
+            quotes.update(result)
+    return quotes, errors
+
+
+def quotes_table(quotes):
+    """Build the watchlist table (one row per symbol) from a symbol -> Quote mapping."""
+    rows = {
+        symbol: [getattr(quote, field) for field in QUOTE_FIELDS.values()]
+        for symbol, quote in quotes.items()
+    }
+    table = pd.DataFrame.from_dict(rows, orient="index", columns=COLUMNS)
+    table[NUMERIC_COLUMNS] = table[NUMERIC_COLUMNS].apply(pd.to_numeric, errors="coerce")
+    table.index.name = "symbol"
+    return table.sort_index()
+
+
+def update_table(table, quotes, symbols=None):
+    """
+    Refresh a watchlist table in place with new quotes.
+
+    Parameters:
+    table (pandas.DataFrame): Table from quotes_table(), or None.
+    quotes (dict): symbol -> Quote with the new values.
+    symbols (list): The current watchlist; rows for other symbols are dropped.
+
+    Returns:
+    pandas.DataFrame: The updated table.
+    """
+    fresh = quotes_table(quotes)
+    if symbols is not None:
+        fresh = fresh.loc[fresh.index.intersection(symbols)]
+    if table is None or table.empty:
+        return fresh
+
+    if symbols is not None:
+        table = table.drop(index=table.index.difference(symbols))
+    new_symbols = fresh.index.difference(table.index)
+    known = fresh.index.intersection(table.index)
+
+    # Only rewrite the rows whose values actually changed
+    current = table.loc[known, COLUMNS]
+    incoming = fresh.loc[known, COLUMNS]
+    changed = ~((current == incoming) | (current.isna() & incoming.isna())).all(axis=1)
+    if changed.any():
+        table.loc[changed[changed].index, COLUMNS] = incoming[changed]
+    if len(new_symbols):
+        table = pd.concat([table, fresh.loc[new_symbols]]).sort_index()
+    return table